@@ -1,52 +1,167 @@
 # admin_view.py
 
 import streamlit as st
-import folium
-from database import EmergencyDatabase
-from config import CENTER_LAT, CENTER_LON
-from coordinator_view import create_map  # Reutilizamos la función del mapa
+import altair as alt
+import pandas as pd
+from datetime import datetime
+from database import get_database
+from config import CENTER_LAT, CENTER_LON, STATUS_NEEDED_BELOW, STATUS_OVERFLOW_ABOVE
+from coordinator_view import show_map  # Reutilizamos la función del mapa
+from map_cache import map_cache
+from cache_manager import cache_manager
+from tracing import tracer, RingBufferSink
+
+# Segundos entre actualizaciones de la pestaña Rendimiento en modo automático
+PERFORMANCE_REFRESH_SECONDS = 5
+
+def show_performance():
+    """Pestaña Rendimiento: latencias de las operaciones medidas por tracing"""
+    st.subheader("Rendimiento")
+    ring = tracer.sink(RingBufferSink)
+    if ring is None:
+        st.info("Las trazas en memoria están desactivadas (TRACE_ENABLED y 'ring' en TRACE_SINKS)")
+        return
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        live = st.toggle(f"Actualizar cada {PERFORMANCE_REFRESH_SECONDS} s", key='performance_live')
+    with col2:
+        if st.button("🗑️ Vaciar trazas"):
+            ring.clear()
+
+    # Con st.fragment solo se vuelve a ejecutar el panel, no toda la página
+    if hasattr(st, 'fragment'):
+        st.fragment(run_every=PERFORMANCE_REFRESH_SECONDS if live else None)(show_performance_panel)(ring)
+    else:
+        show_performance_panel(ring)
+
+def show_performance_panel(ring):
+    stats = tracer.stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Spans en memoria", len(ring))
+    with col2:
+        st.metric("Muestreo", f"{stats['sample_rate']:.0%}")
+    with col3:
+        st.metric("Siempre si más de", f"{stats['slow_ms']} ms" if stats['slow_ms'] is not None else "-")
+
+    summary = ring.summary()
+    if not summary:
+        st.info("Todavía no hay operaciones medidas")
+        return
+
+    st.write("**Latencia por operación (ms)**")
+    st.dataframe(pd.DataFrame(summary).rename(columns={
+        'operation': 'Operación', 'calls': 'Llamadas', 'errors': 'Errores',
+        'p50_ms': 'p50', 'p95_ms': 'p95', 'p99_ms': 'p99', 'max_ms': 'Máx'
+    }), hide_index=True, use_container_width=True)
+
+    operation = st.selectbox(
+        "Operación", options=['Todas'] + [row['operation'] for row in summary], key='performance_operation'
+    )
+    key = None if operation == 'Todas' else operation
+
+    st.write("**Histograma de latencia**")
+    histogram = pd.DataFrame(ring.histogram(key), columns=['Latencia', 'Llamadas'])
+    # Los intervalos en su orden, no en orden alfabético
+    st.altair_chart(alt.Chart(histogram).mark_bar().encode(
+        x=alt.X('Latencia', sort=None), y='Llamadas'
+    ), use_container_width=True)
+
+    st.write("**Llamadas más lentas**")
+    st.dataframe(pd.DataFrame([
+        {
+            'Hora': datetime.fromtimestamp(span.start_ns / 1e9).strftime('%H:%M:%S'),
+            'Operación': span.key,
+            'ms': round(span.duration_ms, 1),
+            'Detalle': ' '.join(f'{name}={value}' for name, value in span.attributes.items()),
+            'Error': span.error or ''
+        }
+        for span in ring.slowest(20, key)
+    ]), hide_index=True, use_container_width=True)
 
 def admin_page():
     st.title("🔧 Panel de Administración - Emergencias Valencia")
     
     # Inicializar base de datos
-    db = EmergencyDatabase()
+    db = get_database()
     
     # Crear tabs para diferentes funciones administrativas
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "🗺️ Vista General", 
         "➕ Añadir Zona", 
         "✏️ Editar Zona", 
         "👥 Gestión Coordinadores",
-        "🔄 Mantenimiento"
+        "🔄 Mantenimiento",
+        "⏱️ Rendimiento"
     ])
     
-    # Obtener datos actuales
-    if 'zones_data' not in st.session_state:
-        st.session_state.zones_data = db.get_all_zones()
+    # Obtener datos actuales (instantánea compartida entre sesiones)
+    snapshot = db.get_zones_snapshot()
+    zones_data = list(snapshot.zones)
 
     with tab1:
         # Vista del Mapa
         st.subheader("Mapa de Zonas")
-        if 'zones_data' not in st.session_state:
-            st.session_state.zones_data = db.get_all_zones()
-        
-        map_html = create_map(st.session_state.zones_data)
-        st.components.v1.html(map_html, height=600)
+        show_map(snapshot, 600, key='admin_map')
         
         # Estadísticas
         st.subheader("📊 Estadísticas")
-        col1, col2, col3 = st.columns(3)
+        stats = db.get_zone_stats(snapshot)
+        volunteers = stats.volunteers()
+        col1, col2, col3, col4, col5 = st.columns(5)
         
-        zones = st.session_state.zones_data
         with col1:
-            st.metric("Total Zonas", len(zones))
+            st.metric("Total Zonas", stats.total_zones)
         with col2:
-            needed_zones = len([z for z in zones if z['status'] == 'needed'])
-            st.metric("Zonas Necesitadas", needed_zones)
+            st.metric("Zonas Necesitadas", stats.count('needed'))
         with col3:
-            overflow_zones = len([z for z in zones if z['status'] == 'overflow'])
-            st.metric("Zonas Saturadas", overflow_zones)
+            st.metric("Zonas Saturadas", stats.count('overflow'))
+        with col4:
+            st.metric("Voluntarios", volunteers['total'])
+        with col5:
+            st.metric("Media por Zona", f"{volunteers['mean']:.1f}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Necesidades más frecuentes**")
+            needs = stats.need_frequencies()
+            if needs.empty:
+                st.info("No hay necesidades registradas")
+            else:
+                st.bar_chart(needs.head(15).rename(columns={
+                    'pending': 'Por cubrir', 'covered': 'Cubiertas'
+                }))
+        with col2:
+            st.write("**Resumen por municipio**")
+            st.dataframe(stats.by_municipality().rename(columns={
+                'zones': 'Zonas', 'volunteers': 'Voluntarios', 'pending_needs': 'Necesidades',
+                'needed': 'Necesitadas', 'optimal': 'Óptimas', 'overflow': 'Saturadas'
+            }), use_container_width=True)
+    
+        # Evolución de voluntarios a partir del historial de cambios
+        st.subheader("📈 Evolución de Voluntarios")
+        zone_names = {zone['id']: zone['name'] for zone in zones_data if zone.get('id')}
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            trend_zones = st.multiselect(
+                "Zonas",
+                options=list(zone_names),
+                default=list(zone_names)[:3],
+                format_func=lambda zone_id: zone_names[zone_id],
+                key="trend_zones"
+            )
+        with col2:
+            hours = st.selectbox("Periodo", options=[24, 48, 168],
+                                 format_func=lambda h: f"Últimas {h} h", index=1)
+        if trend_zones:
+            counts = db.get_hourly_counts(trend_zones, hours=hours)
+            if counts is None:
+                st.error("No se pudo leer el historial")
+            elif counts.dropna(how='all').empty:
+                st.info("Aún no hay historial para estas zonas")
+            else:
+                st.line_chart(counts.rename(columns=zone_names))
     
     with tab2:
         st.subheader("Añadir Nueva Zona")
@@ -75,7 +190,6 @@ def admin_page():
                 
                 if db.add_new_zone(new_zone):
                     st.success(f"✅ Zona '{name}' creada exitosamente")
-                    st.session_state.zones_data = db.get_all_zones()
                     st.rerun()
     
     with tab3:
@@ -84,13 +198,13 @@ def admin_page():
         # Selector de zona a editar
         selected_zone = st.selectbox(
             "Seleccionar zona a editar",
-            options=[zone['name'] for zone in st.session_state.zones_data],
+            options=[zone['name'] for zone in zones_data],
             key="edit_zone_select"
         )
         
         # Encontrar la zona seleccionada
         current_zone = next(
-            (zone for zone in st.session_state.zones_data if zone['name'] == selected_zone),
+            (zone for zone in zones_data if zone['name'] == selected_zone),
             None
         )
         
@@ -116,6 +230,25 @@ def admin_page():
                     "Notas de Acceso",
                     value=current_zone['access_notes']
                 )
+
+                # Capacidad propia: umbrales de estado distintos de los generales
+                own_capacity = st.checkbox(
+                    "Capacidad propia de la zona",
+                    value=current_zone.get('min_volunteers') is not None
+                )
+                col_min, col_max = st.columns(2)
+                with col_min:
+                    min_volunteers = st.number_input(
+                        "Voluntarios mínimos",
+                        min_value=0,
+                        value=int(current_zone.get('min_volunteers', STATUS_NEEDED_BELOW))
+                    )
+                with col_max:
+                    max_volunteers = st.number_input(
+                        "Voluntarios máximos",
+                        min_value=0,
+                        value=int(current_zone.get('max_volunteers', STATUS_OVERFLOW_ABOVE))
+                    )
                 
                 col3, col4 = st.columns(2)
                 with col3:
@@ -124,12 +257,14 @@ def admin_page():
                             'name': new_name,
                             'latitude': new_lat,
                             'longitude': new_lon,
-                            'access_notes': new_notes
+                            'access_notes': new_notes,
+                            # None elimina la capacidad propia y vuelve a los umbrales generales
+                            'min_volunteers': min_volunteers if own_capacity else None,
+                            'max_volunteers': max_volunteers if own_capacity else None
                         }
                         
                         if db.edit_zone(current_zone['id'], update_data):
                             st.success("✅ Zona actualizada exitosamente")
-                            st.session_state.zones_data = db.get_all_zones()
                             st.rerun()
                         else:
                             st.error("❌ Error al actualizar la zona")
@@ -139,7 +274,6 @@ def admin_page():
                         if st.session_state.get('confirm_delete', False):
                             if db.delete_zone(current_zone['id']):
                                 st.success("✅ Zona eliminada exitosamente")
-                                st.session_state.zones_data = db.get_all_zones()
                                 del st.session_state['confirm_delete']
                                 st.rerun()
                             else:
@@ -158,8 +292,86 @@ def admin_page():
             if st.button("Reestructurar Datos"):
                 if db.restructure_firebase_data():
                     st.success("✅ Datos reestructurados correctamente")
-                    st.session_state.zones_data = db.get_all_zones()
                     st.rerun()
+
+        # Recalcular el estado de todas las zonas con los umbrales vigentes
+        with st.expander("🚦 Recalcular Estados"):
+            st.write(
+                f"Umbrales generales: menos de {STATUS_NEEDED_BELOW} voluntarios, se necesitan; "
+                f"más de {STATUS_OVERFLOW_ABOVE}, exceso. Las zonas con capacidad propia usan la suya."
+            )
+            if st.button("Recalcular Estados"):
+                changed = db.reevaluate_statuses()
+                if changed is None:
+                    st.error("❌ Error al recalcular los estados")
+                else:
+                    st.success(f"✅ {changed} zonas cambiaron de estado")
+
+        # Métricas del pool de conexiones HTTP
+        with st.expander("📈 Métricas de Conexión"):
+            stats = db.get_http_stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Peticiones", stats['requests'])
+            with col2:
+                st.metric("Reutilización", f"{stats['connection_reuse_rate']:.0%}")
+            with col3:
+                st.metric("p50 (ms)", stats['latency_p50_ms'] or "-")
+            with col4:
+                st.metric("p99 (ms)", stats['latency_p99_ms'] or "-")
+            st.json(stats)
+            st.write("**Escucha en tiempo real**")
+            st.json(db.get_realtime_status())
+            st.write("**Caché de mapas**")
+            st.json(map_cache.stats())
+
+        # Cachés compartidas por todas las sesiones, vaciables de una en una
+        with st.expander("🧹 Cachés"):
+            st.dataframe(pd.DataFrame(cache_manager.stats()), use_container_width=True, hide_index=True)
+            cache_name = st.selectbox("Caché", cache_manager.names(), key="purge_cache_name")
+            st.caption("Solo se vacía la caché elegida; las sesiones la vuelven a llenar en su próxima lectura.")
+            if st.button("Vaciar caché") and cache_name:
+                cache_manager.invalidate(cache_name)
+                st.success(f"✅ Caché '{cache_name}' vaciada")
+
+        # Copia local y cambios hechos sin conexión
+        with st.expander("📴 Copia Local y Cola sin Conexión"):
+            offline = db.get_offline_status()
+            if offline is None:
+                st.info("La copia local está desactivada (OFFLINE_STORE_ENABLED)")
+            else:
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Conexión", "✅" if offline['online'] else "❌")
+                with col2:
+                    st.metric("Zonas en local", offline['zones'])
+                with col3:
+                    st.metric("Pendientes", offline['pending_writes'])
+                with col4:
+                    st.metric("Conflictos", offline['conflicts'])
+                if offline['last_error']:
+                    st.caption(f"Último error: {offline['last_error']}")
+
+                for conflict in offline['conflict_list']:
+                    st.write(
+                        f"**{conflict['zone_id']}** - campos en conflicto: "
+                        f"{', '.join(conflict['conflicts'])}"
+                    )
+                    current = conflict['current'] or {}
+                    for field, value in conflict['fields'].items():
+                        st.write(f"- {field}: en el servidor `{current.get(field)}`, cambio sin conexión `{value}`")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button("Aplicar mis cambios", key=f"offline_keep_{conflict['seq']}"):
+                            db.resolve_offline_conflict(conflict['seq'], keep_mine=True)
+                            st.rerun()
+                    with col2:
+                        if st.button("Descartar", key=f"offline_discard_{conflict['seq']}"):
+                            db.resolve_offline_conflict(conflict['seq'], keep_mine=False)
+                            st.rerun()
+    with tab6:
+        show_performance()
+
     with tab4:
         st.subheader("Gestión de Coordinadores")
         
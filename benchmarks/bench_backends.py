@@ -0,0 +1,116 @@
+# benchmarks/bench_backends.py
+"""Operaciones de la aplicación sobre cada backend de almacenamiento, sin red.
+
+Compara Firebase REST (contra el emulador local), el backend en memoria y el
+de SQLite en las operaciones que usa EmergencyDatabase: leer todas las zonas,
+GET condicional (304), actualizar un campo, incremento de voluntarios,
+compare-and-set con if-match, PATCH multi-ruta de un lote de zonas y un
+check-in. Comprueba también que el backend SQLite recupera el mismo árbol al
+reabrirse y que las suscripciones avisan de los cambios.
+
+Uso: python benchmarks/bench_backends.py [zonas] [repeticiones]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from common import synthetic_zones
+from checkins import CheckinLog
+from firebase_emulator import FirebaseEmulator
+from storage import FirebaseRestBackend, MemoryBackend, SQLiteBackend
+
+
+def timed(repeats, operation):
+    """Mediana en ms de repeats ejecuciones"""
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        operation(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def run(backend, zones, repeats):
+    backend.set('zones', {zone['id']: zone for zone in zones})
+    zone_ids = [zone['id'] for zone in zones]
+    results = {}
+
+    results['leer zonas'] = timed(repeats, lambda i: backend.get('zones'))
+
+    etag = backend.request('GET', 'zones', headers={'X-Firebase-ETag': 'true'}).headers['ETag']
+    results['GET condicional (304)'] = timed(
+        repeats, lambda i: backend.request('GET', 'zones', headers={'If-None-Match': etag})
+    )
+    results['actualizar campo'] = timed(
+        repeats, lambda i: backend.update(f'zones/{zone_ids[i % len(zone_ids)]}', {'access_notes': f'nota {i}'})
+    )
+    results['incremento'] = timed(repeats, lambda i: backend.update(
+        f'zones/{zone_ids[0]}', {'volunteer_count': {'.sv': {'increment': 1}}}
+    ))
+
+    def compare_and_set(i):
+        path = f'zones/{zone_ids[1]}'
+        response = backend.request('GET', path, headers={'X-Firebase-ETag': 'true'})
+        zone = dict(response.json(), access_notes=f'cas {i}')
+        backend.request('PUT', path, zone, headers={'if-match': response.headers['ETag']})
+    results['compare-and-set'] = timed(repeats, compare_and_set)
+
+    batch = min(100, len(zone_ids))
+    results[f'lote de {batch} zonas'] = timed(repeats, lambda i: backend.batch({
+        f'zones/{zone_id}/volunteer_count': i for zone_id in zone_ids[:batch]
+    }))
+
+    checkins = CheckinLog(backend.request)
+    results['check-in'] = timed(repeats, lambda i: checkins.check_in(zone_ids[2], f'vol_{i}'))
+
+    expected = backend.request('GET', 'zones/' + zone_ids[0]).json()['volunteer_count']
+    return results, expected
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    zones = synthetic_zones(count)
+    db_path = os.path.join(tempfile.mkdtemp(), 'storage.db')
+
+    emulator = FirebaseEmulator().start()
+    backends = [
+        FirebaseRestBackend(emulator.url),
+        MemoryBackend(),
+        SQLiteBackend(db_path)
+    ]
+    columns = {}
+    for backend in backends:
+        columns[backend.name], expected = run(backend, zones, repeats)
+
+    print(f'{count} zonas, mediana de {repeats} repeticiones (ms)')
+    names = [backend.name for backend in backends]
+    print(f"{'operación':<24}" + ''.join(f'{name:>12}' for name in names))
+    for operation in columns[names[0]]:
+        print(f'{operation:<24}' + ''.join(f'{columns[name][operation]:>12.3f}' for name in names))
+
+    # El backend SQLite recupera el mismo árbol al reabrirse
+    sqlite_backend = backends[2]
+    tree = sqlite_backend.get('')
+    sqlite_backend.close()
+    reopened = SQLiteBackend(db_path)
+    print(f"\nSQLite reabierto: {'mismo árbol' if reopened.get('') == tree else 'ÁRBOL DISTINTO'}"
+          f" (volunteer_count {reopened.get('zones/' + zones[0]['id'])['volunteer_count']},"
+          f" esperado {expected})")
+
+    # Las suscripciones avisan solo de los cambios de su nodo
+    changes = []
+    subscription = reopened.subscribe('zones', on_change=changes.append)
+    subscription.start()
+    reopened.update('zones/' + zones[0]['id'], {'access_notes': 'cortada'})
+    reopened.update('meta', {'otra': 1})
+    print(f'suscripción a zones: {len(changes)} aviso(s) por 1 cambio en zones y 1 en meta')
+    subscription.stop()
+    reopened.close()
+    emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_history.py
+"""Consultas por intervalo sobre el historial de zonas frente a leer el registro completo.
+
+Genera días de historial de una zona en el emulador de Firebase y mide la
+serie por hora de las últimas horas (solo lee los nodos de esas horas) frente
+a descargar todo history/{zona}.
+
+Uso: python benchmarks/bench_history.py [días] [registros por hora] [horas consultadas]
+"""
+
+import random
+import sys
+import time
+
+from common import make_send
+from firebase_emulator import FirebaseEmulator
+from transport import PooledTransport
+from zone_history import ZoneHistory, record_paths
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    per_hour = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    hours = int(sys.argv[3]) if len(sys.argv) > 3 else 48
+
+    emulator = FirebaseEmulator().start()
+    transport = PooledTransport()
+    send = make_send(transport, emulator.url)
+
+    rng = random.Random(0)
+    now = time.time()
+    count = 0
+    for hour in range(days * 24, 0, -1):
+        paths = {}
+        for _ in range(per_hour):
+            count = max(0, count + rng.randint(-3, 3))
+            ts = now - hour * 3600 + rng.uniform(0, 3600)
+            paths.update(record_paths('zone_1', 'update', {'volunteer_count': count}, ts=ts))
+        send('PATCH', '', paths)
+
+    history = ZoneHistory(send)
+    start = time.perf_counter()
+    series = history.hourly('zone_1', now - hours * 3600, now)
+    range_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    response = send('GET', 'history/zone_1')
+    full_records = sum(len(bucket) for bucket in response.json().values())
+    full_ms = (time.perf_counter() - start) * 1000
+
+    print(f'registros en el historial: {full_records} ({days} días)')
+    print(f'serie por hora de las últimas {hours} h: {range_ms:.1f} ms, {len(series)} puntos')
+    print(f'descargar el historial completo: {full_ms:.1f} ms, {len(response.content) / 1024:.0f} KB')
+
+    transport.close()
+    emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
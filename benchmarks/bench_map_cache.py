@@ -0,0 +1,45 @@
+# benchmarks/bench_map_cache.py
+"""Latencia por rerun de la preparación del mapa, con y sin la caché de render.
+
+Uso: python benchmarks/bench_map_cache.py [número de zonas] [reruns]
+"""
+
+import sys
+import time
+
+from common import synthetic_zones
+from map_cache import map_cache, render_cached
+from map_features import zones_to_geojson
+
+
+def time_reruns(fn, zones, reruns):
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        fn(zones)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    reruns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    zones = synthetic_zones(count)
+
+    for view in ['coordinator', 'volunteer']:
+        def render(zones):
+            return zones_to_geojson(zones, view)
+
+        uncached = time_reruns(render, zones, reruns)
+        map_cache.clear()
+        by_content = time_reruns(lambda zones: render_cached(view, zones, render), zones, reruns)
+        # Como publish_features: la instantánea se identifica por su versión
+        by_version = time_reruns(lambda zones: render_cached(view, zones, render, version=1), zones, reruns)
+        print(f"{view:12s} {count} zonas: sin caché {uncached:8.2f} ms/rerun, "
+              f"clave por contenido {by_content:8.2f} ms/rerun, "
+              f"clave por versión {by_version:8.3f} ms/rerun (mediana de {reruns})")
+
+
+if __name__ == '__main__':
+    main()
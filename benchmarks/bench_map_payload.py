@@ -0,0 +1,37 @@
+# benchmarks/bench_map_payload.py
+"""Tamaño y tiempo de generación de lo que descarga el mapa de zonas.
+
+Uso: python benchmarks/bench_map_payload.py [tamaños...]
+Por defecto mide 100, 1000 y 10000 zonas. Por encima de SCALABLE_MAP_THRESHOLD
+el GeoJSON pasa al modo escalable: queda vacío y el mapa descarga solo las
+teselas visibles, así que se muestra también la tesela más pesada (gzip).
+"""
+
+import gzip
+import sys
+import time
+
+from common import synthetic_zones
+from map_features import build_tiles, zones_to_geojson
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 1000, 10000]
+    for count in sizes:
+        zones = synthetic_zones(count)
+        for view in ['volunteer', 'coordinator']:
+            start = time.perf_counter()
+            payload = zones_to_geojson(zones, view).encode('utf-8')
+            elapsed = (time.perf_counter() - start) * 1000
+            compressed = len(gzip.compress(payload))
+            line = (f"{count:6d} zonas  {view:12s} {len(payload) / 1024:9.1f} KB  "
+                    f"gzip {compressed / 1024:8.1f} KB  {elapsed:8.1f} ms")
+            tiles = build_tiles(zones, view)
+            if tiles:
+                largest = max(len(gzip.compress(tile.encode('utf-8'))) for tile in tiles.values())
+                line += f"  {len(tiles)} teselas, mayor gzip {largest / 1024:.1f} KB"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
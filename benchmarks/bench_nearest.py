@@ -0,0 +1,62 @@
+# benchmarks/bench_nearest.py
+"""Consulta de zonas más cercanas: índice espacial frente a búsqueda lineal.
+
+Uso: python benchmarks/bench_nearest.py [número de zonas] [consultas] [k]
+"""
+
+import random
+import sys
+import time
+
+from common import synthetic_zones
+from config import CENTER_LAT, CENTER_LON
+from spatial_index import ZoneSpatialIndex, linear_nearest
+from zone_cache import ZoneSnapshot
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    zones = synthetic_zones(count)
+    rng = random.Random(1)
+    points = [(CENTER_LAT + rng.uniform(-0.1, 0.1), CENTER_LON + rng.uniform(-0.1, 0.1))
+              for _ in range(queries)]
+
+    index = ZoneSpatialIndex()
+    start = time.perf_counter()
+    index.sync(ZoneSnapshot(zones, 1, None, 0))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Actualización incremental: cambia el estado del 1% de las zonas
+    changed = [dict(z) for z in zones]
+    for zone in rng.sample(changed, max(1, count // 100)):
+        zone['status'] = 'needed' if zone['status'] != 'needed' else 'optimal'
+    start = time.perf_counter()
+    index.sync(ZoneSnapshot(changed, 2, None, 0))
+    update_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    indexed = [index.nearest(lat, lon, k) for lat, lon in points]
+    index_us = (time.perf_counter() - start) / queries * 1e6
+
+    linear_queries = max(1, queries // 20)
+    start = time.perf_counter()
+    linear = [linear_nearest(changed, lat, lon, k) for lat, lon in points[:linear_queries]]
+    linear_us = (time.perf_counter() - start) / linear_queries * 1e6
+
+    mismatches = sum(
+        [round(d, 9) for _, d in a] != [round(d, 9) for _, d in b]
+        for a, b in zip(indexed, linear)
+    )
+    print(f"{count} zonas, k={k}, celda {index.cell:.5f}°")
+    print(f"  construcción           {build_ms:10.1f} ms")
+    print(f"  actualización (1%)     {update_ms:10.1f} ms")
+    print(f"  consulta con índice    {index_us:10.1f} µs")
+    print(f"  consulta lineal        {linear_us:10.1f} µs")
+    print(f"  resultados distintos   {mismatches} de {len(linear)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_realtime.py
+"""Lecturas de zonas con latencia de red simulada: GET, GET condicional y espejo SSE.
+
+Arranca el emulador de Firebase con latencia, variación y tasa de errores
+inyectadas (reproducibles con --seed) y mide, para el nodo zones:
+- GET completo en cada lectura (el comportamiento original de _make_request),
+- GET condicional con If-None-Match (ETagCache): 304 sin cuerpo si no cambió
+  (el emulador responde 304; Realtime Database ignora If-None-Match y
+  siempre devuelve 200 con el cuerpo, así que allí no ahorra nada),
+- lectura del espejo en memoria de RealtimeListener (sin ir a la red),
+y el tiempo que tarda una escritura en verse en el espejo. Con --error-rate
+muestra cuántos errores inyectados absorben los reintentos del transporte.
+
+Uso: python benchmarks/bench_realtime.py [--zones 1000] [--reads 30]
+     [--latency-ms 40] [--jitter-ms 20] [--error-rate 0] [--seed 0]
+"""
+
+import argparse
+import time
+
+from common import synthetic_zones
+from firebase_emulator import FirebaseEmulator
+from realtime import RealtimeListener
+from transport import PooledTransport, _percentile
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return f'p50 {_percentile(samples, 50):7.2f} ms   p99 {_percentile(samples, 99):7.2f} ms'
+
+
+def measure(reads, operation):
+    samples = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--reads', type=int, default=30)
+    parser.add_argument('--latency-ms', type=float, default=40)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data = {'zones': {zone['id']: zone for zone in synthetic_zones(args.zones)}}
+    emulator = FirebaseEmulator(data=data, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                error_rate=args.error_rate, seed=args.seed).start()
+    transport = PooledTransport()
+    url = f'{emulator.url}/zones.json'
+    print(f'{args.zones} zonas, latencia {args.latency_ms} ms + 0..{args.jitter_ms} ms, '
+          f'errores {args.error_rate:.0%}')
+
+    failures = []
+
+    def full_get():
+        response = transport.request('GET', url)
+        if response.status_code != 200:
+            failures.append(response.status_code)
+    print(f"{'GET completo':<22}{summary(measure(args.reads, full_get))}")
+
+    etag = transport.request('GET', url, headers={'X-Firebase-ETag': 'true'}).headers.get('ETag')
+
+    def conditional_get():
+        response = transport.request('GET', url, headers={'If-None-Match': etag})
+        if response.status_code not in (200, 304):
+            failures.append(response.status_code)
+    print(f"{'GET condicional (304)':<22}{summary(measure(args.reads, conditional_get))}")
+
+    listener = RealtimeListener(emulator.url, 'zones')
+    listener.start()
+    while not listener.live:
+        time.sleep(0.01)
+    print(f"{'espejo SSE':<22}{summary(measure(args.reads, listener.get))}")
+
+    # Propagación: inicio de la escritura -> evento SSE aplicado en el espejo
+    propagation = []
+    for i in range(args.reads):
+        applied = listener.events_applied
+        start = time.perf_counter()
+        response = transport.request('PATCH', f'{emulator.url}/zones/zone_0.json', {'volunteer_count': i})
+        if response.status_code != 200:
+            failures.append(response.status_code)
+            continue
+        while listener.events_applied == applied:
+            time.sleep(0.0005)
+        propagation.append((time.perf_counter() - start) * 1000)
+    print(f"{'escritura -> espejo':<22}{summary(propagation)}")
+
+    stats = emulator.stats()
+    print(f"\nerrores inyectados: {stats['errors_injected']} de {stats['total_requests']} peticiones; "
+          f"fallos vistos por el cliente tras reintentos: {len(failures)}")
+
+    listener.stop()
+    transport.close()
+    emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/bench_startup.py
+"""Tiempo de arranque en frío: importaciones y primer renderizado de cada página.
+
+Cada medida se hace en un proceso de Python nuevo, como el primer visitante
+tras desplegar o reiniciar la aplicación:
+- importación: tiempo de importar cada módulo de la aplicación (con
+  streamlit ya importado, que es fijo) y qué módulos pesados arrastra
+  (firebase_admin, folium, pandas, requests...).
+- arranque: primer renderizado de streamlit_app.py con AppTest en la página
+  de bienvenida (sin sesión iniciada) y en la de cada rol, más un segundo
+  renderizado ya en caliente. También se cuentan las peticiones que recibe el
+  emulador de Firebase durante el renderizado: la bienvenida no debería
+  hacer ninguna.
+
+--root permite medir otra copia del proyecto (p. ej. un git worktree de una
+versión anterior) para comparar.
+
+Uso: python benchmarks/bench_startup.py [--repeat 5] [--zones 500]
+     [--root ruta/al/proyecto] [--output resultados.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import ROOT, synthetic_zones
+from firebase_emulator import FirebaseEmulator
+
+MODULES = ['streamlit_app', 'volunteer_view', 'coordinator_view', 'admin_view', 'database']
+HEAVY_MODULES = ['firebase_admin', 'folium', 'pandas', 'numpy', 'requests', 'altair', 'database']
+PAGES = {
+    'bienvenida': {},
+    'voluntario': {'authenticated': True, 'role': 'Voluntario'},
+    'coordinador': {'authenticated': True, 'role': 'Coordinador'},
+    'administrador': {'authenticated': True, 'role': 'Administrador'}
+}
+
+IMPORT_CHILD = '''
+import json, sys, time
+import streamlit
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+RENDER_CHILD = '''
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({script!r}, default_timeout=120)
+for key, value in {state!r}.items():
+    app.session_state[key] = value
+start = time.perf_counter()
+app.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+app.run()
+second = time.perf_counter() - start
+print(json.dumps({{
+    'first_ms': first * 1000,
+    'second_ms': second * 1000,
+    'errors': [str(e.value)[:200] for e in app.exception] + [e.value[:200] for e in app.error],
+    'loaded': [m for m in {heavy!r} if m in sys.modules]
+}}))
+'''
+
+
+def run_child(code, root, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                            capture_output=True, text=True, timeout=300)
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'error')
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data['wall_ms'] = wall
+    return data
+
+
+def median(samples, key):
+    return round(statistics.median(sample[key] for sample in samples), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--zones', type=int, default=500)
+    parser.add_argument('--root', default=ROOT, help='Carpeta del proyecto a medir')
+    parser.add_argument('--output', help='Archivo JSON de resultados')
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+
+    zones = synthetic_zones(args.zones)
+    emulator = FirebaseEmulator(data={
+        'zones': {zone['id']: zone for zone in zones},
+        'coordinators': {'coord_0': {'username': 'coord_0', 'password': '-', 'created_at': '2024-11-03'}}
+    }).start()
+    env = dict(os.environ, PYTHONPATH=root, EMERGENCY_DB_URL=emulator.url)
+    report = {'root': root, 'imports': {}, 'pages': {}}
+
+    print(f'Importación (mediana de {args.repeat} procesos, con streamlit ya importado)')
+    print(f"{'módulo':<18}{'ms':>9}   módulos pesados cargados")
+    for module in MODULES:
+        code = IMPORT_CHILD.format(module=module, heavy=HEAVY_MODULES)
+        try:
+            samples = [run_child(code, root, env) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f'{module:<18}{"-":>9}   error: {e}')
+            continue
+        report['imports'][module] = {'ms': median(samples, 'ms'), 'loaded': samples[-1]['loaded']}
+        print(f"{module:<18}{report['imports'][module]['ms']:>9.1f}   "
+              f"{', '.join(samples[-1]['loaded']) or '-'}")
+
+    print(f'\nArranque en frío de streamlit_app.py ({args.zones} zonas en el emulador)')
+    print(f"{'página':<15}{'proceso':>10}{'1er render':>12}{'2º render':>11}{'peticiones':>12}"
+          f"   módulos pesados cargados")
+    script = os.path.join(root, 'streamlit_app.py')
+    for page, state in PAGES.items():
+        code = RENDER_CHILD.format(script=script, state=state, heavy=HEAVY_MODULES)
+        samples = []
+        for _ in range(args.repeat):
+            emulator.server.reset_stats()
+            sample = run_child(code, root, env)
+            sample['requests'] = emulator.stats()['total_requests']
+            samples.append(sample)
+        errors = samples[-1]['errors']
+        report['pages'][page] = {
+            'wall_ms': median(samples, 'wall_ms'),
+            'first_render_ms': median(samples, 'first_ms'),
+            'second_render_ms': median(samples, 'second_ms'),
+            'requests': median(samples, 'requests'),
+            'loaded': samples[-1]['loaded'],
+            'errors': errors
+        }
+        result = report['pages'][page]
+        print(f"{page:<15}{result['wall_ms']:>10.0f}{result['first_render_ms']:>12.0f}"
+              f"{result['second_render_ms']:>11.0f}{result['requests']:>12.0f}   "
+              f"{', '.join(result['loaded']) or '-'}")
+        for error in errors:
+            print(f'  ERROR {error}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+    emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
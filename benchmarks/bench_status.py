@@ -0,0 +1,37 @@
+# benchmarks/bench_status.py
+"""Recálculo en bloque del estado de las zonas (status_engine).
+
+Uso: python benchmarks/bench_status.py [número de zonas]
+"""
+
+import sys
+import time
+
+from common import synthetic_zones
+from status_engine import evaluate_statuses, status_changes, zone_arrays, zone_status
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    zones = synthetic_zones(count)
+    arrays = zone_arrays(zones)
+
+    print(f'zonas: {count}')
+    print(f'extraer columnas de los diccionarios: {timed(lambda: zone_arrays(zones)):.2f} ms')
+    print(f'evaluar estados (numpy): {timed(lambda: evaluate_statuses(*arrays)):.2f} ms')
+    print(f'status_changes completo: {timed(lambda: status_changes(zones)):.2f} ms')
+    print(f'zona a zona (zone_status): {timed(lambda: [zone_status(z) for z in zones], repeat=1):.2f} ms')
+    print(f'zonas que cambiarían de estado: {len(status_changes(zones))}')
+
+
+if __name__ == '__main__':
+    main()
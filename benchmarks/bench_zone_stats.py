@@ -0,0 +1,60 @@
+# benchmarks/bench_zone_stats.py
+"""Estadísticas de los paneles: ZoneStats (Counter y numpy) frente a listas por comprensión.
+
+Uso: python benchmarks/bench_zone_stats.py [número de zonas]
+"""
+
+import sys
+import time
+from collections import Counter
+
+from common import synthetic_zones
+from zone_cache import ZoneSnapshot
+from zone_stats import ZoneStatsCache
+
+
+def list_stats(zones):
+    """Cálculo previo: una pasada de Python por cada métrica"""
+    needed = len([z for z in zones if z['status'] == 'needed'])
+    overflow = len([z for z in zones if z['status'] == 'overflow'])
+    total = sum(z.get('volunteer_count', 0) for z in zones)
+    pending = Counter(n for z in zones for n in z.get('pending_needs') or [])
+    covered = Counter(n for z in zones for n in z.get('covered_needs') or [])
+    return needed, overflow, total, pending, covered
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    zones = synthetic_zones(count)
+    snapshot = ZoneSnapshot(zones, 1, None, 0)
+
+    def engine(cache):
+        stats = cache.get(snapshot)
+        stats.count('needed')
+        stats.count('overflow')
+        stats.volunteers()
+        stats.need_frequencies()
+        stats.by_municipality()
+
+    cold_ms = timed(lambda: engine(ZoneStatsCache()))
+    warm = ZoneStatsCache()
+    engine(warm)
+    warm_ms = timed(lambda: engine(warm), repeat=100)
+
+    print(f'zonas: {count}')
+    print(f'listas por comprensión (cada rerun): {timed(lambda: list_stats(zones)):.2f} ms')
+    print(f'ZoneStats, primera vez por versión: {cold_ms:.2f} ms')
+    print(f'ZoneStats, reruns con la misma versión: {warm_ms * 1000:.1f} µs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# benchmarks/common.py
+"""Utilidades compartidas por los benchmarks"""
+
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import CENTER_LAT, CENTER_LON
+
+
+def make_send(transport, url):
+    """Función send(method, path, ...) de los módulos de datos contra la URL indicada"""
+    def send(method, path, data=None, headers=None, params=None):
+        return transport.request(method, f'{url}/{path}.json', data, headers=headers, params=params)
+    return send
+
+
+def synthetic_zones(count, seed=0, spread=0.1):
+    """Zonas aleatorias alrededor del centro de Valencia"""
+    rng = random.Random(seed)
+    statuses = ['needed', 'optimal', 'overflow']
+    return [
+        {
+            'id': f'zone_{i}',
+            'name': f'Zona {i}',
+            'latitude': CENTER_LAT + rng.uniform(-spread, spread),
+            'longitude': CENTER_LON + rng.uniform(-spread, spread),
+            'volunteer_count': rng.randint(0, 200),
+            'status': rng.choice(statuses),
+            'access_notes': 'Acceso por CV-500',
+            'pending_needs': ['Agua potable'],
+            'covered_needs': ['Limpieza de calles'],
+            'last_update': '2024-11-03 00:00:00'
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,128 @@
+# benchmarks/load_checkins.py
+"""Prueba de carga de llegadas de voluntarios contra el emulador de Firebase.
+
+Simula el cambio de turno: muchos voluntarios registran su llegada a la vez,
+todos en las mismas pocas zonas. Compara los contadores repartidos de
+checkins.CheckinLog con un contador único por zona actualizado con
+compare-and-set (GET con ETag + PUT if-match), y comprueba que tras el
+volcado volunteer_count coincide con las llegadas registradas.
+
+Uso: python benchmarks/load_checkins.py [--checkins 2000] [--workers 64] [--zones 1]
+     [--url http://127.0.0.1:9000]  (emulador externo; por defecto, uno en el proceso)
+"""
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_send
+from checkins import CheckinLog
+from config import CAS_MAX_ATTEMPTS
+from firebase_emulator import FirebaseEmulator
+from transport import PooledTransport, _percentile
+
+
+def seed_zones(send, zone_ids):
+    send('PUT', 'zones', {
+        zone_id: {'id': zone_id, 'name': zone_id, 'volunteer_count': 0, 'status': 'needed'}
+        for zone_id in zone_ids
+    })
+    send('DELETE', 'checkin_counters')
+    send('DELETE', 'checkins')
+    send('DELETE', 'meta')
+
+
+def cas_increment(send, path):
+    """Contador único: leer, sumar uno y escribir si nadie escribió entretanto"""
+    response = send('GET', path, headers={'X-Firebase-ETag': 'true'})
+    value, etag = response.json(), response.headers.get('ETag')
+    for attempt in range(CAS_MAX_ATTEMPTS):
+        response = send('PUT', path, (value or 0) + 1,
+                        headers={'X-Firebase-ETag': 'true', 'if-match': etag})
+        if response.status_code != 412:
+            return response.status_code == 200, attempt
+        value, etag = response.json(), response.headers.get('ETag')
+    return False, CAS_MAX_ATTEMPTS
+
+
+def run(label, task, count, workers):
+    latencies = []
+    failures = 0
+    retries = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal failures, retries
+        start = time.perf_counter()
+        ok, attempts = task(i)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            retries += attempts
+            if not ok:
+                failures += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(count)))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'{label}:')
+    print(f'  {count / total:.0f} registros/s, p50 {_percentile(latencies, 50) * 1000:.1f} ms, '
+          f'p99 {_percentile(latencies, 99) * 1000:.1f} ms')
+    print(f'  fallidos: {failures}, reintentos por conflicto: {retries}')
+    return count - failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkins', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--zones', type=int, default=1)
+    parser.add_argument('--url')
+    args = parser.parse_args()
+
+    emulator = None
+    url = args.url
+    if not url:
+        emulator = FirebaseEmulator().start()
+        url = emulator.url
+    transport = PooledTransport(pool_size=args.workers)
+    send = make_send(transport, url)
+    zone_ids = [f'zone_{i}' for i in range(args.zones)]
+    seed_zones(send, zone_ids)
+    rng = random.Random(0)
+    targets = [rng.choice(zone_ids) for _ in range(args.checkins)]
+
+    print(f'{args.checkins} llegadas, {args.workers} hilos, {args.zones} zona(s)')
+
+    log = CheckinLog(send)
+    registered = run('Contadores repartidos (CheckinLog)',
+                     lambda i: (log.check_in(targets[i], f'vol_{i}'), 0),
+                     args.checkins, args.workers)
+    start = time.perf_counter()
+    deltas = log.rollup()
+    rollup_ms = (time.perf_counter() - start) * 1000
+    counts = {z: send('GET', f'zones/{z}/volunteer_count').json() for z in zone_ids}
+    print(f'  volcado: {rollup_ms:.1f} ms, {sum(deltas.values())} voluntarios sumados')
+    print(f'  volunteer_count total {sum(counts.values())} '
+          f'({"correcto" if sum(counts.values()) == registered else "NO coincide"})')
+
+    seed_zones(send, zone_ids)
+    written = run('Contador único con compare-and-set',
+                  lambda i: cas_increment(send, f'zones/{targets[i]}/volunteer_count'),
+                  args.checkins, args.workers)
+    counts = {z: send('GET', f'zones/{z}/volunteer_count').json() for z in zone_ids}
+    print(f'  volunteer_count total {sum(counts.values())} '
+          f'({"correcto" if sum(counts.values()) == written else "NO coincide"})')
+
+    transport.close()
+    if emulator:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+# benchmarks/load_sessions.py
+"""Carga de sesiones simultáneas de la aplicación, sin navegador.
+
+Cada sesión simulada es un AppTest de Streamlit que ejecuta volunteer_page,
+coordinator_page o admin_page con su propio session_state, como haría una
+pestaña abierta: vuelve a ejecutar la página (rerun) cada cierto tiempo de
+espera (--think-ms ± --think-jitter-ms) y de vez en cuando actúa (un
+voluntario registra su llegada o, si ya está en la zona elegida, elige otra;
+un coordinador guarda el formulario de una zona). Todas las sesiones comparten el proceso y, por tanto, el cliente de
+get_database(), igual que en el servidor real.
+
+La mezcla de sesiones se indica con --mix (por defecto 90 % voluntarios, 9 %
+coordinadores y 1 % administradores) y se ejecutan --concurrency a la vez.
+Se informa de:
+- rendimiento (reruns/s) y latencia por rerun (p50, p95, p99, máx) por rol,
+- peticiones a la base de datos por sesión y por rerun, contadas por el
+  emulador (una calibración previa, una sesión cada vez, separa cada rol),
+- memoria por sesión: la que retiene cada sesión (tracemalloc, en la
+  calibración) y el aumento del RSS del proceso dividido entre las sesiones.
+
+Por defecto arranca el emulador de Firebase en el proceso con zonas
+sintéticas (--zones), con latencia opcional (--latency-ms, --jitter-ms);
+--url usa un emulador ya arrancado.
+
+Uso: python benchmarks/load_sessions.py [--sessions 50] [--concurrency 10]
+     [--reruns 5] [--mix volunteer=0.9,coordinator=0.09,admin=0.01]
+     [--think-ms 200] [--think-jitter-ms 200] [--zones 500]
+     [--latency-ms 0] [--jitter-ms 0] [--url http://127.0.0.1:9000]
+     [--output resultados.json]
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import queue
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from unittest.mock import MagicMock
+
+import requests
+
+from common import synthetic_zones
+import config
+from firebase_emulator import FirebaseEmulator
+from transport import _percentile
+
+ROLES = ('volunteer', 'coordinator', 'admin')
+ROLE_NAMES = {'volunteer': 'Voluntario', 'coordinator': 'Coordinador', 'admin': 'Administrador'}
+DEFAULT_MIX = 'volunteer=0.9,coordinator=0.09,admin=0.01'
+CALIBRATION_RERUNS = 3
+
+
+# Páginas que ejecuta cada sesión; AppTest.from_function copia el cuerpo de la
+# función como script, así que cada una importa lo que usa
+def volunteer_script():
+    from volunteer_view import volunteer_page
+    volunteer_page()
+
+
+def coordinator_script():
+    from coordinator_view import coordinator_page
+    coordinator_page()
+
+
+def admin_script():
+    from admin_view import admin_page
+    admin_page()
+
+
+SCRIPTS = {'volunteer': volunteer_script, 'coordinator': coordinator_script, 'admin': admin_script}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        role, _, weight = item.partition('=')
+        role = role.strip()
+        if role not in ROLES:
+            raise argparse.ArgumentTypeError(f'Rol desconocido en --mix: {role}')
+        mix[role] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError('--mix necesita algún peso positivo')
+    return mix
+
+
+def assign_roles(mix, sessions, rng):
+    """Reparte las sesiones según la mezcla (redondeo por mayor resto), en orden aleatorio"""
+    total = sum(mix.values())
+    exact = {role: sessions * weight / total for role, weight in mix.items()}
+    counts = {role: int(value) for role, value in exact.items()}
+    remaining = sessions - sum(counts.values())
+    for role in sorted(exact, key=lambda r: exact[r] - counts[r], reverse=True)[:remaining]:
+        counts[role] += 1
+    roles = [role for role, count in counts.items() for _ in range(count)]
+    rng.shuffle(roles)
+    return roles
+
+
+def share_runtime():
+    """Un único Runtime de Streamlit para todas las sesiones del proceso.
+
+    AppTest instala un Runtime simulado al empezar cada ejecución y lo borra al
+    terminar: con varias sesiones en hilos, una dejaría sin Runtime a otra a
+    mitad de su ejecución. Como en el servidor real, todas comparten uno.
+    Lo mismo con la opción global.appTest, que AppTest activa solo mientras
+    dura cada ejecución y sin la cual los selectbox no guardan su formato.
+    """
+    from streamlit import config as st_config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    st_config.set_option('global.appTest', True)
+
+
+def rss_bytes():
+    """RSS actual del proceso (Linux); si no, el máximo que informa getrusage"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class UpstreamCounter:
+    """Peticiones recibidas por el emulador, leídas de /.emulator/stats"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def total(self):
+        try:
+            response = requests.get(f'{self.url}/.emulator/stats', timeout=5)
+            response.raise_for_status()
+            return response.json()['total_requests']
+        except (requests.RequestException, ValueError, KeyError):
+            return None
+
+
+class Session:
+    """Una pestaña abierta con la página de un rol"""
+
+    def __init__(self, role, rng, timeout, write_rate):
+        from streamlit.testing.v1 import AppTest
+
+        self.role = role
+        self.rng = rng
+        self.write_rate = write_rate
+        self.app = AppTest.from_function(SCRIPTS[role], default_timeout=timeout)
+        self.app.session_state['authenticated'] = True
+        self.app.session_state['role'] = ROLE_NAMES[role]
+        self.app.session_state['browser_width'] = 1280
+        self.actions = Counter()
+
+    def step(self, first):
+        """Un rerun; tras el primero, a veces con una acción del usuario. Devuelve ms"""
+        action, kind = (None, None) if first or self.rng.random() >= self.write_rate else self._action()
+        start = time.perf_counter()
+        if action:
+            action.run()
+            self.actions[self.role + '_' + kind] += 1
+        else:
+            self.app.run()
+        return (time.perf_counter() - start) * 1000
+
+    def _action(self):
+        """(elemento listo para run(), tipo de acción) o (None, None)"""
+        if self.role == 'volunteer':
+            buttons = [b for b in self.app.button if b.label == '✅ Registrar llegada']
+            if buttons:
+                return buttons[0].click(), 'write'
+            # Ya registrado en la zona elegida: elegir otra, como haría el voluntario
+            selects = [s for s in self.app.selectbox if s.key == 'checkin_zone_select']
+            if not selects:
+                return None, None
+            others = [option for option in selects[0].options if option != selects[0].value]
+            return (selects[0].set_value(self.rng.choice(others)), 'select') if others else (None, None)
+        if self.role == 'coordinator':
+            buttons = [b for b in self.app.button if b.label == 'Actualizar']
+            if not buttons or not self.app.number_input:
+                return None
+            count = self.app.number_input[0]
+            count.set_value((count.value or 0) + self.rng.randint(1, 3))
+            return buttons[0].click(), 'write'
+        return None, None
+
+    def errors(self):
+        return [e.value for e in self.app.exception]
+
+
+def calibrate(args, counter, rng):
+    """Peticiones por rerun y memoria retenida por sesión, rol a rol y sin concurrencia"""
+    calibration = {}
+    for role in ROLES:
+        if not args.mix.get(role):
+            continue
+        # Una sesión previa importa los módulos y llena las cachés compartidas
+        # (cliente, instantánea, mapas), que no cuentan como memoria por sesión
+        Session(role, rng, args.timeout, 0).step(first=True)
+        gc.collect()
+        tracemalloc.start()
+        before_memory = tracemalloc.get_traced_memory()[0]
+        sessions = [Session(role, rng, args.timeout, 0) for _ in range(args.memory_sessions)]
+        for session in sessions:
+            session.step(first=True)
+        gc.collect()
+        retained = (tracemalloc.get_traced_memory()[0] - before_memory) / len(sessions)
+        tracemalloc.stop()
+
+        # Los primeros reruns llenan las cachés compartidas; se cuentan los siguientes
+        session = sessions[0]
+        before = counter.total()
+        for _ in range(CALIBRATION_RERUNS):
+            session.step(first=True)
+        after = counter.total()
+        calibration[role] = {
+            'requests_per_rerun': (round((after - before) / CALIBRATION_RERUNS, 2)
+                                   if before is not None and after is not None else None),
+            'retained_kb_per_session': round(retained / 1024, 1)
+        }
+        del sessions, session
+    return calibration
+
+
+def run_load(args, roles, counter):
+    """Ejecuta las sesiones con --concurrency hilos; devuelve las métricas por rol"""
+    pending = queue.Queue()
+    for i, role in enumerate(roles):
+        pending.put((i, role))
+    latencies = {role: [] for role in ROLES}
+    errors = Counter()
+    error_samples = []
+    actions = Counter()
+    live_sessions = []
+    peak_rss = [rss_bytes()]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                i, role = pending.get_nowait()
+            except queue.Empty:
+                return
+            rng = random.Random(args.seed * 100003 + i)
+            session = Session(role, rng, args.timeout, args.write_rate)
+            with lock:
+                live_sessions.append(session)
+            for rerun in range(args.reruns):
+                if rerun:
+                    think = args.think_ms + rng.uniform(-args.think_jitter_ms, args.think_jitter_ms)
+                    time.sleep(max(0, think) / 1000)
+                try:
+                    elapsed = session.step(first=rerun == 0)
+                    failed = session.errors()
+                except Exception as e:  # timeouts del script runner, etc.
+                    elapsed, failed = None, [f'{type(e).__name__}: {e}']
+                with lock:
+                    if elapsed is not None:
+                        latencies[role].append(elapsed)
+                    if failed:
+                        errors[role] += 1
+                        if len(error_samples) < 5:
+                            error_samples.append(f'{role}: {failed[0][:300]}')
+                    peak_rss[0] = max(peak_rss[0], rss_bytes())
+            with lock:
+                actions.update(session.actions)
+
+    rss_before = rss_bytes()
+    requests_before = counter.total()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    requests_after = counter.total()
+
+    upstream = (requests_after - requests_before
+                if requests_before is not None and requests_after is not None else None)
+    total_reruns = sum(len(samples) for samples in latencies.values())
+    by_role = {}
+    for role, samples in latencies.items():
+        if not samples:
+            continue
+        samples.sort()
+        by_role[role] = {
+            'sessions': roles.count(role),
+            'reruns': len(samples),
+            'errors': errors[role],
+            'p50_ms': round(_percentile(samples, 50), 1),
+            'p95_ms': round(_percentile(samples, 95), 1),
+            'p99_ms': round(_percentile(samples, 99), 1),
+            'max_ms': round(samples[-1], 1)
+        }
+    everything = sorted(sample for samples in latencies.values() for sample in samples)
+    return {
+        'wall_s': round(wall, 2),
+        'reruns': total_reruns,
+        'throughput_reruns_s': round(total_reruns / wall, 1) if wall else None,
+        'p50_ms': round(_percentile(everything, 50), 1) if everything else None,
+        'p95_ms': round(_percentile(everything, 95), 1) if everything else None,
+        'p99_ms': round(_percentile(everything, 99), 1) if everything else None,
+        'upstream_requests': upstream,
+        'upstream_per_session': round(upstream / len(roles), 2) if upstream is not None else None,
+        'upstream_per_rerun': (round(upstream / total_reruns, 2)
+                               if upstream is not None and total_reruns else None),
+        'actions': dict(actions),
+        'rss_growth_mb': round((peak_rss[0] - rss_before) / 2**20, 1),
+        'rss_kb_per_session': round((peak_rss[0] - rss_before) / 1024 / len(roles), 1),
+        'roles': by_role,
+        'error_samples': error_samples
+    }
+
+
+def print_report(report):
+    load = report['load']
+    meta = report['meta']
+    print(f"{meta['sessions']} sesiones ({meta['concurrency']} a la vez), {meta['reruns']} reruns "
+          f"por sesión, espera {meta['think_ms']} ± {meta['think_jitter_ms']} ms, {meta['zones']} zonas")
+    print(f"{load['reruns']} reruns en {load['wall_s']} s: {load['throughput_reruns_s']} reruns/s, "
+          f"p50 {load['p50_ms']} ms, p95 {load['p95_ms']} ms, p99 {load['p99_ms']} ms")
+    print(f"\n{'rol':<13}{'sesiones':>9}{'reruns':>8}{'errores':>9}{'p50':>9}{'p95':>9}"
+          f"{'p99':>9}{'máx':>9}{'pet/rerun':>11}{'KB/sesión':>11}")
+    for role, stats in load['roles'].items():
+        calibration = report['calibration'].get(role, {})
+        per_rerun = calibration.get('requests_per_rerun')
+        print(f"{role:<13}{stats['sessions']:>9}{stats['reruns']:>8}{stats['errors']:>9}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+              f"{per_rerun if per_rerun is not None else '-':>11}"
+              f"{calibration.get('retained_kb_per_session', '-'):>11}")
+    if load['upstream_requests'] is not None:
+        print(f"\npeticiones a la base de datos: {load['upstream_requests']} "
+              f"({load['upstream_per_session']} por sesión, {load['upstream_per_rerun']} por rerun)")
+    print(f"acciones: {load['actions'] or 'ninguna'}")
+    print(f"RSS: +{load['rss_growth_mb']} MB ({load['rss_kb_per_session']} KB por sesión)")
+    for sample in load['error_samples']:
+        print(f"ERROR {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--reruns', type=int, default=5, help='Reruns por sesión')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--think-ms', type=float, default=200)
+    parser.add_argument('--think-jitter-ms', type=float, default=200)
+    parser.add_argument('--write-rate', type=float, default=0.2,
+                        help='Probabilidad de que un rerun sea una acción (llegada, guardar zona)')
+    parser.add_argument('--zones', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--memory-sessions', type=int, default=5,
+                        help='Sesiones por rol para medir la memoria retenida')
+    parser.add_argument('--timeout', type=float, default=60, help='Segundos por rerun')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='Emulador ya arrancado (por defecto, uno en el proceso)')
+    parser.add_argument('--output', help='Archivo JSON de resultados')
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    emulator = None
+    url = args.url
+    if not url:
+        zones = synthetic_zones(args.zones, seed=args.seed)
+        emulator = FirebaseEmulator(data={
+            'zones': {zone['id']: zone for zone in zones},
+            'coordinators': {
+                f'coord_{i}': {'username': f'coord_{i}', 'password': '-', 'created_at': '2024-11-03 00:00:00'}
+                for i in range(10)
+            }
+        }, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed).start()
+        url = emulator.url
+    # Antes de importar database: get_database() usará la API REST de esta URL
+    config.DATABASE_URL = url
+    os.environ['EMERGENCY_DB_URL'] = url
+
+    from streamlit import logger as st_logger
+    st_logger.set_log_level(logging.ERROR)
+    share_runtime()
+    counter = UpstreamCounter(url)
+    roles = assign_roles(args.mix, args.sessions, rng)
+
+    # Los mensajes que imprime la aplicación van a stderr, no al informe
+    with contextlib.redirect_stdout(sys.stderr):
+        calibration = calibrate(args, counter, rng)
+        load = run_load(args, roles, counter)
+
+    report = {
+        'meta': {
+            'sessions': args.sessions, 'concurrency': args.concurrency, 'reruns': args.reruns,
+            'mix': args.mix, 'think_ms': args.think_ms, 'think_jitter_ms': args.think_jitter_ms,
+            'write_rate': args.write_rate, 'zones': args.zones if emulator else None,
+            'latency_ms': args.latency_ms, 'url': args.url
+        },
+        'calibration': calibration,
+        'load': load
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+    if emulator:
+        emulator.stop()
+    return 1 if any(stats['errors'] for stats in load['roles'].values()) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,142 @@
+# benchmarks/outage_drill.py
+"""Simulacro de caída de conexión con la copia local (LocalStore + OfflineSync).
+
+1. Siembra zonas en el emulador de Firebase y sincroniza la copia local.
+2. Detiene el emulador: las lecturas siguen saliendo de la copia local y los
+   cambios de los coordinadores se guardan en la cola.
+3. Mientras tanto, otro coordinador (con conexión) cambia una de las zonas.
+4. Vuelve a arrancar el emulador en el mismo puerto y con los mismos datos,
+   envía la cola y comprueba que no se perdió ningún cambio, que los
+   voluntarios se suman como incrementos y que el conflicto se detecta.
+
+Uso: python benchmarks/outage_drill.py [--zones 1000] [--writes 500]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import synthetic_zones
+from firebase_emulator import FirebaseEmulator
+from local_store import LocalStore
+from offline_sync import OfflineSync
+from transport import PooledTransport
+
+
+def make_send(transport, url):
+    def send(method, path, data=None, headers=None, params=None):
+        return transport.request(method, f'{url}/{path}.json', data, headers=headers, params=params)
+    return send
+
+
+def check(condition, message):
+    print(f"  {'OK ' if condition else 'FALLO'} {message}")
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--writes', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    zones = synthetic_zones(args.zones, seed=args.seed)
+    emulator = FirebaseEmulator(data={'zones': {zone['id']: zone for zone in zones}}).start()
+    host, port = emulator.server.server_address[:2]
+    tree = emulator.tree
+
+    transport = PooledTransport(connect_timeout=0.5, read_timeout=2)
+    send = make_send(transport, emulator.url)
+    path = os.path.join(tempfile.mkdtemp(), 'drill.db')
+    store = LocalStore(path)
+    sync = OfflineSync(send, store, history=False)
+
+    ok = True
+    print(f"Simulacro con {args.zones} zonas y {args.writes} cambios sin conexión")
+    start = time.perf_counter()
+    ok &= check(len(sync.read_zones()) == args.zones,
+                f"copia local inicial ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    # --- Caída ---
+    emulator.stop()
+    sync.sync_once()
+    ok &= check(sync.online is False, "caída detectada")
+
+    start = time.perf_counter()
+    local = sync.read_zones()
+    ok &= check(len(local) == args.zones,
+                f"lecturas desde la copia local ({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    by_id = {zone['id']: dict(zone) for zone in local}
+    expected_delta = {}
+    conflict_zone = local[0]['id']
+    for i in range(args.writes):
+        zone_id = conflict_zone if i == 0 else rng.choice(list(by_id))
+        base = by_id[zone_id]
+        delta = rng.randint(1, 5)
+        fields = {'volunteer_count': base['volunteer_count'] + delta}
+        if i == 0:
+            fields['access_notes'] = 'Cortada por inundación'
+            conflict_delta = delta
+        sync.queue_update(zone_id, fields, base=dict(base))
+        by_id[zone_id] = dict(base, **fields)
+        expected_delta[zone_id] = expected_delta.get(zone_id, 0) + delta
+
+    ok &= check(store.stats()['pending_writes'] == args.writes, "cambios guardados en la cola")
+    ok &= check(store.zone(conflict_zone)['access_notes'] == 'Cortada por inundación',
+                "las lecturas locales ya muestran los cambios pendientes")
+
+    # Otro coordinador, con conexión, cambia la misma zona y suma voluntarios
+    with tree.lock:
+        remote = tree.get(['zones', conflict_zone])
+        remote['access_notes'] = 'Paso solo 4x4'
+        remote['volunteer_count'] += 10
+    # El cambio en conflicto se aparta entero, voluntarios incluidos
+    expected_delta[conflict_zone] += 10 - conflict_delta
+
+    # --- Vuelta de la conexión ---
+    emulator = FirebaseEmulator(host, port)
+    emulator.server.tree = tree
+    emulator.start()
+    before = {zone_id: zone['volunteer_count'] for zone_id, zone in tree.get(['zones']).items()}
+
+    start = time.perf_counter()
+    sync.sync_once()
+    elapsed = time.perf_counter() - start
+    ok &= check(sync.online is True, f"cola enviada en {elapsed * 1000:.0f} ms "
+                f"({sync.flushed / elapsed:.0f} cambios/s)")
+
+    stats = store.stats()
+    ok &= check(stats['pending_writes'] == 0, "cola vacía")
+    ok &= check(stats['conflicts'] == 1, "conflicto de access_notes detectado")
+
+    server_zones = tree.get(['zones'])
+    original = {zone['id']: zone['volunteer_count'] for zone in zones}
+    original[conflict_zone] = before[conflict_zone] - 10
+    mismatches = [
+        zone_id for zone_id, zone in server_zones.items()
+        if zone['volunteer_count'] != original[zone_id] + expected_delta.get(zone_id, 0)
+    ]
+    ok &= check(not mismatches, "voluntarios: ningún cambio perdido ni duplicado")
+    ok &= check(server_zones[conflict_zone]['access_notes'] == 'Paso solo 4x4',
+                "el cambio en conflicto no sobrescribe el del servidor")
+
+    # Resolverlo aplicando el cambio sin conexión
+    seq = store.conflicts()[0]['seq']
+    sync.resolve_conflict(seq, keep_mine=True)
+    sync.sync_once()
+    ok &= check(tree.get(['zones', conflict_zone, 'access_notes']) == 'Cortada por inundación',
+                "conflicto resuelto con 'Aplicar mis cambios'")
+
+    emulator.stop()
+    store.close()
+    print('Simulacro superado' if ok else 'Simulacro FALLIDO')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,399 @@
+# benchmarks/suite.py
+"""Suite de benchmarks de la capa de datos, el mapa y las estadísticas, sin red.
+
+Cada caso se mide con 10, 1.000, 10.000 y 100.000 zonas (--sizes). Los casos
+de EmergencyDatabase usan un cliente real sin hilos en segundo plano contra
+el emulador de Firebase (--backend emulator, por defecto) o el backend en
+memoria (--backend memory).
+
+El resultado es JSON (a stdout o a --output) con la mediana, el mínimo y el
+p95 de cada caso y tamaño. Si existe una línea base (--baseline, por defecto
+benchmarks/baseline.json), cada resultado se compara con ella y se marcan las
+regresiones por encima de --threshold. También se marcan los saltos de escala:
+operaciones que deberían costar lo mismo con cualquier número de zonas (p. ej.
+delete_zone) y que crecen con él, u operaciones lineales que crecen más que
+las zonas.
+
+Uso: python benchmarks/suite.py [--sizes 10 1000 10000 100000] [--only texto]
+     [--backend emulator|memory] [--output resultados.json]
+     [--baseline benchmarks/baseline.json] [--save-baseline]
+     [--threshold 0.25] [--fail-on-regression]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from common import ROOT, synthetic_zones
+from firebase_emulator import FirebaseEmulator
+from map_features import build_tiles, zones_to_geojson
+from status_engine import compute_statuses
+from storage import FirebaseRestBackend, MemoryBackend
+from zone_cache import ZoneSnapshot
+from zone_stats import ZoneStats, ZoneStatsCache
+
+# database y map_component necesitan streamlit (y firebase_admin): si no están
+# instalados sus casos se omiten y quedan en 'skipped' con el motivo
+try:
+    from database import EmergencyDatabase
+    DATABASE_ERROR = None
+except ImportError as e:
+    DATABASE_ERROR = f'database no disponible: {e}'
+try:
+    from map_component import FeatureHistory, _delta
+    COMPONENT_ERROR = None
+except ImportError as e:
+    COMPONENT_ERROR = f'map_component no disponible: {e}'
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+COORDINATORS = 50
+# Diferencias menores que esta (ms) se consideran ruido al comparar con la línea base
+NOISE_FLOOR_MS = 0.05
+
+CASES = []
+
+
+def case(name, scaling='n', requires=None, destructive=False):
+    """Registra un caso. scaling: '1' si no debería depender del número de zonas.
+
+    La función recibe el contexto del tamaño y devuelve la operación a medir,
+    que recibe el número de repetición. destructive limita las repeticiones al
+    número de zonas (p. ej. cada repetición borra una zona distinta).
+    """
+    def register(fn):
+        CASES.append({'name': name, 'fn': fn, 'scaling': scaling,
+                      'requires': requires, 'destructive': destructive})
+        return fn
+    return register
+
+
+class Context:
+    """Datos de un tamaño: zonas sintéticas y, si hace falta, el cliente de base de datos"""
+
+    def __init__(self, size, backend_kind):
+        self.size = size
+        self.backend_kind = backend_kind
+        self.zones = synthetic_zones(size)
+        self.raw = {zone['id']: zone for zone in self.zones}
+        self.snapshot = ZoneSnapshot(self.zones, 1, None, time.time())
+        self._db = None
+        self._emulator = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            data = {'zones': self.raw, 'coordinators': {
+                f'coord_{i}': {
+                    'username': f'coord_{i}',
+                    'password': hashlib.sha256(f'clave_{i}'.encode()).hexdigest(),
+                    'active': True
+                }
+                for i in range(COORDINATORS)
+            }}
+            if self.backend_kind == 'emulator':
+                self._emulator = FirebaseEmulator(data=data).start()
+                backend = FirebaseRestBackend(self._emulator.url)
+            else:
+                backend = MemoryBackend(data)
+            self._db = EmergencyDatabase(backend=backend, background=False)
+        return self._db
+
+    def close(self):
+        if self._emulator is not None:
+            self._emulator.stop()
+
+
+# --- Capa de datos (EmergencyDatabase) ---
+
+@case('data.clean_zones_data', requires='database')
+def clean_zones_data(ctx):
+    db = ctx.db
+    return lambda i: db.clean_zones_data(ctx.raw)
+
+
+@case('data.get_all_zones.cold', requires='database')
+def get_all_zones_cold(ctx):
+    db = ctx.db
+
+    def operation(i):
+        db.invalidate_zones()
+        return db.get_all_zones()
+    return operation
+
+
+@case('data.get_all_zones.cached', scaling='1', requires='database')
+def get_all_zones_cached(ctx):
+    db = ctx.db
+    db.get_all_zones()
+    return lambda i: db.get_zones_snapshot()
+
+
+@case('data.update_zone', scaling='1', requires='database')
+def update_zone(ctx):
+    db = ctx.db
+    return lambda i: db.update_zone(ctx.zones[i % ctx.size]['id'], {'access_notes': f'nota {i}'})
+
+
+@case('data.update_zone.compare_and_set', scaling='1', requires='database')
+def update_zone_cas(ctx):
+    db = ctx.db
+
+    def operation(i):
+        zone = ctx.zones[i % ctx.size]
+        return db.update_zone(zone['id'], dict(zone, access_notes=f'cas {i}'), base=zone)
+    return operation
+
+
+@case('data.verify_coordinator', scaling='1', requires='database')
+def verify_coordinator(ctx):
+    db = ctx.db
+    return lambda i: db.verify_coordinator(f'coord_{i % COORDINATORS}', f'clave_{i % COORDINATORS}')
+
+
+@case('data.add_new_zone', scaling='1', requires='database')
+def add_new_zone(ctx):
+    db = ctx.db
+    return lambda i: db.add_new_zone({'name': f'Nueva {i}', 'latitude': 39.4, 'longitude': -0.4})
+
+
+@case('data.delete_zone', scaling='1', requires='database', destructive=True)
+def delete_zone(ctx):
+    db = ctx.db
+    return lambda i: db.delete_zone(ctx.zones[i]['id'])
+
+
+# --- Mapa ---
+
+@case('map.geojson.volunteer')
+def geojson_volunteer(ctx):
+    return lambda i: zones_to_geojson(ctx.zones, 'volunteer', i)
+
+
+@case('map.geojson.coordinator')
+def geojson_coordinator(ctx):
+    return lambda i: zones_to_geojson(ctx.zones, 'coordinator', i)
+
+
+@case('map.tiles.coordinator')
+def tiles_coordinator(ctx):
+    """Teselas del modo escalable (grupos por zoom y features de detalle)"""
+    return lambda i: build_tiles(ctx.zones, 'coordinator')
+
+
+@case('map.component_delta', requires='component')
+def component_delta(ctx):
+    """Features de una versión nueva con una zona cambiada y delta respecto a la anterior"""
+    history = FeatureHistory()
+    previous = history.get('coordinator', 0, ctx.zones)
+
+    def operation(i):
+        zones = list(ctx.zones)
+        zones[0] = dict(zones[0], volunteer_count=i)
+        current = history.get('coordinator', i + 1, zones)
+        return _delta(previous, current)
+    return operation
+
+
+# --- Estadísticas del panel de administración ---
+
+def all_aggregates(stats):
+    stats.status_counts()
+    stats.volunteers()
+    stats.need_frequencies()
+    stats.by_municipality()
+
+
+@case('stats.build')
+def stats_build(ctx):
+    return lambda i: all_aggregates(ZoneStats(ctx.zones, i))
+
+
+@case('stats.cached', scaling='1')
+def stats_cached(ctx):
+    cache = ZoneStatsCache()
+    all_aggregates(cache.get(ctx.snapshot))
+    return lambda i: all_aggregates(cache.get(ctx.snapshot))
+
+
+@case('stats.compute_statuses')
+def stats_statuses(ctx):
+    return lambda i: compute_statuses(ctx.zones)
+
+
+# --- Ejecución ---
+
+def measure(operation, min_repeat, max_repeat, budget):
+    """Repite la operación hasta max_repeat veces o hasta agotar budget segundos"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeat:
+        start = time.perf_counter()
+        operation(len(samples))
+        samples.append((time.perf_counter() - start) * 1000)
+        if len(samples) >= min_repeat and time.perf_counter() - started > budget:
+            break
+    samples.sort()
+    return {
+        'median_ms': round(samples[len(samples) // 2], 4),
+        'min_ms': round(samples[0], 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        'repeat': len(samples)
+    }
+
+
+def unavailable(requirement):
+    return {'database': DATABASE_ERROR, 'component': COMPONENT_ERROR}.get(requirement)
+
+
+def run(args):
+    results, skipped = [], []
+    cases = [c for c in CASES if not args.only or any(text in c['name'] for text in args.only)]
+    for c in cases:
+        reason = unavailable(c['requires'])
+        if reason:
+            skipped.append({'case': c['name'], 'reason': reason})
+    for size in args.sizes:
+        ctx = Context(size, args.backend)
+        try:
+            for c in cases:
+                if unavailable(c['requires']):
+                    continue
+                max_repeat = min(args.max_repeat, size) if c['destructive'] else args.max_repeat
+                operation = c['fn'](ctx)
+                result = measure(operation, min(args.min_repeat, max_repeat), max_repeat, args.budget)
+                result.update({'case': c['name'], 'size': size, 'scaling': c['scaling']})
+                results.append(result)
+                print(f"{c['name']:<36}{size:>8}{result['median_ms']:>12.3f} ms", file=sys.stderr)
+        finally:
+            ctx.close()
+    return results, skipped
+
+
+def scaling_cliffs(results):
+    """Casos cuyo coste crece con las zonas más de lo esperado"""
+    cliffs = []
+    by_case = {}
+    for result in results:
+        by_case.setdefault(result['case'], []).append(result)
+    for name, rows in by_case.items():
+        rows.sort(key=lambda r: r['size'])
+        for small, large in zip(rows, rows[1:]):
+            growth = large['median_ms'] / max(small['median_ms'], NOISE_FLOOR_MS)
+            zones_growth = large['size'] / small['size']
+            if large['scaling'] == '1':
+                # Debería ser constante: se tolera hasta 3x por cachés y ruido
+                suspicious = growth > 3 and large['median_ms'] > 1
+            else:
+                # Lineal como mucho: se tolera el doble de lo que crecen las zonas
+                suspicious = small['size'] >= 1000 and growth > 2 * zones_growth
+            if suspicious:
+                cliffs.append({'case': name, 'from_size': small['size'], 'to_size': large['size'],
+                               'growth': round(growth, 2), 'zones_growth': zones_growth})
+    return cliffs
+
+
+def compare(results, baseline, threshold):
+    """Comparación con la línea base: ratio = mediana actual / mediana base"""
+    base = {(r['case'], r['size']): r for r in baseline.get('results', [])}
+    comparison = []
+    for result in results:
+        previous = base.get((result['case'], result['size']))
+        if previous is None:
+            continue
+        ratio = result['median_ms'] / max(previous['median_ms'], 1e-9)
+        diff = result['median_ms'] - previous['median_ms']
+        if ratio > 1 + threshold and diff > NOISE_FLOOR_MS:
+            verdict = 'regression'
+        elif ratio < 1 / (1 + threshold) and -diff > NOISE_FLOOR_MS:
+            verdict = 'improvement'
+        else:
+            verdict = 'same'
+        comparison.append({'case': result['case'], 'size': result['size'],
+                           'baseline_ms': previous['median_ms'], 'median_ms': result['median_ms'],
+                           'ratio': round(ratio, 3), 'verdict': verdict})
+    return comparison
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--only', nargs='+', help='Solo los casos cuyo nombre contenga alguno de estos textos')
+    parser.add_argument('--backend', choices=['emulator', 'memory'], default='emulator')
+    parser.add_argument('--min-repeat', type=int, default=3)
+    parser.add_argument('--max-repeat', type=int, default=30)
+    parser.add_argument('--budget', type=float, default=1.0, help='Segundos por caso y tamaño')
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto, stdout)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Guarda estos resultados como línea base')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Regresión a partir de +25%% por defecto')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    # Los mensajes que imprime la aplicación no deben mezclarse con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results, skipped = run(args)
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'sizes': args.sizes
+        },
+        'results': results,
+        'skipped': skipped,
+        'scaling_cliffs': scaling_cliffs(results)
+    }
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['baseline'] = {'commit': baseline.get('meta', {}).get('commit'),
+                              'threshold': args.threshold}
+        report['comparison'] = compare(results, baseline, args.threshold)
+        report['regressions'] = [c for c in report['comparison'] if c['verdict'] == 'regression']
+
+    raw = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            f.write(raw + '\n')
+        print(f'Línea base guardada en {args.baseline}', file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(raw + '\n')
+    elif not args.save_baseline:
+        print(raw)
+
+    for skip in skipped:
+        print(f"omitido {skip['case']}: {skip['reason']}", file=sys.stderr)
+    for cliff in report['scaling_cliffs']:
+        print(f"SALTO DE ESCALA {cliff['case']}: x{cliff['growth']} de {cliff['from_size']} "
+              f"a {cliff['to_size']} zonas", file=sys.stderr)
+    for regression in report.get('regressions', []):
+        print(f"REGRESIÓN {regression['case']} ({regression['size']} zonas): "
+              f"{regression['baseline_ms']} -> {regression['median_ms']} ms (x{regression['ratio']})",
+              file=sys.stderr)
+    if args.fail_on_regression and report.get('regressions'):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+# benchmarks/zone_write_drill.py
+"""Altas, bajas y cambios de zonas concurrentes: ningún cambio perdido.
+
+Comprueba contra el emulador de Firebase que add_new_zone y delete_zone, que
+escriben solo la zona afectada en lugar de reescribir /zones, no pierden ni
+revierten escrituras con varios escritores a la vez:
+1. --clients clientes (como procesos distintos, cada uno con su propio
+   EmergencyDatabase) con --threads hilos cada uno añaden --adds zonas: cada
+   alta obtiene un ID distinto, todas están en el servidor y ninguna zona
+   existente se sobrescribe.
+2. Mientras unos hilos borran --deletes zonas, otros cambian las notas de
+   acceso de otras zonas y suman voluntarios (--updates cambios): las zonas
+   borradas no reaparecen y ningún cambio se revierte.
+3. Borrar una zona que no existe devuelve False.
+
+Uso: python benchmarks/zone_write_drill.py [--zones 200] [--clients 4]
+     [--threads 4] [--adds 200] [--deletes 100] [--updates 400] [--seed 0]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import synthetic_zones
+from config import CENTER_LAT, CENTER_LON
+from database import EmergencyDatabase
+from firebase_emulator import FirebaseEmulator
+from storage import create_backend
+
+
+def check(condition, message):
+    print(f"  {'OK ' if condition else 'FALLO'} {message}")
+    return condition
+
+
+def run_parallel(workers, tasks):
+    """Ejecuta las tareas a la vez y devuelve (resultados, segundos)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(lambda task: task(), tasks))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zones', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--adds', type=int, default=200)
+    parser.add_argument('--deletes', type=int, default=100)
+    parser.add_argument('--updates', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    workers = args.clients * args.threads
+
+    zones = synthetic_zones(args.zones, seed=args.seed)
+    emulator = FirebaseEmulator(data={'zones': {zone['id']: zone for zone in zones}}).start()
+    tree = emulator.tree
+    clients = [
+        EmergencyDatabase(create_backend('firebase', db_url=emulator.url), background=False)
+        for _ in range(args.clients)
+    ]
+
+    ok = True
+    print(f"{args.zones} zonas, {args.clients} clientes × {args.threads} hilos")
+
+    # --- Altas simultáneas ---
+    def add(i):
+        return lambda: clients[i % len(clients)].add_new_zone({
+            'name': f'Nueva {i}', 'latitude': CENTER_LAT, 'longitude': CENTER_LON
+        })
+
+    results, elapsed = run_parallel(workers, [add(i) for i in range(args.adds)])
+    server = tree.get(['zones'])
+    new_names = sorted(zone['name'] for zone in server.values() if zone['name'].startswith('Nueva '))
+    ok &= check(all(results), f"{args.adds} altas aceptadas en {elapsed * 1000:.0f} ms")
+    ok &= check(new_names == sorted(f'Nueva {i}' for i in range(args.adds)),
+                "cada alta está en el servidor una sola vez (IDs distintos)")
+    ok &= check(all(server[zone['id']]['name'] == zone['name'] for zone in zones),
+                "ninguna zona existente sobrescrita")
+
+    # --- Bajas mientras otros escriben ---
+    ids = [zone['id'] for zone in zones]
+    deleted = set(rng.sample(ids, min(args.deletes, len(ids) // 2)))
+    kept = [zone_id for zone_id in ids if zone_id not in deleted]
+    noted = kept[:min(args.updates // 2, len(kept))]
+    by_id = {zone['id']: zone for zone in zones}
+    expected_counts = {zone_id: by_id[zone_id]['volunteer_count'] for zone_id in kept}
+
+    def delete(zone_id, db):
+        return lambda: db.delete_zone(zone_id)
+
+    def note(zone_id, db):
+        return lambda: db.update_zone(zone_id, {'access_notes': f'Nota {zone_id}'})
+
+    def increment(zone_id, delta, db):
+        base = dict(by_id[zone_id])
+        return lambda: db.update_zone(
+            zone_id, dict(base, volunteer_count=base['volunteer_count'] + delta), base=base
+        )
+
+    tasks = [delete(zone_id, rng.choice(clients)) for zone_id in deleted]
+    tasks += [note(zone_id, rng.choice(clients)) for zone_id in noted]
+    for _ in range(args.updates - len(noted)):
+        zone_id, delta = rng.choice(kept), rng.randint(1, 5)
+        expected_counts[zone_id] += delta
+        tasks.append(increment(zone_id, delta, rng.choice(clients)))
+    rng.shuffle(tasks)
+
+    results, elapsed = run_parallel(workers, tasks)
+    server = tree.get(['zones'])
+    ok &= check(all(results), f"{len(deleted)} bajas y {len(tasks) - len(deleted)} cambios "
+                f"aceptados en {elapsed * 1000:.0f} ms")
+    ok &= check(not deleted & set(server), "las zonas borradas no reaparecen")
+    ok &= check(all(server[zone_id]['access_notes'] == f'Nota {zone_id}' for zone_id in noted),
+                "ningún cambio de notas revertido por una baja")
+    ok &= check(all(server[zone_id]['volunteer_count'] == count
+                    for zone_id, count in expected_counts.items()),
+                "voluntarios: ningún incremento perdido")
+    ok &= check(len(server) == args.zones + args.adds - len(deleted), "número final de zonas")
+
+    ok &= check(clients[0].delete_zone(next(iter(deleted))) is False,
+                "borrar una zona que no existe devuelve False")
+
+    emulator.stop()
+    print('Simulacro superado' if ok else 'Simulacro FALLIDO')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+# cache_manager.py
+"""Registro de las cachés compartidas del proceso, cada una con su nombre.
+
+Cada caché se invalida por separado: una escritura de zonas solo caduca la
+instantánea de zonas, el botón "Actualizar Datos" pide un refresco que se
+comparte con el resto de sesiones y el administrador puede vaciar una caché
+concreta desde Mantenimiento, sin que ninguna acción vacíe todas a la vez.
+
+Las cachés registradas deben tener invalidate() y stats(); refresh() es
+opcional (si no lo tienen, refrescar equivale a invalidar).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedValue:
+    """Un valor compartido que se obtiene con fetch() y caduca a los max_age segundos.
+
+    Como ZoneSnapshotCache, como mucho un hilo llama a fetch() a la vez y el
+    resto reutiliza lo que este obtenga.
+    """
+
+    def __init__(self, fetch, max_age):
+        self._fetch = fetch
+        self.max_age = max_age
+        self._value = None
+        self._fetched_at = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self.fetch_count = 0
+        self.hits = 0
+
+    def _is_fresh(self):
+        return (self._fetched_at is not None and not self._stale and
+                time.monotonic() - self._fetched_at < self.max_age)
+
+    def get(self):
+        if self._is_fresh():
+            self.hits += 1
+            return self._value
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._value
+            self._stale = False
+            started = time.monotonic()
+            try:
+                self._value = self._fetch()
+            except Exception:
+                # Sin valor nuevo: la siguiente lectura vuelve a intentarlo
+                self._stale = True
+                raise
+            self._fetched_at = started
+            self.fetch_count += 1
+            return self._value
+
+    def invalidate(self):
+        self._stale = True
+
+    def stats(self):
+        return {
+            'fetches': self.fetch_count,
+            'hits': self.hits,
+            'age_s': round(time.monotonic() - self._fetched_at, 1) if self._fetched_at is not None else None,
+            'stale': self._stale
+        }
+
+
+class CacheManager:
+    """Cachés del proceso por nombre: 'zones', 'coordinators', 'maps'..."""
+
+    def __init__(self):
+        self._caches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, name, cache, description=''):
+        """Registra (o sustituye, si se reconstruye su dueño) una caché"""
+        with self._lock:
+            self._caches[name] = (cache, description)
+        return cache
+
+    def get(self, name):
+        with self._lock:
+            entry = self._caches.get(name)
+        if entry is None:
+            raise ValueError(f"Caché desconocida: {name}")
+        return entry[0]
+
+    def names(self):
+        with self._lock:
+            return list(self._caches)
+
+    def invalidate(self, name):
+        """Caduca solo la caché indicada; las demás siguen sirviendo"""
+        self.get(name).invalidate()
+
+    def refresh(self, name):
+        cache = self.get(name)
+        refresh = getattr(cache, 'refresh', None)
+        if refresh is not None:
+            return refresh()
+        cache.invalidate()
+
+    def stats(self):
+        with self._lock:
+            caches = list(self._caches.items())
+        return [
+            {'name': name, 'description': description, **cache.stats()}
+            for name, (cache, description) in caches
+        ]
+
+
+# Instancia única del proceso
+cache_manager = CacheManager()
@@ -0,0 +1,209 @@
+# checkins.py
+
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from config import (
+    CHECKIN_COUNTER_SHARDS, CHECKIN_ROLLUP_INTERVAL, CHECKIN_LEASE_SECONDS, CAS_MAX_ATTEMPTS
+)
+
+# Eventos de llegada/salida, solo se añaden: checkins/{zone_id}/{clave}
+CHECKINS_PATH = 'checkins'
+# Contadores repartidos por zona pendientes de volcar: checkin_counters/{zone_id}/s{n}
+COUNTERS_PATH = 'checkin_counters'
+# Turno del proceso que vuelca los contadores en las zonas
+LEASE_PATH = 'meta/checkin_rollup'
+
+
+def _has_pending(counters):
+    """Si algún contador tiene llegadas o salidas sin volcar (tras volcarlos quedan a 0)"""
+    return any(
+        isinstance(value, (int, float)) and value
+        for shards in counters.values() if isinstance(shards, dict)
+        for value in shards.values()
+    )
+
+
+def event_key():
+    """Clave única y ordenada por tiempo para un evento"""
+    return f'{time.time_ns():020d}-{uuid.uuid4().hex[:8]}'
+
+
+class CheckinLog:
+    """Llegadas y salidas de voluntarios con contadores repartidos por zona.
+
+    Cada registro es un único PATCH multi-ruta que añade el evento y suma +1/-1
+    a uno de los contadores de la zona elegido al azar: ningún registro lee
+    datos ni compite por el mismo nodo. rollup() vuelca los contadores en
+    zones/{id}/volunteer_count restando a cada contador lo que se suma a la
+    zona, en la misma escritura atómica, así que los registros que llegan
+    mientras tanto no se pierden.
+
+    Quién está en cada zona solo lo sabe la sesión del voluntario: las llegadas
+    de sesiones abandonadas sin registrar la salida no caducan y siguen
+    contando hasta que un coordinador corrige volunteer_count.
+
+    send es la función que envía las peticiones (EmergencyDatabase._send).
+    """
+
+    def __init__(self, send, shards=CHECKIN_COUNTER_SHARDS, owner=None):
+        self._send = send
+        self.shards = shards
+        self.owner = owner or uuid.uuid4().hex
+        self.rollups = 0
+        self.last_rollup = None
+
+    def _event_paths(self, zone_id, volunteer_id, action, delta):
+        shard = random.randrange(self.shards)
+        return {
+            f'{CHECKINS_PATH}/{zone_id}/{event_key()}': {
+                'volunteer': volunteer_id,
+                'action': action,
+                'at': str(datetime.now())
+            },
+            # Claves 's0', 's1'... para que Firebase no las convierta en un array
+            f'{COUNTERS_PATH}/{zone_id}/s{shard}': {'.sv': {'increment': delta}}
+        }
+
+    def _patch(self, paths):
+        response = self._send('PATCH', '', paths)
+        return response.status_code == 200
+
+    def check_in(self, zone_id, volunteer_id, previous_zone=None):
+        """Registra la llegada a una zona (y la salida de previous_zone, si se indica).
+
+        Volver a registrar la llegada a la zona en la que ya está no escribe nada.
+        """
+        if previous_zone == zone_id:
+            return True
+        paths = self._event_paths(zone_id, volunteer_id, 'in', 1)
+        if previous_zone:
+            paths.update(self._event_paths(previous_zone, volunteer_id, 'out', -1))
+        return self._patch(paths)
+
+    def check_out(self, zone_id, volunteer_id):
+        """Registra la salida de una zona"""
+        return self._patch(self._event_paths(zone_id, volunteer_id, 'out', -1))
+
+    def pending_counts(self):
+        """{zone_id: llegadas menos salidas aún no volcadas en volunteer_count}"""
+        return {
+            zone_id: sum(v for v in shards.values() if isinstance(v, (int, float)))
+            for zone_id, shards in self._read_counters().items()
+            if isinstance(shards, dict)
+        }
+
+    def events(self, zone_id, limit=50):
+        """Últimos eventos de una zona, del más antiguo al más reciente"""
+        response = self._send('GET', f'{CHECKINS_PATH}/{zone_id}', params={
+            'orderBy': '"$key"', 'limitToLast': limit
+        })
+        response.raise_for_status()
+        events = response.json() or {}
+        return [events[key] for key in sorted(events)]
+
+    def _acquire_lease(self):
+        """Toma (o renueva) el turno de volcado si está libre, caducado o ya es nuestro"""
+        response = self._send('GET', LEASE_PATH, headers={'X-Firebase-ETag': 'true'})
+        response.raise_for_status()
+        lease, etag = response.json(), response.headers.get('ETag')
+        for _ in range(CAS_MAX_ATTEMPTS):
+            if lease and lease.get('owner') != self.owner and lease.get('expires', 0) > time.time():
+                return False
+            response = self._send('PUT', LEASE_PATH, {
+                'owner': self.owner,
+                'expires': time.time() + CHECKIN_LEASE_SECONDS
+            }, headers={'X-Firebase-ETag': 'true', 'if-match': etag})
+            if response.status_code != 412:
+                response.raise_for_status()
+                return True
+            lease, etag = response.json(), response.headers.get('ETag')
+        return False
+
+    def _read_counters(self):
+        """Contadores por zona y fragmento, tal como están en el servidor"""
+        response = self._send('GET', COUNTERS_PATH)
+        response.raise_for_status()
+        return response.json() or {}
+
+    def rollup(self):
+        """Vuelca los contadores pendientes en volunteer_count.
+
+        Devuelve {zone_id: voluntarios sumados} o None si otro proceso tiene el
+        turno. Los contadores de zonas que ya no existen se descartan. Sin
+        llegadas ni salidas pendientes no se toma el turno: un sistema en
+        reposo solo lee los contadores, no escribe.
+        """
+        if not _has_pending(self._read_counters()):
+            self._finish_rollup()
+            return {}
+        if not self._acquire_lease():
+            return None
+
+        # Otro proceso pudo volcarlos antes de que tuviéramos el turno
+        counters = self._read_counters()
+        if not _has_pending(counters):
+            self._finish_rollup()
+            return {}
+
+        response = self._send('GET', 'zones', params={'shallow': 'true'})
+        response.raise_for_status()
+        existing = response.json() or {}
+
+        paths = {}
+        deltas = {}
+        for zone_id, shards in counters.items():
+            if not isinstance(shards, dict):
+                continue
+            total = 0
+            for shard, value in shards.items():
+                if isinstance(value, (int, float)) and value:
+                    paths[f'{COUNTERS_PATH}/{zone_id}/{shard}'] = {'.sv': {'increment': -value}}
+                    total += value
+            if total and zone_id in existing:
+                paths[f'zones/{zone_id}/volunteer_count'] = {'.sv': {'increment': total}}
+                paths[f'zones/{zone_id}/last_update'] = str(datetime.now())
+                deltas[zone_id] = total
+
+        if paths and not self._patch(paths):
+            raise ConnectionError("No se pudieron volcar los contadores de llegadas")
+        self._finish_rollup()
+        return deltas
+
+    def _finish_rollup(self):
+        self.rollups += 1
+        self.last_rollup = time.time()
+
+
+class CheckinRollupThread:
+    """Hilo que vuelca los contadores cada CHECKIN_ROLLUP_INTERVAL segundos.
+
+    on_rollup recibe el resultado de rollup() cuando alguna zona cambió.
+    """
+
+    def __init__(self, log, on_rollup=None, interval=CHECKIN_ROLLUP_INTERVAL):
+        self.log = log
+        self.on_rollup = on_rollup
+        self.interval = interval
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='checkin-rollup', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                deltas = self.log.rollup()
+                if deltas and self.on_rollup:
+                    self.on_rollup(deltas)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error volcando llegadas de voluntarios: {e}")
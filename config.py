@@ -1,5 +1,7 @@
 # config.py
 
+import os
+
 # Coordenadas centrales de Valencia
 # Estas coordenadas centrarán nuestro mapa en la zona afectada
 CENTER_LAT = 39.424540
@@ -36,4 +38,121 @@ ZONE_STATES = [
     'overflow',  # Rojo - Demasiados voluntarios, redirigir
     'needed',    # Verde - Se necesitan voluntarios
     'optimal'    # Amarillo - Número adecuado de voluntarios
-]
\ No newline at end of file
+]
+
+# Umbrales de estado según el número de voluntarios
+# Menos de STATUS_NEEDED_BELOW: se necesitan voluntarios.
+# Más de STATUS_OVERFLOW_ABOVE: exceso de voluntarios.
+# Cada zona puede fijar su propia capacidad con los campos
+# 'min_volunteers' y 'max_volunteers', que sustituyen a estos valores.
+STATUS_NEEDED_BELOW = 50
+STATUS_OVERFLOW_ABOVE = 150
+# Histéresis: fracción del umbral que hay que rebasar para cambiar de estado,
+# para que una zona que oscila alrededor de un umbral no cambie de color
+# con cada voluntario que entra o sale
+STATUS_HYSTERESIS = 0.1
+
+# Backend de almacenamiento (storage.py)
+# 'firebase': Realtime Database por REST (credenciales en st.secrets)
+# 'memory': en memoria del proceso, sin red (pruebas y benchmarks)
+# 'sqlite': en memoria con cada escritura guardada en STORAGE_SQLITE_PATH
+STORAGE_BACKEND = 'firebase'
+STORAGE_SQLITE_PATH = 'storage.db'   # Relativa a la carpeta del proyecto
+
+# URL de Realtime Database para el backend 'firebase'. Si se define la variable
+# de entorno EMERGENCY_DB_URL (p. ej. el emulador local firebase_emulator.py),
+# se usa en lugar de st.secrets["firebase"]["databaseURL"] y no se necesitan
+# credenciales de servicio.
+DATABASE_URL = os.environ.get('EMERGENCY_DB_URL')
+
+# Configuración del transporte HTTP hacia Realtime Database
+# Tiempos en segundos: (conexión, lectura)
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 10
+HTTP_POOL_SIZE = 20            # Conexiones keep-alive por host
+HTTP_MAX_RETRIES = 3           # Reintentos ante errores de red, 5xx y 429 (no en PATCH)
+HTTP_BACKOFF_FACTOR = 0.3      # Espera entre reintentos: 0.3s, 0.6s, 1.2s...
+HTTP_RETRY_STATUS = [429, 500, 502, 503, 504]
+HTTP_GZIP = True               # Pedir respuestas comprimidas con gzip
+HTTP_LATENCY_WINDOW = 1000     # Muestras usadas para calcular p50/p99
+
+# Caché compartida de zonas
+# Segundos que una instantánea de zonas se sirve sin volver a consultar Firebase.
+# Las escrituras de zonas la invalidan al momento.
+ZONES_REFRESH_INTERVAL = 30
+# Los refrescos que piden los usuarios ("Actualizar Datos") dentro de esta
+# ventana de segundos reutilizan la misma consulta en lugar de lanzar otra
+ZONES_REFRESH_COALESCE = 2
+
+# Lista de coordinadores compartida entre sesiones (segundos). Las altas,
+# bajas y cambios de coordinadores la invalidan al momento.
+COORDINATORS_CACHE_TTL = 60
+
+# Escucha en tiempo real (streaming SSE de Realtime Database)
+# Mantiene en memoria una copia de estos nodos para leer sin ir a la red
+REALTIME_STREAM_ENABLED = True
+REALTIME_PATHS = ['zones', 'coordinators']
+REALTIME_READ_TIMEOUT = 90         # Firebase envía keep-alive cada ~30s
+REALTIME_RECONNECT_DELAY = 1       # Espera inicial antes de reconectar
+REALTIME_RECONNECT_MAX_DELAY = 30  # Espera máxima entre reconexiones
+
+# Caché de ETags por ruta para GET condicionales
+ETAG_CACHE_MAX_PATHS = 256
+
+# Reintentos de las escrituras condicionales (compare-and-set con ETag)
+CAS_MAX_ATTEMPTS = 10
+
+# Caché de los datos de mapa ya generados (GeoJSON por vista y versión)
+MAP_CACHE_MAX_ENTRIES = 32
+MAP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Mapa escalable (agrupación por nivel de zoom) para muchas zonas
+SCALABLE_MAP_THRESHOLD = 300   # A partir de este número de zonas se usa el modo escalable
+CLUSTER_MIN_ZOOM = 8
+CLUSTER_MAX_ZOOM = 14          # Por encima de este zoom se muestran las zonas individuales
+CLUSTER_CELL_PX = 60           # Tamaño en píxeles de cada celda de agrupación
+CLUSTER_TILE_CELLS = 16        # Celdas por lado de cada tesela que descarga el mapa
+
+# Versiones de features que se guardan para enviar al mapa solo los cambios
+MAP_DELTA_HISTORY = 8
+
+# Registro de llegadas y salidas de voluntarios (check-in / check-out)
+# Cada registro incrementa uno de CHECKIN_COUNTER_SHARDS contadores de la zona,
+# elegido al azar, para que muchos registros simultáneos no escriban en el
+# mismo nodo. Cada CHECKIN_ROLLUP_INTERVAL segundos los contadores se vuelcan
+# en volunteer_count (un solo proceso a la vez, con un turno que caduca).
+CHECKIN_COUNTER_SHARDS = 16
+CHECKIN_ROLLUP_ENABLED = True
+CHECKIN_ROLLUP_INTERVAL = 5
+CHECKIN_LEASE_SECONDS = 30
+
+# Historial de cambios de las zonas
+# Cada cambio añade un registro compacto en history/{zone_id}/{hora}/{clave};
+# las consultas por intervalo solo leen las horas que lo cubren.
+HISTORY_ENABLED = True
+HISTORY_TIMEZONE = 'Europe/Madrid'   # Zona horaria de las series por hora
+
+# Copia local sin conexión (SQLite en modo WAL)
+# Las lecturas de zonas se sirven siempre desde la copia local, que un hilo
+# sincroniza con Firebase; los cambios que no se pueden enviar por falta de
+# conexión se guardan en una cola y se envían por lotes al volver.
+OFFLINE_STORE_ENABLED = True
+OFFLINE_STORE_PATH = 'local_store.db'   # Relativa a la carpeta del proyecto
+OFFLINE_SYNC_INTERVAL = 5               # Segundos entre sincronizaciones
+OFFLINE_FLUSH_BATCH = 200               # Cambios pendientes por PATCH
+
+# Trazas de rendimiento (tracing.py)
+# Destinos: 'ring' (búfer en memoria que muestra la pestaña Rendimiento del
+# administrador), 'log' (logger TRACE_LOGGER) y 'otlp' (colector de
+# OpenTelemetry por OTLP/HTTP JSON en TRACE_OTLP_ENDPOINT).
+TRACE_ENABLED = True
+TRACE_SINKS = ['ring']
+TRACE_SAMPLE_RATE = 1.0        # Fracción de trazas que se guardan
+TRACE_SAMPLE_RATES = {}        # Por operación, p. ej. {'db.request': 0.1}
+TRACE_SLOW_MS = 1000           # Las operaciones más lentas se guardan siempre
+TRACE_RING_SIZE = 5000         # Spans que se conservan en memoria
+TRACE_LOGGER = 'emergencias.trace'
+TRACE_OTLP_ENDPOINT = os.environ.get('OTEL_EXPORTER_OTLP_TRACES_ENDPOINT')
+TRACE_OTLP_BATCH = 256         # Spans por envío al colector
+TRACE_OTLP_INTERVAL = 5        # Segundos entre envíos
+TRACE_SERVICE_NAME = 'emergencias-valencia'
@@ -1,10 +1,10 @@
 # coordinator_view.py
 
 import streamlit as st
-import folium
+import pandas as pd
 from datetime import datetime
-from database import EmergencyDatabase
-from config import CENTER_LAT, CENTER_LON
+from database import get_database
+from map_component import zone_map
 
 # Lista de necesidades común
 COMMON_NEEDS = [
@@ -21,72 +21,187 @@ COMMON_NEEDS = [
     "Productos de higiene"
 ]
 
-def create_map(zones):
-    """Crea el mapa con las zonas marcadas"""
-    if not zones:
+def show_map(snapshot, height, key='coordinator_map', selectable=False):
+    """Muestra el mapa con las zonas marcadas y devuelve la zona pulsada, si la hay"""
+    if not snapshot.zones:
         print("No hay zonas para mostrar")
-        return ""
+        return None
     
-    m = folium.Map(location=[CENTER_LAT, CENTER_LON], zoom_start=12)
-    
-    for zone in zones:
-        try:
-            if not all(k in zone for k in ['status', 'latitude', 'longitude', 'name']):
-                print(f"Zona con datos incompletos: {zone}")
-                continue
-
-            color = {
-                'overflow': 'red',
-                'needed': '#008000',
-                'optimal': 'orange'
-            }.get(zone['status'], 'gray')
-            
-            popup_text = f"""
-                <div style="font-family: Arial, sans-serif; min-width: 200px; max-width: 300px;">
-                    <h4 style="margin: 0; color: #2C3E50; border-bottom: 2px solid #3498DB; padding-bottom: 5px;">
-                        {zone['name']}
-                    </h4>
-                    <div style="margin-top: 10px;">
-                        <b style="color: #34495E;">Voluntarios:</b> {zone['volunteer_count']}<br>
-                        <b style="color: #34495E;">Estado:</b> {zone['status']}<br>
-                        <b style="color: #34495E;">Acceso:</b> {zone['access_notes']}<br>
-                        <b style="color: #34495E;">Necesidades por cubrir:</b><br>
-                        {format_needs(zone.get('pending_needs', []))}<br>
-                        <b style="color: #34495E;">Necesidades cubiertas:</b><br>
-                        {format_needs(zone.get('covered_needs', []))}<br>
-                        <small style="color: #7F8C8D;">Última actualización: {zone.get('last_update', 'N/A')}</small>
-                    </div>
-                </div>
-            """
-            
-            marker = folium.CircleMarker(
-                location=[zone['latitude'], zone['longitude']],
-                radius=15,
-                color=color,
-                fill=True,
-                popup=popup_text
+    # Mapa persistente: entre reruns solo recibe las zonas que cambiaron
+    value = zone_map('coordinator', snapshot, height=height, key=key, selectable=selectable)
+    return value.get('selected') if value else None
+
+def bulk_edit_panel(db, snapshot):
+    """Tabla editable para actualizar varias zonas en un solo envío"""
+    # Las zonas tal como se dibujó la tabla: base de los incrementos y de la
+    # detección de conflictos. En el rerun del envío la instantánea puede traer
+    # ya cambios de otros, así que solo se renuevan cuando no se está enviando
+    if 'bulk_bases' not in st.session_state or not st.session_state.get('bulk_submit'):
+        if st.session_state.get('bulk_bases_version') != snapshot.version:
+            st.session_state['bulk_bases'] = {zone['id']: zone for zone in snapshot.zones if 'id' in zone}
+            st.session_state['bulk_bases_version'] = snapshot.version
+            # Las ediciones de la tabla se guardan por fila: se descartan con los datos viejos
+            st.session_state.pop('bulk_editor', None)
+    bases = st.session_state['bulk_bases']
+
+    rows = [
+        {
+            'id': zone['id'],
+            'Zona': zone['name'],
+            'Voluntarios': zone.get('volunteer_count', 0),
+            'Notas de Acceso': zone.get('access_notes', '')
+        }
+        for zone in bases.values()
+    ]
+    if not rows:
+        st.info("No hay zonas editables")
+        return
+    original = pd.DataFrame(rows).set_index('id')
+
+    with st.form("bulk_edit_form"):
+        edited = st.data_editor(
+            original,
+            disabled=['Zona'],
+            column_config={
+                'Voluntarios': st.column_config.NumberColumn(min_value=0, step=1)
+            },
+            use_container_width=True,
+            key="bulk_editor"
+        )
+        if st.form_submit_button("Guardar todos los cambios", use_container_width=True, key="bulk_submit"):
+            updates = {}
+            for zone_id, row in edited.iterrows():
+                before = original.loc[zone_id]
+                changes = {}
+                if row['Voluntarios'] != before['Voluntarios']:
+                    # batch_update lo envía como incremento respecto a la zona
+                    # que muestra la tabla, y recalcula el estado
+                    changes['volunteer_count'] = int(row['Voluntarios'])
+                if row['Notas de Acceso'] != before['Notas de Acceso']:
+                    changes['access_notes'] = row['Notas de Acceso']
+                if changes:
+                    updates[zone_id] = changes
+
+            if not updates:
+                st.info("No hay cambios que guardar")
+            else:
+                result = db.batch_update(updates, bases=bases)
+                if result:
+                    st.session_state.pop('bulk_conflict', None)
+                    st.success(f"{len(updates)} zonas actualizadas!")
+                    st.rerun()
+                elif result.conflicts:
+                    # Guardar el intento para resolverlo fuera del formulario
+                    st.session_state.bulk_conflict = {
+                        'updates': updates,
+                        'bases': {zone_id: bases[zone_id] for zone_id in updates},
+                        'conflicts': result.conflicts,
+                        'current': result.current
+                    }
+                else:
+                    st.error("Error al guardar los cambios")
+
+    show_bulk_conflict_resolution(db)
+
+def show_bulk_conflict_resolution(db):
+    """Muestra los conflictos de una edición masiva y permite resolverlos"""
+    conflict = st.session_state.get('bulk_conflict')
+    if not conflict:
+        return
+
+    st.warning("⚠️ Otros coordinadores modificaron estas zonas mientras editabas la tabla:")
+    for zone_id, fields in conflict['conflicts'].items():
+        current = conflict['current'].get(zone_id) or {}
+        for field in fields:
+            st.write(
+                f"- **{conflict['bases'][zone_id].get('name', zone_id)}**, {field}: en el servidor "
+                f"`{current.get(field)}`, tu cambio `{conflict['updates'][zone_id].get(field)}`"
             )
-            marker.add_to(m)
-        except Exception as e:
-            print(f"Error procesando zona: {e}")
-    
-    return m._repr_html_()
 
-def format_needs(needs):
-    """Formatea la lista de necesidades para el popup"""
-    if not needs:
-        return "Ninguna registrada"
-    return "<br>".join(f"- {need}" for need in needs)
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Sobrescribir con mis cambios", key="bulk_conflict_overwrite"):
+            if db.batch_update(conflict['updates'], bases=conflict['bases'], force=True):
+                del st.session_state['bulk_conflict']
+                st.success(f"{len(conflict['updates'])} zonas actualizadas!")
+                st.rerun()
+            else:
+                st.error("Error al guardar los cambios")
+    with col2:
+        if st.button("Descartar mis cambios", key="bulk_conflict_discard"):
+            del st.session_state['bulk_conflict']
+            st.rerun()
+
+def show_conflict_resolution(db):
+    """Muestra un conflicto de edición concurrente y permite resolverlo"""
+    conflict = st.session_state.get('zone_conflict')
+    if not conflict:
+        return
+
+    st.warning(
+        f"⚠️ Otro coordinador modificó la zona {conflict['zone_name']} mientras la editabas. "
+        "Campos en conflicto:"
+    )
+    current = conflict['current'] or {}
+    for field in conflict['conflicts']:
+        st.write(
+            f"- **{field}**: en el servidor `{current.get(field)}`, "
+            f"tu cambio `{conflict['update_data'].get(field)}`"
+        )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Sobrescribir con mis cambios", key="conflict_overwrite"):
+            result = db.update_zone(
+                conflict['zone_id'], conflict['update_data'],
+                base=conflict['base'], force=True
+            )
+            if result:
+                del st.session_state['zone_conflict']
+                st.success(f"Zona {conflict['zone_name']} actualizada!")
+                st.rerun()
+            else:
+                st.error("Error al actualizar la zona")
+    with col2:
+        if st.button("Descartar mis cambios", key="conflict_discard"):
+            del st.session_state['zone_conflict']
+            st.rerun()
+
+def show_offline_status(db):
+    """Avisa de los cambios guardados sin conexión que aún no se han enviado"""
+    notice = st.session_state.pop('offline_notice', None)
+    if notice:
+        st.info(notice)
+    status = db.get_offline_status()
+    if not status:
+        return
+    if status['last_pull'] is None and status['online'] is False:
+        st.error(
+            "📴 Sin conexión y sin copia local: las zonas se mostrarán en cuanto "
+            "se pueda sincronizar."
+        )
+    if status['pending_writes']:
+        st.warning(
+            f"📴 {status['pending_writes']} cambios pendientes de enviar. "
+            "Se enviarán automáticamente al volver la conexión."
+        )
+    if status['conflicts']:
+        st.warning(
+            f"⚠️ {status['conflicts']} cambios hechos sin conexión chocan con otros "
+            "posteriores o el servidor los rechazó; un administrador debe revisarlos "
+            "en Mantenimiento."
+        )
 
 def coordinator_page():
     st.title("🚨 Coordinador de Emergencias Valencia")
     
     # Inicializar base de datos
-    db = EmergencyDatabase()
+    db = get_database()
+    show_offline_status(db)
     
-    # Obtener datos actuales
-    if 'zones_data' not in st.session_state:
-        st.session_state.zones_data = db.get_all_zones()
+    # Obtener datos actuales (instantánea compartida entre sesiones)
+    snapshot = db.get_zones_snapshot()
+    zones_data = list(snapshot.zones)
 
     # En dispositivos móviles, el mapa será más pequeño
     screen_width = st.session_state.get('browser_width', 1000)
@@ -96,25 +211,42 @@ def coordinator_page():
     # Contenedor para el mapa
     with st.container():
         st.subheader("Mapa de Zonas")
-        map_html = create_map(st.session_state.zones_data)
-        st.components.v1.html(map_html, height=map_height)
+        clicked_zone_id = show_map(snapshot, map_height, selectable=True)
 
     # Contenedor para el panel de control - justo debajo del mapa
     with st.container():
         st.subheader("Panel de Control")
         
-        if st.session_state.zones_data:
+        if zones_data:
+            # Al pulsar una zona en el mapa queda seleccionada en el panel
+            zone_ids = [zone.get('id') for zone in zones_data]
+            selected_index = zone_ids.index(clicked_zone_id) if clicked_zone_id in zone_ids else 0
             selected_zone = st.selectbox(
                 "Seleccionar Zona",
-                options=[zone['name'] for zone in st.session_state.zones_data]
+                options=[zone['name'] for zone in zones_data],
+                index=selected_index
             )
             
             current_zone = next(
-                (zone for zone in st.session_state.zones_data if zone['name'] == selected_zone),
+                (zone for zone in zones_data if zone['name'] == selected_zone),
                 None
             )
             
             if current_zone:
+                # La zona tal como se dibujó el formulario: base del compare-and-set.
+                # En el rerun del envío la instantánea puede traer ya el cambio de
+                # otro coordinador, así que solo se renueva cuando no se está enviando
+                zone_id = current_zone['id']
+                zone_bases = st.session_state.setdefault('zone_base', {})
+                if zone_id not in zone_bases or not st.session_state.get('update_submit'):
+                    if zone_bases.get(zone_id) != current_zone:
+                        zone_bases[zone_id] = dict(current_zone)
+                        # Los multiselect con clave conservan su valor: se reinician
+                        # para que muestren la misma versión que la base
+                        st.session_state.pop(f'pending_needs_{zone_id}', None)
+                        st.session_state.pop(f'covered_needs_{zone_id}', None)
+                shown_zone = zone_bases[zone_id]
+
                 with st.form("update_form"):
                     col1, col2, col3 = st.columns([2, 2, 3])
                     
@@ -122,13 +254,13 @@ def coordinator_page():
                         new_count = st.number_input(
                             "Número de Voluntarios",
                             min_value=0,
-                            value=current_zone['volunteer_count']
+                            value=shown_zone['volunteer_count']
                         )
                     
                     with col2:
                         new_notes = st.text_area(
                             "Notas de Acceso",
-                            value=current_zone['access_notes'],
+                            value=shown_zone['access_notes'],
                             height=100
                         )
                     
@@ -138,46 +270,63 @@ def coordinator_page():
                         tab1, tab2 = st.tabs(["Por cubrir", "Cubiertas"])
                         
                         with tab1:
-                            pending_needs = current_zone.get('pending_needs', [])
+                            pending_needs = shown_zone.get('pending_needs', [])
                             new_pending_needs = st.multiselect(
                                 "Seleccionar necesidades pendientes",
                                 options=COMMON_NEEDS,
                                 default=pending_needs if pending_needs else [],
-                                key="pending_needs"
+                                key=f"pending_needs_{zone_id}"
                             )
                         
                         with tab2:
-                            covered_needs = current_zone.get('covered_needs', [])
+                            covered_needs = shown_zone.get('covered_needs', [])
                             new_covered_needs = st.multiselect(
                                 "Seleccionar necesidades cubiertas",
                                 options=COMMON_NEEDS,
                                 default=covered_needs if covered_needs else [],
-                                key="covered_needs"
+                                key=f"covered_needs_{zone_id}"
                             )
                     
                     # Botón de actualizar centrado
                     submit_col1, submit_col2, submit_col3 = st.columns([1, 1, 1])
                     with submit_col2:
-                        if st.form_submit_button("Actualizar", use_container_width=True):
-                            if new_count > 150:
-                                new_status = 'overflow'
-                            elif new_count < 50:
-                                new_status = 'needed'
-                            else:
-                                new_status = 'optimal'
-                            
+                        if st.form_submit_button("Actualizar", use_container_width=True, key="update_submit"):
+                            # Solo campos editables; update_zone envía los que cambiaron
+                            # y recalcula el estado de la zona
                             update_data = {
-                                'name': current_zone['name'],
-                                'latitude': current_zone['latitude'],
-                                'longitude': current_zone['longitude'],
                                 'volunteer_count': new_count,
-                                'status': new_status,
                                 'access_notes': new_notes,
                                 'pending_needs': new_pending_needs,
                                 'covered_needs': new_covered_needs
                             }
                             
-                            if db.update_zone(current_zone['id'], update_data):
-                                st.session_state.zones_data = db.get_all_zones()
-                                st.success(f"Zona {selected_zone} actualizada!")
+                            result = db.update_zone(zone_id, update_data, base=shown_zone)
+                            if result:
+                                st.session_state.pop('zone_conflict', None)
+                                if result.queued:
+                                    st.session_state.offline_notice = (
+                                        f"💾 Sin conexión: el cambio de {selected_zone} se ha guardado "
+                                        "y se enviará al volver la conexión"
+                                    )
+                                else:
+                                    st.success(f"Zona {selected_zone} actualizada!")
                                 st.rerun()
+                            elif result.conflicts:
+                                # Guardar el intento para resolverlo fuera del formulario
+                                st.session_state.zone_conflict = {
+                                    'zone_id': zone_id,
+                                    'zone_name': selected_zone,
+                                    'update_data': update_data,
+                                    'base': shown_zone,
+                                    'conflicts': result.conflicts,
+                                    'current': result.current
+                                }
+                            else:
+                                st.error("Error al actualizar la zona")
+
+                show_conflict_resolution(db)
+
+        # Edición masiva: varias zonas en una sola petición
+        if zones_data:
+            with st.expander("📋 Edición masiva"):
+                bulk_edit_panel(db, snapshot)
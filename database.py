@@ -1,20 +1,135 @@
 # src/database.py
 
-import requests
+import hashlib
 import json
+import sys
+import threading
+import time
 from datetime import datetime
-import firebase_admin
-from firebase_admin import credentials, db
+import requests
 import streamlit as st
-from config import CENTER_LAT, CENTER_LON, INITIAL_ZONES 
+from config import (
+    CENTER_LAT, CENTER_LON, INITIAL_ZONES, REALTIME_STREAM_ENABLED, REALTIME_PATHS,
+    CAS_MAX_ATTEMPTS, CHECKIN_ROLLUP_ENABLED, HISTORY_ENABLED,
+    OFFLINE_STORE_ENABLED, OFFLINE_STORE_PATH, STORAGE_BACKEND, DATABASE_URL,
+    COORDINATORS_CACHE_TTL
+)
+from transport import PooledTransport, ETagCache
+from storage import create_backend
+from zone_cache import ZoneSnapshotCache
+from spatial_index import ZoneSpatialIndex
+from zone_stats import ZoneStatsCache
+from status_engine import compute_statuses, status_changes, zone_status
+from checkins import CheckinLog, CheckinRollupThread
+from zone_history import ZoneHistory, record_paths
+from local_store import LocalStore
+from offline_sync import OfflineSync, is_connectivity_error
+from tracing import tracer
+from cache_manager import CachedValue, cache_manager
+
+# Campos de una zona que pueden modificarse con update_zone.
+# El estado no está: lo calcula status_engine a partir de estos campos.
+ZONE_FIELDS = [
+    'name', 'latitude', 'longitude', 'volunteer_count', 'min_volunteers',
+    'max_volunteers', 'access_notes', 'pending_needs', 'covered_needs'
+]
+
+# Campos de los que depende el estado de la zona
+STATUS_FIELDS = ('volunteer_count', 'min_volunteers', 'max_volunteers')
+
+def _response_bytes(response):
+    """Bytes recibidos (comprimidos si vino con gzip); None en backends locales"""
+    length = response.headers.get('Content-Length')
+    if length is not None:
+        return int(length)
+    content = getattr(response, '_content', None)
+    return len(content) if isinstance(content, bytes) else None
+
+class ZoneUpdateResult:
+    """Resultado de update_zone; se evalúa como True si la zona se guardó.
+
+    conflicts lista los campos que otro usuario modificó entretanto y current
+    contiene la versión de la zona en el servidor, para resolver el conflicto
+    (en batch_update, ambos son diccionarios por zona).
+    queued indica que no había conexión y el cambio espera en la cola local.
+    """
+
+    def __init__(self, ok, conflicts=None, current=None, queued=False):
+        self.ok = ok
+        self.conflicts = conflicts or []
+        self.current = current
+        self.queued = queued
+
+    def __bool__(self):
+        return self.ok
 
 class EmergencyDatabase:
-    def __init__(self):
-        self.initialize_firebase()
-        self.db = db.reference('/')
-        self.db_url = st.secrets["firebase"]["databaseURL"]  # Añade esta línea
+    # Transporte HTTP compartido por todas las instancias del proceso
+    _transport = None
+    _transport_lock = threading.Lock()
+
+    def __init__(self, backend=None, background=True):
+        """backend: un StorageBackend de storage.py; por defecto, el de STORAGE_BACKEND.
+
+        Con background=False no se arrancan hilos (escucha en tiempo real,
+        volcado de llegadas, copia local): para benchmarks y pruebas.
+        """
+        self._admin_root = None
+        if backend is None:
+            backend = self._default_backend()
+        self.backend = backend
+        # URL para los clientes que leen Firebase directamente (None en backends locales)
+        self.db_url = getattr(backend, 'db_url', None)
+        # Cuerpos y ETags de las últimas lecturas, por ruta
+        self.etag_cache = ETagCache()
+        # True cuando ya se sabe que meta/zone_counter existe
+        self._zone_counter_seeded = False
+        # Instantánea de zonas compartida por todas las sesiones
+        self.zone_cache = ZoneSnapshotCache(self._fetch_zones)
+        # Índice espacial de las zonas, actualizado con cada instantánea nueva
+        self.spatial_index = ZoneSpatialIndex()
+        # Estadísticas de los paneles, calculadas una vez por versión de la instantánea
+        self.zone_stats = ZoneStatsCache()
+        # Lista de coordinadores compartida, invalidada con cada alta, baja o cambio
+        self.coordinator_cache = CachedValue(self._fetch_coordinators, COORDINATORS_CACHE_TTL)
+        # Espejos en memoria actualizados por streaming
+        self.listeners = {}
+        if REALTIME_STREAM_ENABLED and background:
+            self.start_realtime()
+        # Llegadas y salidas de voluntarios, volcadas periódicamente en las zonas
+        self.checkins = CheckinLog(self._send)
+        # Historial de cambios de las zonas, por horas
+        self.history = ZoneHistory(self._send)
+        # Copia local sin conexión: lecturas sin esperar a la red y cola de escrituras
+        self.offline = None
+        if OFFLINE_STORE_ENABLED and self.backend.remote and background:
+            self.start_offline_sync()
+        self._rollup_thread = None
+        if CHECKIN_ROLLUP_ENABLED and background:
+            self.start_checkin_rollup()
         #st.write(f"DEBUG: URL de la base de datos: {self.db_url}")
         
+    def _default_backend(self):
+        if STORAGE_BACKEND != 'firebase':
+            return create_backend(STORAGE_BACKEND)
+        if DATABASE_URL:
+            # URL fijada por configuración (emulador local): sin SDK de administración
+            return create_backend('firebase', db_url=DATABASE_URL, transport=self.get_transport())
+        # Todas las lecturas y escrituras van por la API REST: el SDK de
+        # administración solo se inicializa si alguien usa self.db
+        return create_backend('firebase', db_url=st.secrets["firebase"]["databaseURL"],
+                              transport=self.get_transport())
+
+    @property
+    def db(self):
+        """Referencia raíz del SDK firebase_admin, inicializado en el primer uso"""
+        if self._admin_root is None:
+            from firebase_admin import db
+
+            self.initialize_firebase()
+            self._admin_root = db.reference('/')
+        return self._admin_root
+
     def get_firebase_config(self):
         return {
             "apiKey": st.secrets["firebase"]["apiKey"],
@@ -27,6 +142,10 @@ class EmergencyDatabase:
         }
         
     def initialize_firebase(self):
+        # firebase_admin tarda en importarse y solo lo necesita self.db
+        import firebase_admin
+        from firebase_admin import credentials
+
         if not firebase_admin._apps:
             try:
                 # Credenciales del Service Account
@@ -49,16 +168,184 @@ class EmergencyDatabase:
                 st.error(f"Error initializing Firebase: {e}")
                 return False
                 
+    @classmethod
+    def get_transport(cls):
+        """Devuelve el pool de conexiones compartido, creándolo la primera vez"""
+        if cls._transport is None:
+            with cls._transport_lock:
+                if cls._transport is None:
+                    cls._transport = PooledTransport()
+        return cls._transport
+
+    def start_realtime(self, paths=REALTIME_PATHS):
+        """Arranca la escucha en tiempo real de los nodos indicados"""
+        for path in paths:
+            if path not in self.listeners:
+                listener = self.backend.subscribe(path, on_change=self._on_realtime_change)
+                self.listeners[path] = listener
+                listener.start()
+
+    def stop_realtime(self):
+        for listener in self.listeners.values():
+            listener.stop()
+        self.listeners = {}
+
+    def start_checkin_rollup(self):
+        """Arranca el volcado periódico de llegadas en volunteer_count"""
+        if self._rollup_thread is None:
+            self._rollup_thread = CheckinRollupThread(self.checkins, on_rollup=self._on_checkin_rollup)
+            self._rollup_thread.start()
+
+    def stop_checkin_rollup(self):
+        if self._rollup_thread is not None:
+            self._rollup_thread.stop()
+            self._rollup_thread = None
+
+    def _on_checkin_rollup(self, deltas):
+        # Cambiaron los voluntarios de algunas zonas: se leen solo esas (el
+        # número final solo lo conoce el servidor) y se recalculan sus estados
+        self.invalidate_zones()
+        zones = []
+        for zone_id in deltas:
+            response = self._send('GET', f'zones/{zone_id}')
+            response.raise_for_status()
+            zone = response.json()
+            if zone:
+                zones.append(dict(zone, id=zone.get('id', zone_id)))
+        self._apply_local({zone['id']: zone for zone in zones})
+        self.reevaluate_statuses(zones)
+        self._record_history([(zone['id'], 'checkin', zone) for zone in zones])
+
+    def start_offline_sync(self):
+        """Abre la copia local y arranca su sincronización en segundo plano"""
+        if self.offline is None:
+            self.offline = OfflineSync(
+                self._send, LocalStore(OFFLINE_STORE_PATH),
+                mirror=lambda: self._read_mirror('zones'),
+                on_change=self.invalidate_zones,
+                history=HISTORY_ENABLED
+            )
+            self.offline.start()
+
+    def stop_offline_sync(self):
+        if self.offline is not None:
+            self.offline.stop()
+            self.offline = None
+
+    def get_offline_status(self):
+        """Estado de la copia local: conexión, cambios pendientes y conflictos"""
+        if self.offline is None:
+            return None
+        stats = self.offline.stats()
+        stats['conflict_list'] = self.offline.conflicts()
+        return stats
+
+    def resolve_offline_conflict(self, seq, keep_mine):
+        """Descarta un cambio sin conexión en conflicto o lo reenvía sobrescribiendo"""
+        if self.offline is None:
+            return False
+        resolved = self.offline.resolve_conflict(seq, keep_mine)
+        self.invalidate_zones()
+        return resolved
+
+    def _apply_local(self, changes):
+        """Lleva a la copia local escrituras que el servidor ya aceptó.
+
+        Las lecturas de zonas salen de la copia local: sin esto mostrarían la
+        versión anterior hasta la siguiente sincronización, y esa versión sería
+        la base de las siguientes escrituras condicionales. changes es
+        {zone_id: campos} (None borra la zona), como en LocalStore.apply_changes.
+        """
+        if self.offline is None or not changes:
+            return
+        try:
+            self.offline.store.apply_changes(changes)
+        except Exception as e:
+            print(f"Error actualizando la copia local: {e}")
+        # Traer cuanto antes lo que solo sabe el servidor (incrementos de otros)
+        self.offline.notify_change()
+
+    def _queue_offline(self, zone_id, fields, base=None):
+        """Guarda en la cola local un cambio que no se pudo enviar"""
+        self.offline.queue_update(zone_id, fields, base)
+        self.invalidate_zones()
+        print(f"Sin conexión: cambio de {zone_id} guardado en la cola local")
+
+    def _on_realtime_change(self, path):
+        if path == 'zones':
+            if self.offline is not None:
+                self.offline.notify_change()
+            self.invalidate_zones()
+        elif path == 'coordinators':
+            self.coordinator_cache.invalidate()
+
+    def register_caches(self):
+        """Publica las cachés de este cliente en cache_manager (solo el del proceso)"""
+        cache_manager.register('zones', self.zone_cache, 'Instantánea de zonas compartida')
+        cache_manager.register('zone_stats', self.zone_stats, 'Estadísticas de los paneles por versión')
+        cache_manager.register('coordinators', self.coordinator_cache, 'Lista de coordinadores')
+
+    def _read_mirror(self, path):
+        """Devuelve (True, datos) si el nodo está espejado en vivo, (False, None) si no"""
+        listener = self.listeners.get(path)
+        if listener is not None and listener.live:
+            return True, listener.get()
+        return False, None
+
+    def get_realtime_status(self):
+        return {
+            path: {
+                'live': listener.live,
+                'events_applied': listener.events_applied,
+                'reconnects': listener.reconnects
+            }
+            for path, listener in self.listeners.items()
+        }
+
+    def get_http_stats(self):
+        """Métricas del transporte: peticiones, reutilización, latencias y ETags"""
+        stats = self.backend.stats()
+        stats.update(self.etag_cache.stats())
+        return stats
+
+    def _send(self, method, path, data=None, headers=None, params=None):
+        """Envía la petición y devuelve la respuesta HTTP completa"""
+        with tracer.span('db.request', f"{method} {path.split('/')[0] or '/'}",
+                         method=method, path=path, backend=self.backend.name) as span:
+            response = self.backend.request(method, path, data, headers=headers, params=params)
+            span.set(status=response.status_code, bytes=_response_bytes(response))
+        if method != 'GET':
+            self.etag_cache.invalidate(path)
+        return response
+
+    def _get_with_etag(self, path):
+        """Lee una ruta junto con su ETag, para escrituras condicionales"""
+        response = self._send('GET', path, headers={'X-Firebase-ETag': 'true'})
+        response.raise_for_status()
+        return response.json(), response.headers.get('ETag')
+
+    def _put_if_match(self, path, data, etag):
+        """PUT condicional: solo escribe si el ETag de la ruta sigue siendo el indicado.
+
+        Devuelve (escrito, valor actual, ETag actual). Si otro cliente escribió
+        antes, Firebase responde 412 con el valor y el ETag vigentes.
+        """
+        response = self._send('PUT', path, data,
+                              headers={'X-Firebase-ETag': 'true', 'if-match': etag})
+        if response.status_code == 412:
+            return False, response.json(), response.headers.get('ETag')
+        response.raise_for_status()
+        return True, response.json(), response.headers.get('ETag')
+
     def _make_request(self, method, path, data=None):
-        url = f"{self.db_url}/{path}.json"
-        #st.write(f"DEBUG: Haciendo request a URL: {url}")
+        #st.write(f"DEBUG: Haciendo request a: {path}")
         try:
+            if method not in ('GET', 'PUT', 'PATCH'):
+                raise ValueError(f"Método no soportado: {method}")
             if method == 'GET':
-                response = requests.get(url)
-            elif method == 'PUT':
-                response = requests.put(url, json=data)
-            elif method == 'PATCH':
-                response = requests.patch(url, json=data)
+                return self._conditional_get(path)
+
+            response = self._send(method, path, data)
                 
             #st.write(f"DEBUG: Status code: {response.status_code}")
             #st.write(f"DEBUG: Respuesta: {response.text}")   
@@ -68,6 +355,46 @@ class EmergencyDatabase:
             print(f"Error en la solicitud: {e}")
             return None
 
+    def _conditional_get(self, path):
+        """GET que, si el servidor responde 304, reutiliza el último cuerpo sin descargarlo.
+
+        Realtime Database solo usa los ETags en las escrituras condicionales
+        (if-match): ignora If-None-Match y responde siempre 200 con el cuerpo
+        completo. La primera vez que devuelve el mismo ETag con 200 se desactiva
+        la caché de ETags, porque guardar y copiar cuerpos que nunca se reutilizan
+        solo añade trabajo. Contra Firebase, lo que ahorra lecturas es el espejo
+        en tiempo real; el emulador y los backends locales sí responden 304.
+        """
+        if not self.etag_cache.enabled:
+            response = self._send('GET', path)
+            response.raise_for_status()
+            return response.json() if response.status_code == 200 else None
+
+        headers = {'X-Firebase-ETag': 'true'}
+        cached_etag = self.etag_cache.etag_for(path)
+        if cached_etag:
+            headers['If-None-Match'] = cached_etag
+
+        response = self._send('GET', path, headers=headers)
+        if response.status_code == 304:
+            cached = self.etag_cache.hit(path)
+            if cached is not None:
+                return cached
+            # La entrada se descartó entretanto: leer de nuevo sin condición
+            response = self._send('GET', path, headers={'X-Firebase-ETag': 'true'})
+
+        if response.status_code != 200:
+            response.raise_for_status()
+            return None
+        etag = response.headers.get('ETag')
+        body = response.json()
+        if cached_etag and etag == cached_etag:
+            # Mismo contenido y aun así 200: el servidor ignora If-None-Match
+            self.etag_cache.disable()
+        else:
+            self.etag_cache.store(path, etag, body)
+        return body
+
     def clean_zones_data(self, zones_data):
         """Limpia los datos de las zonas removiendo valores null"""
         if not zones_data:
@@ -104,71 +431,426 @@ class EmergencyDatabase:
             
             # Actualizar Firebase con la nueva estructura
             result = self._make_request('PUT', 'zones', new_zones)
+            self.invalidate_zones()
             return result is not None
             
         except Exception as e:
             print(f"Error en la reestructuración: {e}")
             return False
 
+    def _fetch_zones(self):
+        """Descarga las zonas de Firebase sin pasar por la caché.
+
+        Un error de red o de Firebase se propaga (no se confunde con "no hay
+        zonas"): ZoneSnapshotCache sigue sirviendo la instantánea anterior.
+        """
+        if self.offline is not None:
+            # Copia local: nunca espera a la red (la sincroniza otro hilo)
+            zones = self.offline.read_zones()
+        else:
+            live, zones_data = self._read_mirror('zones')
+            if not live:
+                zones_data = self._conditional_get('zones')
+            zones = self.clean_zones_data(zones_data)
+        # Estado siempre coherente con los voluntarios, aunque otro cliente
+        # haya cambiado el número sin recalcularlo
+        for zone, status in zip(zones, compute_statuses(zones)):
+            zone['status'] = status
+        return zones
+
+    def get_zones_snapshot(self):
+        """Obtiene la instantánea compartida de zonas (datos, versión y ETag)"""
+        return self.zone_cache.get()
+
+    def invalidate_zones(self):
+        """Marca la caché de zonas como caducada tras una escritura"""
+        self.zone_cache.invalidate()
+
+    def refresh_zones(self):
+        """Refresco pedido por un usuario: una sola consulta para todos los que lo piden a la vez"""
+        if self.offline is not None:
+            # Adelanta la sincronización de la copia local en lugar de esperar al intervalo
+            self.offline.notify_change()
+        return self.zone_cache.refresh()
+
+    def get_zone_stats(self, snapshot=None):
+        """Estadísticas vectorizadas de la instantánea indicada (o de la vigente)"""
+        return self.zone_stats.get(snapshot or self.get_zones_snapshot())
+
+    def get_hourly_counts(self, zone_ids, hours=48):
+        """Voluntarios por hora de las zonas en las últimas horas (DataFrame, una columna por zona)"""
+        try:
+            start = time.time() - hours * 3600
+            return self.history.hourly_counts(zone_ids, start)
+        except Exception as e:
+            print(f"Error leyendo historial: {e}")
+            return None
+
+    def nearest_zones(self, lat, lon, k=5, status='needed'):
+        """Las k zonas más cercanas a (lat, lon) con el estado indicado.
+
+        Devuelve una lista de (zona, distancia en km) ordenada por distancia.
+        """
+        try:
+            self.spatial_index.sync(self.get_zones_snapshot())
+            return self.spatial_index.nearest(lat, lon, k, status)
+        except Exception as e:
+            print(f"Error buscando zonas cercanas: {e}")
+            return []
+
     def get_all_zones(self):
         """Obtiene todas las zonas de Firebase"""
         try:
-            zones_data = self._make_request('GET', 'zones')
-        
-            cleaned_data = self.clean_zones_data(zones_data)
-            #st.write(f"DEBUG: Datos limpiados: {cleaned_data}")
-        
-            return cleaned_data
+            return list(self.get_zones_snapshot().zones)
         except Exception as e:
             st.error(f"Error obteniendo zonas: {e}")
             return []
         
-    def update_zone(self, zone_id, data):
-        """Actualiza una zona específica"""
+    def _zone_key(self, zone_id):
+        """ID de la zona con el prefijo 'zone_'"""
+        zone_id = str(zone_id)
+        return zone_id if zone_id.startswith('zone_') else f"zone_{zone_id}"
+
+    def _normalize_zone_fields(self, data):
+        """Campos editables de una zona, con las listas de necesidades siempre como listas"""
+        fields = {}
+        for key in ZONE_FIELDS:
+            if key not in data:
+                continue
+            value = data[key]
+            if key in ('pending_needs', 'covered_needs'):
+                value = list(value) if value is not None else []  # Convertir explícitamente a lista
+            fields[key] = value
+        return fields
+
+    def _comparable_zone(self, zone):
+        """Campos de la zona para comparar versiones (Firebase no guarda listas vacías)"""
+        fields = self._normalize_zone_fields(zone)
+        fields.setdefault('pending_needs', [])
+        fields.setdefault('covered_needs', [])
+        return fields
+
+    def _snapshot_zone(self, zone_id):
+        """La zona tal como está en la instantánea compartida, o {} si no está"""
+        for zone in self.get_zones_snapshot().zones:
+            if zone.get('id') == zone_id:
+                return zone
+        return {}
+
+    def _record_history(self, entries):
+        """Añade registros al historial; un fallo aquí no deshace la escritura de la zona"""
+        if not HISTORY_ENABLED or not entries:
+            return
+        try:
+            self.history.append(entries)
+        except Exception as e:
+            print(f"Error guardando historial: {e}")
+
+    def _history_paths(self, zone_id, op, fields):
+        """Rutas del registro de historial, para incluirlas en un PATCH multi-ruta"""
+        return record_paths(zone_id, op, fields) if HISTORY_ENABLED else {}
+
+    def _settle_status(self, path):
+        """Recalcula y guarda el estado de una zona tras un incremento de voluntarios.
+
+        El número final solo lo conoce el servidor, así que se lee la zona y el
+        estado se escribe con PUT condicional. Devuelve la zona resultante.
+        """
+        current, etag = self._get_with_etag(path)
+        for _ in range(CAS_MAX_ATTEMPTS):
+            if current is None:
+                return None
+            status = zone_status(current)
+            if current.get('status') == status:
+                return current
+            written, current, etag = self._put_if_match(path, dict(current, status=status), etag)
+            if written:
+                return current
+        return current
+
+    def reevaluate_statuses(self, zones=None):
+        """Recalcula el estado de todas las zonas y guarda los que cambiaron.
+
+        Lee las zonas del servidor (sin pasar por la instantánea) salvo que se
+        pasen, calcula los estados en bloque y los escribe, junto con su
+        historial, en un único PATCH multi-ruta. Devuelve el número de zonas
+        actualizadas o None si hubo un error.
+        """
+        try:
+            if zones is None:
+                zones = self.clean_zones_data(self._make_request('GET', 'zones'))
+            changes = status_changes(zones)
+            if changes:
+                counts = {zone.get('id'): zone.get('volunteer_count') for zone in zones}
+                multi_path = {}
+                for zone_id, status in changes.items():
+                    multi_path[f'zones/{zone_id}/status'] = status
+                    multi_path.update(self._history_paths(zone_id, 'status', {
+                        'status': status, 'volunteer_count': counts.get(zone_id)
+                    }))
+                response = self._send('PATCH', '', multi_path)
+                if response.status_code != 200:
+                    self.invalidate_zones()
+                    return None
+                self._apply_local({zone_id: {'status': status} for zone_id, status in changes.items()})
+                self.invalidate_zones()
+            return len(changes)
+        except Exception as e:
+            print(f"Error recalculando estados: {e}")
+            return None
+
+    def update_zone(self, zone_id, data, base=None, force=False):
+        """Actualiza una zona específica.
+
+        Si se pasa base (la zona tal como la vio el usuario), solo se envían los
+        campos que cambiaron respecto a ella y la escritura es compare-and-set:
+        si otro coordinador modificó esos mismos campos entretanto, se devuelve
+        un ZoneUpdateResult con los conflictos en vez de sobrescribirlos. Con
+        force=True se ignoran los conflictos pero se conserva el resto de campos.
+        Los cambios de volunteer_count se aplican como incrementos atómicos.
+        El estado de la zona se recalcula siempre en el servidor (status_engine).
+        """
         try:
-            # Asegurar que las listas existan y sean listas válidas
-            pending_needs = data.get('pending_needs', [])
-            if pending_needs is None:
-                pending_needs = []
-                
-            covered_needs = data.get('covered_needs', [])
-            if covered_needs is None:
-                covered_needs = []
-            
-            # Asegurar que todos los campos necesarios existen
-            update_data = {
-                'name': data['name'],
-                'latitude': data['latitude'],
-                'longitude': data['longitude'],
-                'volunteer_count': data['volunteer_count'],
-                'status': data['status'],
-                'access_notes': data['access_notes'],
-                'pending_needs': list(pending_needs),  # Convertir explícitamente a lista
-                'covered_needs': list(covered_needs),  # Convertir explícitamente a lista
-                'last_update': str(datetime.now())
-            }
-            
-            # Imprimir para debug
-            print("Datos a enviar a Firebase:", update_data)
-            
             # Si zone_id no tiene el prefijo 'zone_', añadirlo
             if not zone_id.startswith('zone_'):
                 zone_id = f"zone_{zone_id}"
-            
-            result = self._make_request('PATCH', f'zones/{zone_id}', update_data)
-            
-            # Verificar resultado
-            if result:
-                print("Actualización exitosa:", result)
-            else:
-                print("Error en la actualización")
-            
-            return result is not None
-            
+            path = f'zones/{zone_id}'
+
+            update_data = self._normalize_zone_fields(data)
+
+            if base is None:
+                # Sin versión de referencia: se escriben todos los campos recibidos
+                if any(key in update_data for key in STATUS_FIELDS):
+                    update_data['status'] = zone_status(dict(self._snapshot_zone(zone_id), **update_data))
+                update_data['last_update'] = str(datetime.now())
+                response = self._send('PATCH', path, update_data)
+                response.raise_for_status()
+                result = response.json()
+                self._apply_local({zone_id: update_data})
+                self.invalidate_zones()
+                self._record_history([(zone_id, 'update', update_data)])
+                return ZoneUpdateResult(True, current=result)
+
+            base_data = self._comparable_zone(base)
+            changes = {
+                key: value for key, value in update_data.items()
+                if base_data.get(key) != value
+            }
+            count_delta = 0
+            if 'volunteer_count' in changes:
+                count_delta = changes.pop('volunteer_count') - (base_data.get('volunteer_count') or 0)
+
+            if not changes:
+                if count_delta == 0:
+                    return ZoneUpdateResult(True)
+                # Solo cambia el número de voluntarios: incremento en el servidor,
+                # sin leer la zona y sin perder check-ins concurrentes
+                response = self._send('PATCH', path, {
+                    'volunteer_count': {'.sv': {'increment': count_delta}},
+                    'last_update': str(datetime.now())
+                })
+                response.raise_for_status()
+                result = response.json()
+                try:
+                    settled = self._settle_status(path)
+                except requests.RequestException as e:
+                    # El incremento ya está guardado: no se encola otra vez
+                    print(f"Error recalculando el estado de {zone_id}: {e}")
+                    settled = None
+                if settled is not None:
+                    self._apply_local({zone_id: settled})
+                    self._record_history([(zone_id, 'update', settled)])
+                self.invalidate_zones()
+                return ZoneUpdateResult(True, current=result)
+
+            result = self._compare_and_set_zone(path, base_data, changes, count_delta, force)
+            if result.current:
+                # La versión escrita o, si hubo conflicto, la vigente en el servidor
+                self._apply_local({zone_id: result.current})
+            self.invalidate_zones()
+            if result.conflicts:
+                print(f"Conflicto actualizando {zone_id}: {result.conflicts}")
+            elif result and result.current:
+                self._record_history([(zone_id, 'update', result.current)])
+            return result
+
+        except requests.RequestException as e:
+            if self.offline is not None and is_connectivity_error(e):
+                # Sin conexión: el cambio se envía cuando vuelva (con force, sin comprobar conflictos)
+                self._queue_offline(zone_id, self._normalize_zone_fields(data),
+                                    None if base is None or force else self._comparable_zone(base))
+                return ZoneUpdateResult(True, queued=True)
+            print(f"Error actualizando zona: {e}")
+            return ZoneUpdateResult(False)
         except Exception as e:
             print(f"Error actualizando zona: {e}")
+            return ZoneUpdateResult(False)
+
+    def _compare_and_set_zone(self, path, base_data, changes, count_delta, force):
+        """Aplica los cambios sobre la versión vigente de la zona con PUT condicional"""
+        current, etag = self._get_with_etag(path)
+        for _ in range(CAS_MAX_ATTEMPTS):
+            if current is None:
+                return ZoneUpdateResult(False)
+
+            current_data = self._comparable_zone(current)
+            if not force:
+                # Un campo está en conflicto si otro lo cambió a un valor distinto del nuestro
+                conflicts = [
+                    key for key, value in changes.items()
+                    if current_data.get(key) != base_data.get(key) and current_data.get(key) != value
+                ]
+                if conflicts:
+                    return ZoneUpdateResult(False, conflicts=conflicts, current=current)
+
+            merged = dict(current)
+            merged.update(changes)
+            if count_delta:
+                merged['volunteer_count'] = (current.get('volunteer_count') or 0) + count_delta
+            merged['status'] = zone_status(merged)
+            merged['last_update'] = str(datetime.now())
+
+            written, current, etag = self._put_if_match(path, merged, etag)
+            if written:
+                return ZoneUpdateResult(True, current=current)
+            # La zona cambió entre la lectura y la escritura: reintentar con la versión nueva
+        return ZoneUpdateResult(False, current=current)
+
+    def check_in(self, zone_id, volunteer_id, previous_zone=None):
+        """Registra la llegada de un voluntario a una zona (y su salida de previous_zone)"""
+        try:
+            return self.checkins.check_in(zone_id, volunteer_id, previous_zone)
+        except Exception as e:
+            print(f"Error registrando llegada: {e}")
+            return False
+
+    def check_out(self, zone_id, volunteer_id):
+        """Registra la salida de un voluntario de una zona"""
+        try:
+            return self.checkins.check_out(zone_id, volunteer_id)
+        except Exception as e:
+            print(f"Error registrando salida: {e}")
             return False
 
+    def batch_update(self, updates, bases=None, force=False):
+        """Actualiza varias zonas en una sola petición.
+
+        updates es un diccionario {zone_id: {campo: valor}}. Todos los cambios se
+        envían juntos como un PATCH multi-ruta sobre la raíz, que Firebase aplica
+        de forma atómica: o se guardan todos o ninguno.
+
+        bases es {zone_id: zona tal como la vio el usuario} (por defecto, la
+        instantánea vigente). Los cambios de volunteer_count se envían como
+        incrementos respecto a ella, para no pisar las llegadas registradas
+        entretanto. El resto de campos se comparan con la zona en el servidor:
+        si otro usuario cambió alguno a un valor distinto del nuestro, no se
+        envía nada y se devuelve un ZoneUpdateResult con conflicts
+        {zone_id: [campos]} y current {zone_id: zona en el servidor}; con
+        force=True se sobrescriben. Las zonas que ya no existen en el servidor
+        se omiten: un PATCH multi-ruta sobre ellas crearía una zona sin nombre
+        ni coordenadas.
+        """
+        updates = {self._zone_key(zone_id): data for zone_id, data in (updates or {}).items()}
+        bases = {self._zone_key(zone_id): zone for zone_id, zone in (bases or {}).items()}
+        try:
+            if not updates:
+                return ZoneUpdateResult(True)
+
+            current_zones = {zone.get('id'): zone for zone in self.get_zones_snapshot().zones}
+            # Solo las claves de las zonas, para saber cuáles siguen existiendo
+            response = self._send('GET', 'zones', params={'shallow': 'true'})
+            response.raise_for_status()
+            existing = response.json() or {}
+
+            now = str(datetime.now())
+            multi_path = {}
+            local = {}
+            status_zones = {}
+            skipped = []
+            conflicts = {}
+            server_zones = {}
+            for zone_id, data in updates.items():
+                fields = self._normalize_zone_fields(data)
+                if not fields:
+                    continue
+                if zone_id not in existing:
+                    skipped.append(zone_id)
+                    continue
+                current = current_zones.get(zone_id, {})
+                base = bases.get(zone_id)
+                if base is not None and any(key != 'volunteer_count' for key in fields):
+                    # Los campos absolutos se comparan con la versión del servidor,
+                    # no con la instantánea, que puede no tener aún el cambio de otro
+                    response = self._send('GET', f'zones/{zone_id}')
+                    response.raise_for_status()
+                    current = response.json() or {}
+                    server_zones[zone_id] = current
+                    base_data, current_data = self._comparable_zone(base), self._comparable_zone(current)
+                    changed = [
+                        key for key, value in fields.items()
+                        if key != 'volunteer_count' and current_data.get(key) != base_data.get(key)
+                        and current_data.get(key) != value
+                    ]
+                    if changed:
+                        conflicts[zone_id] = changed
+                if 'volunteer_count' in fields:
+                    base = base or current
+                    delta = fields.pop('volunteer_count') - (base.get('volunteer_count') or 0)
+                    if delta:
+                        multi_path[f'zones/{zone_id}/volunteer_count'] = {'.sv': {'increment': delta}}
+                        # Valor esperado tras el incremento, para el estado y la copia local
+                        fields['volunteer_count'] = (current.get('volunteer_count') or 0) + delta
+                for key, value in fields.items():
+                    if key != 'volunteer_count':
+                        multi_path[f'zones/{zone_id}/{key}'] = value
+                multi_path[f'zones/{zone_id}/last_update'] = now
+                local[zone_id] = dict(fields, last_update=now)
+                if any(key in fields for key in STATUS_FIELDS):
+                    status_zones[zone_id] = dict(current, **fields)
+            if skipped:
+                print(f"Zonas eliminadas, no se actualizan: {', '.join(skipped)}")
+            if conflicts and not force:
+                print(f"Conflicto en la actualización múltiple: {conflicts}")
+                return ZoneUpdateResult(False, conflicts=conflicts,
+                                        current={zone_id: server_zones[zone_id] for zone_id in conflicts})
+
+            # Estados de todas las zonas afectadas, calculados en bloque
+            statuses = dict(zip(status_zones, compute_statuses(list(status_zones.values()))))
+            for zone_id, status in statuses.items():
+                multi_path[f'zones/{zone_id}/status'] = status
+                local[zone_id]['status'] = status
+
+            if not multi_path:
+                return ZoneUpdateResult(True)
+
+            # El historial va en la misma escritura atómica
+            for zone_id, fields in local.items():
+                multi_path.update(self._history_paths(zone_id, 'update', fields))
+
+            response = self._send('PATCH', '', multi_path)
+            response.raise_for_status()
+            self._apply_local(local)
+            self.invalidate_zones()
+            return ZoneUpdateResult(True)
+
+        except requests.RequestException as e:
+            if self.offline is not None and is_connectivity_error(e):
+                current_zones = {zone.get('id'): zone for zone in self.get_zones_snapshot().zones}
+                for zone_id, data in updates.items():
+                    fields = self._normalize_zone_fields(data)
+                    base = bases.get(zone_id) or current_zones.get(zone_id)
+                    if fields:
+                        # Con la zona que vio el usuario como base, volunteer_count
+                        # se envía como incremento y no pisa llegadas posteriores
+                        self._queue_offline(zone_id, fields,
+                                            self._comparable_zone(base) if base else None)
+                return ZoneUpdateResult(True, queued=True)
+            print(f"Error en actualización múltiple: {e}")
+            return ZoneUpdateResult(False)
+        except Exception as e:
+            print(f"Error en actualización múltiple: {e}")
+            return ZoneUpdateResult(False)
+
     def initialize_zones(self, initial_zones):
         """Inicializa las zonas en Firebase"""
         try:
@@ -180,7 +862,7 @@ class EmergencyDatabase:
                     'latitude': zone['latitude'],
                     'longitude': zone['longitude'],
                     'volunteer_count': zone['volunteer_count'],
-                    'status': zone['status'],
+                    'status': zone_status(dict(zone, status=None)),
                     'access_notes': zone['access_notes'],
                     'pending_needs': zone.get('pending_needs', []),
                     'covered_needs': zone.get('covered_needs', []),
@@ -190,6 +872,16 @@ class EmergencyDatabase:
                 zones_data[zone_id] = zone_data
             
             result = self._make_request('PUT', 'zones', zones_data)
+            if result is not None:
+                self._apply_local(dict(
+                    {zone.get('id'): None for zone in self.get_zones_snapshot().zones},
+                    **zones_data
+                ))
+            self.invalidate_zones()
+            if result is not None:
+                self._record_history([
+                    (zone_id, 'create', zone) for zone_id, zone in zones_data.items()
+                ])
             return result is not None
         except Exception as e:
             print(f"Error inicializando zonas: {e}")
@@ -197,44 +889,79 @@ class EmergencyDatabase:
     
     #Agregando una zona nueva
     # En database.py, añade este método a la clase EmergencyDatabase:
+    def _seed_zone_counter(self):
+        """Primer valor del contador de zonas a partir de los IDs existentes.
+
+        Solo se usa una vez, cuando meta/zone_counter aún no existe; la lectura
+        es superficial (shallow) y descarga solo las claves.
+        """
+        response = self._send('GET', 'zones', params={'shallow': 'true'})
+        response.raise_for_status()
+        keys = response.json() or {}
+        if isinstance(keys, list):
+            keys = {str(i): True for i, zone in enumerate(keys) if zone is not None}
+        existing_ids = [
+            int(key.split('_')[1]) for key in keys
+            if key.startswith('zone_') and key.split('_')[1].isdigit()
+        ]
+        return max(existing_ids) + 1 if existing_ids else 0
+
+    def _next_zone_id(self):
+        """Reserva el siguiente número de zona con un incremento atómico.
+
+        El contador vive en meta/zone_counter. Cada reserva es un único PUT
+        {'.sv': {'increment': 1}}: Firebase lo aplica de forma atómica y
+        devuelve el valor resultante, así dos administradores nunca obtienen el
+        mismo ID y ninguno tiene que reintentar por mucha contención que haya
+        (con compare-and-set, con muchos a la vez se agotaban los intentos).
+        El transporte no reintenta un PUT con incremento: si Firebase lo aplicó
+        antes de un timeout o un 5xx, repetirlo se saltaría un número.
+        """
+        if not self._zone_counter_seeded:
+            value, etag = self._get_with_etag('meta/zone_counter')
+            if value is None:
+                # Sembrarlo una sola vez: si otro cliente se adelanta, vale el suyo
+                self._put_if_match('meta/zone_counter', self._seed_zone_counter(), etag)
+            self._zone_counter_seeded = True
+        response = self._send('PUT', 'meta/zone_counter', {'.sv': {'increment': 1}})
+        response.raise_for_status()
+        return response.json() - 1
+
     def add_new_zone(self, zone_data):
         """Añade una nueva zona a Firebase"""
         try:
-            # Obtener zonas actuales
-            current_zones = self._make_request('GET', 'zones')
-        
-            # Si no hay zonas, inicializar como diccionario vacío
-            if not current_zones:
-                current_zones = {}
-                new_id = 0
-            else:
-                # Calcular el nuevo ID basado en las zonas existentes
-                existing_ids = [int(key.split('_')[1]) for key in current_zones.keys() if key.startswith('zone_')]
-                new_id = max(existing_ids) + 1 if existing_ids else 0
-        
-            # Crear ID para la nueva zona
-            zone_id = f"zone_{new_id}"
-        
-            # Asegurar que todos los campos necesarios existan
-            new_zone_data = {
-                'name': zone_data['name'],
-                'latitude': zone_data['latitude'],
-                'longitude': zone_data['longitude'],
-                'volunteer_count': zone_data.get('volunteer_count', 0),
-                'status': zone_data.get('status', 'needed'),
-                'access_notes': zone_data.get('access_notes', ''),
-                'pending_needs': zone_data.get('pending_needs', []),
-                'covered_needs': zone_data.get('covered_needs', []),
-                'last_update': str(datetime.now()),
-                'id': zone_id
-            }
-        
-            # Hacer la actualización en Firebase
-            result = self._make_request('PATCH', f'zones/{zone_id}', new_zone_data)
-        
-            if result:
-                print(f"Zona añadida exitosamente: {zone_id}")
-                return True
+            for _ in range(CAS_MAX_ATTEMPTS):
+                # Reservar un ID único sin descargar las zonas existentes
+                zone_id = f"zone_{self._next_zone_id()}"
+            
+                # Asegurar que todos los campos necesarios existan
+                new_zone_data = {
+                    'name': zone_data['name'],
+                    'latitude': zone_data['latitude'],
+                    'longitude': zone_data['longitude'],
+                    'volunteer_count': zone_data.get('volunteer_count', 0),
+                    'status': zone_status(dict(zone_data, status=None)),
+                    'access_notes': zone_data.get('access_notes', ''),
+                    'pending_needs': zone_data.get('pending_needs', []),
+                    'covered_needs': zone_data.get('covered_needs', []),
+                    'last_update': str(datetime.now()),
+                    'id': zone_id
+                }
+                for key in ('min_volunteers', 'max_volunteers'):
+                    if zone_data.get(key) is not None:
+                        new_zone_data[key] = zone_data[key]
+            
+                # Crear la zona solo si ese ID está libre (null_etag = la ruta no existe).
+                # Si alguien la creó fuera del contador, se reserva el siguiente ID.
+                created, _, _ = self._put_if_match(f'zones/{zone_id}', new_zone_data, 'null_etag')
+                if created:
+                    self._apply_local({zone_id: new_zone_data})
+                self.invalidate_zones()
+            
+                if created:
+                    print(f"Zona añadida exitosamente: {zone_id}")
+                    self._record_history([(zone_id, 'create', new_zone_data)])
+                    return True
             return False
         
         except Exception as e:
@@ -242,32 +969,31 @@ class EmergencyDatabase:
             return False
     # En database.py, añade estos métodos a la clase EmergencyDatabase:
     def delete_zone(self, zone_id):
-        """Elimina una zona de Firebase"""
+        """Elimina una zona de Firebase. Devuelve False si la zona no existe"""
         try:
             # Asegurar que el ID tenga el formato correcto
             if not zone_id.startswith('zone_'):
                 zone_id = f"zone_{zone_id}"
-        
-            # Obtener todas las zonas actuales
-            current_zones = self._make_request('GET', 'zones')
-        
-            if not current_zones:
-                print("No hay zonas para eliminar")
-                return False
-            
-            # Verificar que la zona existe
-            if zone_id not in current_zones:
+
+            # Firebase responde 200 al DELETE aunque la ruta no exista: comprobarlo
+            # antes con una lectura superficial (solo las claves de la zona)
+            response = self._send('GET', f'zones/{zone_id}', params={'shallow': 'true'})
+            response.raise_for_status()
+            if response.json() is None:
                 print(f"Zona {zone_id} no encontrada")
                 return False
-            
-            # Eliminar la zona del diccionario
-            del current_zones[zone_id]
         
-            # Actualizar Firebase con el nuevo conjunto de zonas
-            result = self._make_request('PUT', 'zones', current_zones)
+            # Borrado puntual de la zona: no toca el resto del árbol, así que
+            # no revierte cambios concurrentes de otros coordinadores
+            response = self._send('DELETE', f'zones/{zone_id}')
+            if response.status_code == 200:
+                self._apply_local({zone_id: None})
+            self.invalidate_zones()
         
-            if result is not None:
+            if response.status_code == 200:
                 print(f"Zona {zone_id} eliminada exitosamente")
+                # El historial de la zona se conserva; el registro marca el borrado
+                self._record_history([(zone_id, 'delete', {})])
                 return True
             
             return False
@@ -297,9 +1023,19 @@ class EmergencyDatabase:
                 'access_notes': zone_data.get('access_notes', current_zone.get('access_notes')),
                 'last_update': str(datetime.now())
             }
+            # Capacidad propia de la zona (None la elimina y vuelve a los umbrales generales)
+            for key in ('min_volunteers', 'max_volunteers'):
+                if key in zone_data:
+                    updated_zone[key] = zone_data[key]
+            updated_zone['status'] = zone_status(dict(current_zone, **updated_zone))
         
             # Hacer la actualización
             result = self._make_request('PATCH', f'zones/{zone_id}', updated_zone)
+            if result is not None:
+                self._apply_local({zone_id: updated_zone})
+            self.invalidate_zones()
+            if result is not None:
+                self._record_history([(zone_id, 'edit', dict(current_zone, **updated_zone))])
             return result is not None
         
         except Exception as e:
@@ -308,76 +1044,85 @@ class EmergencyDatabase:
     #Añadiendo coordinadores
     def add_coordinator(self, username, password):
         """Añade un nuevo coordinador autorizado"""
-        try:
-            # Obtener coordinadores actuales
-            coordinators = self._make_request('GET', 'coordinators')
-        
-            if not coordinators:
-                coordinators = {}
-        
-            # Verificar si el usuario ya existe
-            if username in coordinators:
-                return False, "El nombre de usuario ya existe"
-        
-            # Crear nuevo coordinador
-            import hashlib
-            # Hashear la contraseña
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            print(f"DEBUG - Contraseña original: {password}")
-            print(f"DEBUG - Contraseña hasheada: {hashed_password}")
-        
-            coordinator_data = {
-                'username': username,
-                'password': hashed_password,
-                'created_at': str(datetime.now()),
-                'active': True
-            }
-        
-            # Añadir a Firebase usando el username como key
-            result = self._make_request('PATCH', f'coordinators/{username}', coordinator_data)
-            
-            if result:
-                print(f"DEBUG - Coordinador creado: {coordinator_data}")
-                return True, "Coordinador añadido exitosamente"
-            return False, "Error al añadir coordinador"
-        
-        except Exception as e:
-            return False, f"Error: {str(e)}"
+        with tracer.span('coordinator.add', username=username) as span:
+            try:
+                # Obtener coordinadores actuales
+                coordinators = self._make_request('GET', 'coordinators')
+
+                if not coordinators:
+                    coordinators = {}
+
+                # Verificar si el usuario ya existe
+                if username in coordinators:
+                    span.set(outcome='exists')
+                    return False, "El nombre de usuario ya existe"
+
+                # Crear nuevo coordinador
+                # Hashear la contraseña
+                hashed_password = hashlib.sha256(password.encode()).hexdigest()
+
+                coordinator_data = {
+                    'username': username,
+                    'password': hashed_password,
+                    'created_at': str(datetime.now()),
+                    'active': True
+                }
+
+                # Añadir a Firebase usando el username como key
+                result = self._make_request('PATCH', f'coordinators/{username}', coordinator_data)
+
+                if result:
+                    self.coordinator_cache.invalidate()
+                    span.set(outcome='created')
+                    return True, "Coordinador añadido exitosamente"
+                span.set(outcome='failed')
+                return False, "Error al añadir coordinador"
+
+            except Exception as e:
+                span.set(outcome='error', error=str(e))
+                return False, f"Error: {str(e)}"
 
     def verify_coordinator(self, username, password):
         """Verifica las credenciales del coordinador"""
-        try:
-            # Obtener el coordinador específico
-            coordinator = self._make_request('GET', f'coordinators/{username}')
-            print(f"DEBUG - Verificando usuario: {username}")
-            print(f"DEBUG - Datos encontrados: {coordinator}")
-            
-            if not coordinator:
-                return False, "Usuario no encontrado"
-            
-            # Hashear la contraseña para comparar
-            import hashlib
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            print(f"DEBUG - Contraseña ingresada hasheada: {hashed_password}")
-            print(f"DEBUG - Contraseña almacenada: {coordinator.get('password')}")
-            
-            if coordinator.get('password') == hashed_password:
-                if coordinator.get('active', True):
-                    return True, coordinator
+        # La traza guarda el usuario y el resultado, nunca contraseñas ni hashes
+        with tracer.span('coordinator.verify', username=username) as span:
+            try:
+                # Obtener el coordinador específico
+                live, coordinators = self._read_mirror('coordinators')
+                if live:
+                    coordinator = (coordinators or {}).get(username)
                 else:
-                    return False, "Cuenta desactivada"
-            
-            return False, "Contraseña incorrecta"
-            
-        except Exception as e:
-            print(f"DEBUG - Error en verificación: {e}")
-            return False, f"Error: {str(e)}"
-        
+                    coordinator = self._make_request('GET', f'coordinators/{username}')
+                span.set(source='mirror' if live else 'request')
+
+                if not coordinator:
+                    span.set(outcome='not_found')
+                    return False, "Usuario no encontrado"
+
+                # Hashear la contraseña para comparar
+                hashed_password = hashlib.sha256(password.encode()).hexdigest()
+
+                if coordinator.get('password') == hashed_password:
+                    if coordinator.get('active', True):
+                        span.set(outcome='ok')
+                        return True, coordinator
+                    else:
+                        span.set(outcome='inactive')
+                        return False, "Cuenta desactivada"
+
+                span.set(outcome='wrong_password')
+                return False, "Contraseña incorrecta"
+
+            except Exception as e:
+                span.set(outcome='error', error=str(e))
+                return False, f"Error: {str(e)}"
+
     def deactivate_coordinator(self, username):
         """Desactiva un coordinador"""
         try:
             update_data = {'active': False}
             result = self._make_request('PATCH', f'coordinators/{username}', update_data)
+            self.coordinator_cache.invalidate()
             return result is not None
         except Exception as e:
             print(f"Error desactivando coordinador: {e}")
@@ -387,23 +1132,26 @@ class EmergencyDatabase:
         """Elimina un coordinador"""
         try:
             result = self._make_request('PUT', f'coordinators/{username}', None)
+            self.coordinator_cache.invalidate()
             return result is None  # Firebase retorna null cuando la eliminación es exitosa
         except Exception as e:
             print(f"Error eliminando coordinador: {e}")
             return False
 
 
+    def _fetch_coordinators(self):
+        """Descarga los coordinadores sin pasar por la caché"""
+        live, coordinators = self._read_mirror('coordinators')
+        if not live:
+            coordinators = self._make_request('GET', 'coordinators')
+        return coordinators or {}
+
     def get_all_coordinators(self):
         """Obtiene lista de coordinadores"""
         try:
-            coordinators = self._make_request('GET', 'coordinators')
-            if coordinators:
-                coordinator_list = []
-                for username, data in coordinators.items():
-                    data['username'] = username  # Añadir el username a los datos
-                    coordinator_list.append(data)
-                return coordinator_list
-            return []
+            coordinators = self.coordinator_cache.get()
+            # Copias: la caché la comparten todas las sesiones
+            return [dict(data, username=username) for username, data in coordinators.items()]
         except Exception as e:
             print(f"Error obteniendo coordinadores: {e}")
             return []
@@ -413,7 +1161,44 @@ class EmergencyDatabase:
         try:
             update_data = {'active': False}
             result = self._make_request('PATCH', f'coordinators/{coordinator_id}', update_data)
+            self.coordinator_cache.invalidate()
             return result is not None
         except Exception as e:
             print(f"Error desactivando coordinador: {e}")
             return False
+
+
+# Cliente activo, para detener sus hilos de escucha si se reconstruye
+_process_database = None
+
+def _credentials_fingerprint():
+    """Huella de los secretos de Firebase, para detectar cambios de credenciales"""
+    if STORAGE_BACKEND != 'firebase':
+        return STORAGE_BACKEND
+    if DATABASE_URL:
+        return DATABASE_URL
+    firebase_secrets = {key: str(value) for key, value in st.secrets["firebase"].items()}
+    raw = json.dumps(firebase_secrets, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _build_database(fingerprint):
+    """Construye el cliente del proceso; se repite solo si cambian las credenciales"""
+    global _process_database
+    # Si las credenciales cambiaron, la app de firebase_admin anterior ya no sirve
+    # (si nadie llegó a importarlo, no hay app que borrar)
+    firebase_admin = sys.modules.get('firebase_admin')
+    if firebase_admin is not None and firebase_admin._apps:
+        firebase_admin.delete_app(firebase_admin.get_app())
+    if _process_database is not None:
+        _process_database.stop_realtime()
+        _process_database.stop_checkin_rollup()
+        _process_database.stop_offline_sync()
+        _process_database.backend.close()
+    _process_database = EmergencyDatabase()
+    _process_database.register_caches()
+    return _process_database
+
+def get_database():
+    """Devuelve el cliente de base de datos compartido por todas las sesiones"""
+    return _build_database(_credentials_fingerprint())
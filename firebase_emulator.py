@@ -0,0 +1,352 @@
+# firebase_emulator.py
+"""Sustituto local de la API REST de Firebase Realtime Database.
+
+Implementa el subconjunto que usa la aplicación: GET/PUT/PATCH/DELETE sobre
+/{ruta}.json, lecturas shallow, consultas por clave (orderBy="$key"), ETags
+(X-Firebase-ETag, if-match, If-None-Match), PATCH multi-ruta, valores de
+servidor {'.sv': ...} y streaming SSE (Accept: text/event-stream).
+Sirve para pruebas de carga y benchmarks sin red.
+
+Se puede inyectar latencia, variación (jitter) y una tasa de errores 5xx en
+cada petición, al arrancar o en caliente con PUT /.emulator/faults.json.
+GET /.emulator/stats.json devuelve las peticiones recibidas por método.
+
+Para que la aplicación lo use: EMERGENCY_DB_URL=http://127.0.0.1:9000
+
+Uso: python firebase_emulator.py [--host 127.0.0.1] [--port 9000]
+     [--latency-ms 0] [--jitter-ms 0] [--error-rate 0] [--seed N]
+"""
+
+import argparse
+import json
+import queue
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from storage_tree import FirebaseTree, changed_paths, copy_value, handle_request, split_path
+
+
+class FaultInjector:
+    """Latencia, variación y errores inyectados en las peticiones.
+
+    Cada petición espera latency_ms más un valor aleatorio entre 0 y
+    jitter_ms, y con probabilidad error_rate responde error_status sin
+    ejecutarse. Con seed los retardos y errores son reproducibles.
+    """
+
+    SETTINGS = ('latency_ms', 'jitter_ms', 'error_rate', 'error_status')
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=503, seed=None):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def configure(self, **settings):
+        unknown = set(settings) - set(self.SETTINGS)
+        if unknown:
+            raise ValueError(f"Parámetros desconocidos: {sorted(unknown)}")
+        for key, value in settings.items():
+            setattr(self, key, int(value) if key == 'error_status' else float(value))
+
+    def settings(self):
+        return {key: getattr(self, key) for key in self.SETTINGS}
+
+    def before_request(self):
+        """Aplica el retardo; devuelve el estado de error a responder o None"""
+        with self._lock:
+            delay = self.latency_ms
+            if self.jitter_ms:
+                delay += self._rng.uniform(0, self.jitter_ms)
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return self.error_status if failed else None
+
+
+class EventStream:
+    """Una escucha SSE abierta sobre un nodo; recibe los eventos por una cola"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.events = queue.Queue()
+
+
+class EmulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data=None, faults=None, keepalive=30):
+        super().__init__(address, EmulatorHandler)
+        self.tree = FirebaseTree(copy_value(data))
+        self.faults = faults or FaultInjector()
+        self.keepalive = keepalive
+        self.connections = set()
+        self.streams = set()
+        self.stopping = False
+        self._stats_lock = threading.Lock()
+        self.request_counts = {}
+        self.errors_injected = 0
+        self.events_sent = 0
+
+    def count(self, method, injected_error=False):
+        with self._stats_lock:
+            self.request_counts[method] = self.request_counts.get(method, 0) + 1
+            if injected_error:
+                self.errors_injected += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'requests': dict(self.request_counts),
+                'total_requests': sum(self.request_counts.values()),
+                'errors_injected': self.errors_injected,
+                'streams_open': len(self.streams),
+                'events_sent': self.events_sent,
+                'faults': self.faults.settings()
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.request_counts = {}
+            self.errors_injected = 0
+            self.events_sent = 0
+
+    def publish(self, changed):
+        """Encola los eventos 'put' de una escritura en las escuchas afectadas.
+
+        Se llama con el lock del árbol tomado, así el orden de los eventos es
+        el de las escrituras.
+        """
+        for stream in list(self.streams):
+            depth = len(stream.parts)
+            for parts in changed:
+                if parts[:depth] == stream.parts:
+                    # Cambio dentro del nodo escuchado: ruta relativa a él
+                    path = '/' + '/'.join(parts[depth:])
+                    stream.events.put(('put', {'path': path, 'data': copy_value(self.tree.get(parts))}))
+                elif stream.parts[:len(parts)] == parts:
+                    # Se reescribió un ancestro: el nodo entero de nuevo
+                    stream.events.put(('put', {'path': '/', 'data': copy_value(self.tree.get(stream.parts))}))
+
+    def close_streams(self):
+        self.stopping = True
+        for stream in list(self.streams):
+            stream.events.put(None)
+
+
+class EmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como Firebase
+
+    def setup(self):
+        super().setup()
+        # Cabeceras y cuerpo salen en escrituras separadas: sin esto Nagle añade ~40 ms
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections.add(self.request)
+
+    def finish(self):
+        try:
+            super().finish()
+        except OSError:
+            pass  # El cliente ya cerró la conexión
+        self.server.connections.discard(self.request)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        path = url.path
+        if path.endswith('.json'):
+            path = path[:-len('.json')]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return split_path(path), params
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw) if raw else None
+
+    def _reply(self, status, value, etag=None):
+        if status == 304:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(value, separators=(',', ':')).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        # El mapa del navegador descarga detalles de zonas directamente
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        parts, params = self._parse()
+        body = self._body()
+        if parts[:1] == ['.emulator']:
+            self._control(parts[1:], body)
+            return
+
+        error_status = self.server.faults.before_request()
+        self.server.count(self.command, injected_error=error_status is not None)
+        if error_status is not None:
+            self._reply(error_status, {'error': 'Error inyectado por el emulador'})
+            return
+        if self.command == 'GET' and 'text/event-stream' in self.headers.get('Accept', ''):
+            self._stream(parts)
+            return
+
+        tree = self.server.tree
+        with tree.lock:
+            status, value, etag = handle_request(tree, self.command, parts, params,
+                                                 dict(self.headers), body)
+            if status == 200 and self.command != 'GET' and self.server.streams:
+                self.server.publish(changed_paths(self.command, parts, body))
+        self._reply(status, value, etag)
+
+    do_GET = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def _control(self, parts, body):
+        """/.emulator/faults (GET/PUT) y /.emulator/stats (GET/DELETE para reiniciar)"""
+        name = parts[0] if parts else None
+        if name == 'faults':
+            if self.command in ('PUT', 'PATCH'):
+                try:
+                    self.server.faults.configure(**(body or {}))
+                except (TypeError, ValueError) as e:
+                    self._reply(400, {'error': str(e)})
+                    return
+            self._reply(200, self.server.faults.settings())
+        elif name == 'stats':
+            if self.command == 'DELETE':
+                self.server.reset_stats()
+            self._reply(200, self.server.stats())
+        else:
+            self._reply(404, {'error': 'Ruta de control desconocida'})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_event(self, event, data):
+        payload = json.dumps(data, separators=(',', ':'))
+        self._write_chunk(f'event: {event}\ndata: {payload}\n\n'.encode())
+
+    def _stream(self, parts):
+        """Escucha SSE: el nodo completo y después un 'put' por cada cambio"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        # Por trozos: cada evento llega al cliente en cuanto se escribe
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.close_connection = True
+
+        stream = EventStream(parts)
+        tree = self.server.tree
+        with tree.lock:
+            initial = copy_value(tree.get(parts))
+            self.server.streams.add(stream)
+        try:
+            self._send_event('put', {'path': '/', 'data': initial})
+            while not self.server.stopping:
+                try:
+                    event = stream.events.get(timeout=self.server.keepalive)
+                except queue.Empty:
+                    self._send_event('keep-alive', None)
+                    continue
+                if event is None:
+                    break
+                self._send_event(*event)
+                with self.server._stats_lock:
+                    self.server.events_sent += 1
+            self._write_chunk(b'')
+        except OSError:
+            pass  # El cliente cerró la escucha
+        finally:
+            self.server.streams.discard(stream)
+
+
+class FirebaseEmulator:
+    """Servidor del emulador en un hilo propio; url es la base para databaseURL.
+
+    latency_ms, jitter_ms, error_rate y seed configuran los fallos inyectados
+    (ver FaultInjector); faults permite cambiarlos en caliente.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, data=None, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, seed=None, keepalive=30):
+        faults = FaultInjector(latency_ms, jitter_ms, error_rate, seed=seed)
+        self.server = EmulatorServer((host, port), data, faults, keepalive)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def tree(self):
+        return self.server.tree
+
+    @property
+    def faults(self):
+        return self.server.faults
+
+    def stats(self):
+        return self.server.stats()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='firebase-emulator',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el servidor y corta las conexiones abiertas, como una caída real"""
+        self.server.close_streams()
+        self.server.shutdown()
+        self.server.server_close()
+        for connection in list(self.server.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Latencia añadida a cada petición')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Retardo aleatorio adicional (0 a N ms)')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fracción de peticiones que responden 503')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla para retardos y errores reproducibles')
+    parser.add_argument('--data', help='Archivo JSON con el contenido inicial de la base de datos')
+    args = parser.parse_args()
+    data = None
+    if args.data:
+        with open(args.data, encoding='utf-8') as f:
+            data = json.load(f)
+    emulator = FirebaseEmulator(args.host, args.port, data, latency_ms=args.latency_ms,
+                                jitter_ms=args.jitter_ms, error_rate=args.error_rate, seed=args.seed)
+    print(f'Emulador de Realtime Database en {emulator.url}')
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+# local_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    zone_id TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    base TEXT,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claimed_at REAL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS conflicts (
+    seq INTEGER PRIMARY KEY,
+    zone_id TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    base TEXT,
+    current TEXT,
+    conflicts TEXT NOT NULL,
+    detected_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _loads(raw):
+    return json.loads(raw) if raw is not None else None
+
+
+class LocalStore:
+    """Copia local persistente de /zones y cola de escrituras pendientes (SQLite en modo WAL).
+
+    En modo WAL las lecturas no esperan a las escrituras, y la cola sobrevive a
+    reinicios del proceso. Varias instancias (o procesos) pueden compartir el
+    archivo: las entradas de la cola se reservan antes de enviarlas.
+    """
+
+    def __init__(self, path):
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10,
+                                     isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self, statements):
+        """Ejecuta [(sql, parámetros)] en una sola transacción"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    # --- Metadatos ---
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return _loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self._transaction([('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                            (key, _dumps(value)))])
+
+    # --- Zonas ---
+
+    def zones(self):
+        """Zonas de la copia local, con los cambios pendientes ya aplicados"""
+        with self._lock:
+            rows = self._conn.execute('SELECT data FROM zones ORDER BY id').fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def zone(self, zone_id):
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM zones WHERE id = ?', (zone_id,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def replace_zones(self, zones):
+        """Sustituye la copia local por la del servidor y vuelve a aplicar lo pendiente"""
+        pending = self.pending()
+        merged = {zone['id']: zone for zone in zones if zone.get('id')}
+        for entry in pending:
+            zone = merged.get(entry['zone_id'])
+            if zone is not None:
+                merged[entry['zone_id']] = dict(zone, **entry['fields'])
+        statements = [('DELETE FROM zones', ())]
+        statements += [
+            ('INSERT INTO zones (id, data) VALUES (?, ?)', (zone_id, _dumps(zone)))
+            for zone_id, zone in merged.items()
+        ]
+        statements.append(('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                           ('last_pull', _dumps(time.time()))))
+        self._transaction(statements)
+
+    def apply_local(self, zone_id, fields):
+        """Aplica un cambio a la copia local para que las lecturas ya lo muestren"""
+        self.apply_changes({zone_id: fields})
+
+    def apply_changes(self, changes):
+        """Aplica a la copia local varias escrituras en una sola transacción.
+
+        changes es {zone_id: campos}. Los campos se mezclan con la zona; una
+        zona que no está en la copia solo se añade si los campos son la zona
+        completa (con 'id'), y None en lugar de los campos la elimina.
+        """
+        statements = []
+        for zone_id, fields in changes.items():
+            if fields is None:
+                statements.append(('DELETE FROM zones WHERE id = ?', (zone_id,)))
+                continue
+            zone = self.zone(zone_id)
+            if zone is None and 'id' not in fields:
+                continue
+            statements.append(('INSERT OR REPLACE INTO zones (id, data) VALUES (?, ?)',
+                               (zone_id, _dumps(dict(zone or {}, **fields)))))
+        if statements:
+            self._transaction(statements)
+
+    # --- Cola de escrituras ---
+
+    def enqueue(self, zone_id, fields, base=None):
+        """Guarda un cambio de zona pendiente de enviar y lo aplica a la copia local"""
+        zone = self.zone(zone_id)
+        statements = [(
+            'INSERT INTO outbox (zone_id, fields, base, created_at) VALUES (?, ?, ?, ?)',
+            (zone_id, _dumps(fields), _dumps(base) if base is not None else None, time.time())
+        )]
+        if zone is not None:
+            statements.append(('UPDATE zones SET data = ? WHERE id = ?',
+                               (_dumps(dict(zone, **fields)), zone_id)))
+        self._transaction(statements)
+
+    def _rows_to_entries(self, rows):
+        return [
+            {'seq': seq, 'zone_id': zone_id, 'fields': json.loads(fields),
+             'base': _loads(base), 'created_at': created_at, 'attempts': attempts}
+            for seq, zone_id, fields, base, created_at, attempts in rows
+        ]
+
+    def pending(self, limit=None):
+        """Cambios pendientes, en el orden en que se hicieron"""
+        sql = 'SELECT seq, zone_id, fields, base, created_at, attempts FROM outbox ORDER BY seq'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        with self._lock:
+            rows = self._conn.execute(sql).fetchall()
+        return self._rows_to_entries(rows)
+
+    def claim(self, owner, limit, lease_seconds=60):
+        """Reserva hasta limit entradas para enviarlas; las reservas caducan tras lease_seconds.
+
+        Una entrada reservada no se vuelve a entregar, tampoco al mismo owner:
+        dos envíos simultáneos del mismo proceso no deben repetir un incremento.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT seq, zone_id, fields, base, created_at, attempts FROM outbox '
+                    'WHERE claimed_by IS NULL OR claimed_at < ? '
+                    'ORDER BY seq LIMIT ?', (now - lease_seconds, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE outbox SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1 '
+                    'WHERE seq = ?', [(owner, now, row[0]) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return self._rows_to_entries(rows)
+
+    def ack(self, seqs):
+        """Elimina de la cola las entradas ya guardadas en el servidor"""
+        self._transaction([('DELETE FROM outbox WHERE seq = ?', (seq,)) for seq in seqs])
+
+    def release(self, seqs, error):
+        """Devuelve a la cola entradas que no se pudieron enviar"""
+        self._transaction([
+            ('UPDATE outbox SET claimed_by = NULL, claimed_at = NULL, last_error = ? WHERE seq = ?',
+             (str(error), seq))
+            for seq in seqs
+        ])
+
+    # --- Conflictos ---
+
+    def move_to_conflicts(self, entry, current, conflicts):
+        """Saca de la cola un cambio que choca con otro hecho en el servidor"""
+        self._transaction([
+            ('DELETE FROM outbox WHERE seq = ?', (entry['seq'],)),
+            ('INSERT OR REPLACE INTO conflicts (seq, zone_id, fields, base, current, conflicts, detected_at) '
+             'VALUES (?, ?, ?, ?, ?, ?, ?)',
+             (entry['seq'], entry['zone_id'], _dumps(entry['fields']), _dumps(entry['base']),
+              _dumps(current), _dumps(conflicts), time.time()))
+        ])
+
+    def conflicts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, zone_id, fields, base, current, conflicts, detected_at '
+                'FROM conflicts ORDER BY seq'
+            ).fetchall()
+        return [
+            {'seq': seq, 'zone_id': zone_id, 'fields': json.loads(fields), 'base': _loads(base),
+             'current': _loads(current), 'conflicts': json.loads(conflict_fields),
+             'detected_at': detected_at}
+            for seq, zone_id, fields, base, current, conflict_fields, detected_at in rows
+        ]
+
+    def resolve_conflict(self, seq, keep_mine):
+        """Descarta el cambio en conflicto o lo vuelve a encolar sin comprobar conflictos"""
+        conflict = next((c for c in self.conflicts() if c['seq'] == seq), None)
+        if conflict is None:
+            return False
+        statements = [('DELETE FROM conflicts WHERE seq = ?', (seq,))]
+        if keep_mine:
+            statements.append((
+                'INSERT INTO outbox (zone_id, fields, base, created_at) VALUES (?, ?, NULL, ?)',
+                (conflict['zone_id'], _dumps(conflict['fields']), time.time())
+            ))
+        self._transaction(statements)
+        return True
+
+    def stats(self):
+        with self._lock:
+            pending = self._conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+            conflicts = self._conn.execute('SELECT COUNT(*) FROM conflicts').fetchone()[0]
+            zones = self._conn.execute('SELECT COUNT(*) FROM zones').fetchone()[0]
+        return {'zones': zones, 'pending_writes': pending, 'conflicts': conflicts,
+                'last_pull': self.get_meta('last_pull')}
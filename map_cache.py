@@ -0,0 +1,101 @@
+# map_cache.py
+
+import threading
+from collections import OrderedDict
+
+from config import MAP_CACHE_MAX_ENTRIES, MAP_CACHE_MAX_BYTES
+from zone_cache import zones_etag
+from cache_manager import cache_manager
+
+
+class MapRenderCache:
+    """Caché LRU de los datos del mapa ya generados (el GeoJSON que publica
+    map_features), compartida por todas las sesiones.
+
+    La clave es el tipo de vista más la versión de la instantánea (o, si no se
+    indica, una huella del contenido de las zonas), así que cada instantánea
+    distinta se genera una sola vez por proceso. Se limita tanto el número de
+    entradas como el tamaño total en bytes.
+    """
+
+    def __init__(self, max_entries=MAP_CACHE_MAX_ENTRIES, max_bytes=MAP_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, view, zones, render, version=None):
+        """Devuelve el texto cacheado o lo genera con render(zones).
+
+        Si se indica version (lo que identifica la instantánea, p. ej. su
+        versión y ETag), la clave es (view, version) y no se recorren las zonas.
+        """
+        key = (view, version) if version is not None else (view, zones_etag(zones))
+        payload = self._get(key)
+        if payload is not None:
+            return payload
+
+        # Un único render por clave aunque varias sesiones lo pidan a la vez
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            payload = self._get(key)
+            if payload is None:
+                payload = render(zones)
+                self._put(key, payload)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return payload
+
+    def _get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return payload
+
+    def _put(self, key, payload):
+        if not payload:
+            return
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self.misses += 1
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = payload
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def invalidate(self):
+        self.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Instancia única del proceso
+map_cache = cache_manager.register('maps', MapRenderCache(), 'GeoJSON de los mapas por vista y versión de las zonas')
+
+def render_cached(view, zones, render, version=None):
+    """Genera los datos del mapa de la vista reutilizándolos si las zonas no cambiaron"""
+    return map_cache.get_or_render(view, zones, render, version)
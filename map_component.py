@@ -0,0 +1,118 @@
+# map_component.py
+
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from config import (
+    CENTER_LAT, CENTER_LON, CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM, CLUSTER_CELL_PX,
+    CLUSTER_TILE_CELLS, MAP_DELTA_HISTORY
+)
+from map_features import build_feature_collection, publish_features, feed_url, tiles_url
+from tracing import tracer
+from cache_manager import cache_manager
+
+COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'map_component')
+_zone_map = components.declare_component('zone_map', path=COMPONENT_DIR)
+
+
+class FeatureHistory:
+    """Últimas versiones de las features de cada vista, para calcular deltas"""
+
+    def __init__(self, max_versions=MAP_DELTA_HISTORY):
+        self.max_versions = max_versions
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, view, version, zones):
+        """Features {id: feature} de la versión, calculándolas la primera vez"""
+        with self._lock:
+            history = self._versions.setdefault(view, OrderedDict())
+            entry = history.get(version)
+            if entry is None:
+                collection = build_feature_collection(zones, view)
+                entry = {
+                    'features': {f['properties']['id']: f for f in collection['features']},
+                    'scalable': collection.get('scalable', False)
+                }
+                history[version] = entry
+                while len(history) > self.max_versions:
+                    history.popitem(last=False)
+            return entry
+
+    def previous(self, view, version):
+        with self._lock:
+            return self._versions.get(view, {}).get(version)
+
+    def invalidate(self):
+        """Olvida las versiones: el próximo envío a cada mapa será completo"""
+        with self._lock:
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'views': len(self._versions),
+                'versions': sum(len(history) for history in self._versions.values())
+            }
+
+
+feature_history = cache_manager.register('map_deltas', FeatureHistory(),
+                                         'Features por versión para enviar al mapa solo los cambios')
+
+def _delta(previous, current):
+    """Zonas añadidas o modificadas y zonas eliminadas entre dos versiones"""
+    old, new = previous['features'], current['features']
+    upserts = [feature for zone_id, feature in new.items() if old.get(zone_id) != feature]
+    removed = [zone_id for zone_id in old if zone_id not in new]
+    return upserts, removed
+
+def zone_map(view, snapshot, height=600, key='zone_map', selectable=False):
+    """Muestra el mapa de zonas como componente persistente.
+
+    El iframe no se recarga entre reruns: la primera vez descarga el GeoJSON
+    completo publicado y después solo recibe las zonas que cambiaron desde la
+    última versión enviada a esta sesión. En modo escalable descarga solo
+    las teselas del área visible, y de ellas salen también los popups, con
+    las propiedades de la vista. Devuelve el valor enviado por el
+    mapa (p. ej. {'selected': zone_id} al pulsar una zona si selectable=True).
+    """
+    zones = snapshot.zones
+    version = snapshot.version
+    with tracer.span('map.render', view, view=view, zones=len(zones), version=version) as span:
+        publish_features(view, snapshot)
+        current = feature_history.get(view, version, zones)
+
+        sent_key = f'_{key}_sent_version'
+        sent_version = st.session_state.get(sent_key)
+        args = {'version': version, 'base': None, 'upserts': [], 'removed': [],
+                'scalable': current['scalable']}
+        if sent_version == version:
+            args['base'] = version
+        elif sent_version is not None:
+            previous = feature_history.previous(view, sent_version)
+            if previous is not None and not current['scalable']:
+                args['base'] = sent_version
+                args['upserts'], args['removed'] = _delta(previous, current)
+        st.session_state[sent_key] = version
+        # same: el mapa ya tiene esta versión; delta: solo cambios; full: GeoJSON completo
+        span.set(mode='same' if args['base'] == version else 'delta' if args['base'] is not None else 'full',
+                 upserts=len(args['upserts']), removed=len(args['removed']))
+
+        config = {
+            'view': view,
+            'feedUrl': feed_url(view),
+            'tilesUrl': tiles_url(view),
+            'lat': CENTER_LAT,
+            'lon': CENTER_LON,
+            'minZoom': CLUSTER_MIN_ZOOM,
+            'maxClusterZoom': CLUSTER_MAX_ZOOM,
+            'cellPx': CLUSTER_CELL_PX,
+            'tileCells': CLUSTER_TILE_CELLS,
+            'height': height,
+            'selectable': selectable
+        }
+        return _zone_map(config=config, key=key, default=None, **args)
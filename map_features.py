@@ -0,0 +1,210 @@
+# map_features.py
+
+import hashlib
+import json
+import math
+import os
+import threading
+
+from config import (
+    SCALABLE_MAP_THRESHOLD, CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM, CLUSTER_CELL_PX,
+    CLUSTER_TILE_CELLS
+)
+from map_cache import render_cached
+
+# Carpeta servida por Streamlit en /app/static (server.enableStaticServing)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_URL = 'app/static'
+
+# Orden de los estados en los grupos del modo escalable
+STATUS_CODES = {'needed': 0, 'optimal': 1, 'overflow': 2}
+
+_published = {}
+_published_tiles = {}
+_publish_lock = threading.Lock()
+
+
+def _cell_size(zoom):
+    """Grados de longitud que ocupa una celda de agrupación a este nivel de zoom"""
+    return CLUSTER_CELL_PX * 360 / (256 * 2 ** zoom)
+
+
+def _cluster_cells(points, zoom):
+    """Agrupa los puntos (lat, lon, estado) en celdas de rejilla para un nivel de zoom"""
+    size = _cell_size(zoom)
+    cells = {}
+    for lat, lon, status in points:
+        key = (math.floor(lat / size), math.floor(lon / size))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0.0, 0.0, 0, 0, 0, 0]
+        cell[0] += lat
+        cell[1] += lon
+        cell[2] += 1
+        code = STATUS_CODES.get(status)
+        if code is not None:
+            cell[3 + code] += 1
+    return cells
+
+
+def _cluster(cell):
+    """Grupo [lat, lon, total, necesitadas, óptimas, saturadas] con el centroide de sus zonas"""
+    return [round(cell[0] / cell[2], 5), round(cell[1] / cell[2], 5), cell[2], cell[3], cell[4], cell[5]]
+
+
+def zone_feature(zone, view):
+    """Feature GeoJSON de una zona con las propiedades que muestra cada vista"""
+    # El id identifica la zona en las actualizaciones incrementales del mapa
+    properties = {
+        'id': zone.get('id') or zone['name'],
+        'status': zone['status'],
+        'name': zone['name'],
+        'access_notes': zone.get('access_notes', ''),
+        'pending_needs': zone.get('pending_needs') or [],
+        'last_update': zone.get('last_update', 'N/A')
+    }
+    if view == 'coordinator':
+        properties['volunteer_count'] = zone.get('volunteer_count', 0)
+        properties['covered_needs'] = zone.get('covered_needs') or []
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [round(float(zone['longitude']), 6), round(float(zone['latitude']), 6)]
+        },
+        'properties': properties
+    }
+
+
+def _valid_zones(zones):
+    return [
+        zone for zone in zones
+        if all(k in zone for k in ['status', 'latitude', 'longitude', 'name'])
+    ]
+
+
+def build_feature_collection(zones, view):
+    """FeatureCollection de las zonas.
+
+    Con más de SCALABLE_MAP_THRESHOLD zonas la colección va vacía y marcada
+    como 'scalable': el mapa descarga por teselas (build_tiles) solo los
+    grupos o las zonas del área visible.
+    """
+    valid = _valid_zones(zones)
+    if len(valid) > SCALABLE_MAP_THRESHOLD:
+        return {'type': 'FeatureCollection', 'features': [], 'scalable': True}
+    return {
+        'type': 'FeatureCollection',
+        'features': [zone_feature(zone, view) for zone in valid]
+    }
+
+
+def build_tiles(zones, view):
+    """Teselas del modo escalable: {'zoom/fila_columna.json': contenido}.
+
+    Cada tesela cubre CLUSTER_TILE_CELLS x CLUSTER_TILE_CELLS celdas de
+    agrupación. Hasta CLUSTER_MAX_ZOOM contienen los grupos de su área; en
+    CLUSTER_MAX_ZOOM + 1, las features completas de sus zonas con las
+    propiedades de la vista (de ahí salen los popups). El tamaño de cada
+    tesela depende de la densidad de zonas, no de cuántas haya en total.
+    """
+    valid = _valid_zones(zones)
+    if len(valid) <= SCALABLE_MAP_THRESHOLD:
+        return {}
+    tiles = {}
+    points = [(float(z['latitude']), float(z['longitude']), z['status']) for z in valid]
+    for zoom in range(CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM + 1):
+        for (row, col), cell in _cluster_cells(points, zoom).items():
+            name = f'{zoom}/{row // CLUSTER_TILE_CELLS}_{col // CLUSTER_TILE_CELLS}.json'
+            tiles.setdefault(name, []).append(_cluster(cell))
+    detail_zoom = CLUSTER_MAX_ZOOM + 1
+    size = _cell_size(detail_zoom) * CLUSTER_TILE_CELLS
+    for zone, (lat, lon, _) in zip(valid, points):
+        name = f'{detail_zoom}/{math.floor(lat / size)}_{math.floor(lon / size)}.json'
+        tiles.setdefault(name, []).append(zone_feature(zone, view))
+    return {name: _dumps(content) for name, content in tiles.items()}
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def zones_to_geojson(zones, view, version=None):
+    """GeoJSON minificado (sin espacios), apto para comprimir con gzip"""
+    collection = build_feature_collection(zones, view)
+    if version is not None:
+        collection['version'] = version
+    return _dumps(collection)
+
+
+def feed_url(view):
+    """Ruta relativa del GeoJSON publicado para la vista"""
+    return f'{STATIC_URL}/zones_{view}.geojson'
+
+
+def tiles_url(view):
+    """Ruta relativa de la carpeta de teselas de la vista"""
+    return f'{STATIC_URL}/tiles_{view}'
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)  # Sustitución atómica: nunca se sirve a medias
+
+
+def _existing_tiles(directory):
+    """Teselas escritas por un proceso anterior, con huella desconocida"""
+    names = {}
+    for folder, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith('.json'):
+                names[os.path.relpath(os.path.join(folder, file), directory).replace(os.sep, '/')] = None
+    return names
+
+
+def _publish_tiles(view, tiles):
+    """Escribe solo las teselas que cambiaron y borra las que quedaron vacías"""
+    directory = os.path.join(STATIC_DIR, f'tiles_{view}')
+    published = _published_tiles.get(view)
+    if published is None:
+        published = _existing_tiles(directory)
+    digests = {}
+    for name, content in tiles.items():
+        digest = hashlib.sha1(content.encode()).hexdigest()
+        if published.get(name) != digest:
+            _write_atomic(os.path.join(directory, name), content)
+        digests[name] = digest
+    for name in published.keys() - digests.keys():
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    _published_tiles[view] = digests
+
+
+def publish_features(view, snapshot):
+    """Escribe el GeoJSON de la vista en la carpeta estática si la instantánea cambió.
+
+    El archivo tiene un nombre fijo por vista; Streamlit lo sirve con ETag, así
+    que el mapa lo revalida y solo lo descarga cuando cambia. En modo
+    escalable se escriben antes las teselas, también con nombre fijo: tras un
+    cambio el mapa solo vuelve a descargar las teselas visibles que cambiaron.
+
+    La instantánea se identifica por su versión y su ETag (calculado una vez al
+    descargarla): un rerun con la instantánea ya publicada no recorre las zonas.
+    """
+    identity = (snapshot.version, snapshot.etag)
+    if _published.get(view) == identity:
+        return
+    geojson = render_cached(f'{view}-geojson', snapshot.zones,
+                            lambda zones: zones_to_geojson(zones, view, snapshot.version),
+                            version=identity)
+    with _publish_lock:
+        if _published.get(view) == identity:
+            return
+        _publish_tiles(view, build_tiles(snapshot.zones, view))
+        _write_atomic(os.path.join(STATIC_DIR, f'zones_{view}.geojson'), geojson)
+        _published[view] = identity
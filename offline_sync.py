@@ -0,0 +1,327 @@
+# offline_sync.py
+
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+from config import OFFLINE_SYNC_INTERVAL, OFFLINE_FLUSH_BATCH
+from status_engine import compute_statuses
+from zone_history import record_paths
+
+NEED_FIELDS = ('pending_needs', 'covered_needs')
+# Errores 4xx pasajeros: credenciales caducadas, tiempo de espera, límite de peticiones
+RETRYABLE_STATUS = frozenset([401, 408, 429])
+
+
+def is_connectivity_error(error):
+    """True si el error indica falta de conexión o caída del servidor (no un rechazo)"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+def _is_rejection(status_code):
+    """True si el servidor rechaza el cambio en sí: reenviarlo tal cual no serviría de nada"""
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_STATUS
+
+
+def _clean_zones(data):
+    if isinstance(data, dict):
+        return [zone for zone in data.values() if isinstance(zone, dict)]
+    if isinstance(data, list):
+        return [zone for zone in data if isinstance(zone, dict)]
+    return []
+
+
+def _comparable(zone, key):
+    value = (zone or {}).get(key)
+    if key in NEED_FIELDS:
+        return list(value or [])
+    return value
+
+
+class OfflineSync:
+    """Sincroniza la copia local (LocalStore) con Firebase en segundo plano.
+
+    - Las lecturas se sirven siempre desde la copia local; solo la primera, si
+      nunca se ha sincronizado, espera a la red.
+    - Los cambios que no se pudieron enviar esperan en la cola del LocalStore y
+      se envían por lotes, en un único PATCH multi-ruta por lote, cuando vuelve
+      la conexión. Si otro usuario cambió el mismo campo entretanto, el cambio
+      pasa a la tabla de conflictos para que alguien decida.
+    - Los cambios de volunteer_count se envían como incrementos respecto a la
+      versión que vio el usuario, así no se pierden llegadas concurrentes.
+
+    send es la función que envía las peticiones (EmergencyDatabase._send) y
+    mirror, si se indica, devuelve (en vivo, datos) del espejo en tiempo real.
+    """
+
+    def __init__(self, send, store, mirror=None, on_change=None,
+                 interval=OFFLINE_SYNC_INTERVAL, batch=OFFLINE_FLUSH_BATCH, history=True):
+        self._send = send
+        self.store = store
+        self._mirror = mirror
+        self.on_change = on_change
+        self.interval = interval
+        self.batch = batch
+        self.history = history
+        self.owner = uuid.uuid4().hex
+        self.online = None
+        self.last_error = None
+        self.last_sync = None
+        self.flushed = 0
+        self.conflicts_detected = 0
+        self._etag = None
+        self._dirty = True
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Ciclo en segundo plano ---
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='offline-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def notify_change(self):
+        """El servidor cambió (p. ej. evento del espejo): volver a leer cuanto antes"""
+        self._dirty = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.sync_once()
+
+    def sync_once(self):
+        """Envía lo pendiente y actualiza la copia local. Devuelve True si hubo cambios"""
+        try:
+            sent = self.flush_all()
+            changed = self.pull()
+            self._mark_online()
+            if (sent or changed) and self.on_change:
+                self.on_change()
+            return bool(sent or changed)
+        except requests.RequestException as e:
+            if not is_connectivity_error(e):
+                print(f"Error sincronizando la copia local: {e}")
+            self._mark_offline(e)
+            return False
+        except Exception as e:
+            print(f"Error sincronizando la copia local: {e}")
+            self.last_error = str(e)
+            return False
+
+    def _mark_online(self):
+        self.online = True
+        self.last_error = None
+        self.last_sync = time.time()
+
+    def _mark_offline(self, error):
+        self.online = False
+        self.last_error = str(error)
+
+    # --- Lecturas ---
+
+    def read_zones(self):
+        """Zonas de la copia local, sin esperar a la red salvo en la primera carga.
+
+        Si la copia nunca se ha sincronizado y la primera carga falla, el error
+        se propaga: una copia vacía sin sincronizar no significa "no hay zonas".
+        """
+        if self.store.get_meta('last_pull') is None:
+            try:
+                self.pull(force=True)
+                self._mark_online()
+            except requests.RequestException as e:
+                self._mark_offline(e)
+                raise
+        return self.store.zones()
+
+    def _fetch_remote(self):
+        """(zonas, ETag) del servidor, usando el espejo en vivo si lo hay"""
+        if self._mirror is not None:
+            live, data = self._mirror()
+            if live:
+                return _clean_zones(data), None
+        response = self._send('GET', 'zones', headers={'X-Firebase-ETag': 'true'})
+        response.raise_for_status()
+        return _clean_zones(response.json()), response.headers.get('ETag')
+
+    def pull(self, force=False):
+        """Sustituye la copia local por la del servidor. Devuelve True si cambió"""
+        mirror_live = self._mirror is not None and self._mirror()[0]
+        if mirror_live and not (force or self._dirty):
+            return False  # El espejo avisa de cada cambio: no hace falta volver a leer
+        self._dirty = False
+        zones, etag = self._fetch_remote()
+        if etag and etag == self._etag and not force:
+            return False
+        self.store.replace_zones(zones)
+        self._etag = etag
+        return True
+
+    # --- Escrituras ---
+
+    def queue_update(self, zone_id, fields, base=None):
+        """Encola un cambio de zona; base es la zona tal como la vio el usuario"""
+        self.store.enqueue(zone_id, fields, base)
+        self._wake.set()
+
+    def flush_all(self):
+        """Envía lotes hasta vaciar la cola. Devuelve el número de cambios guardados"""
+        total = 0
+        zones = None
+        while True:
+            if zones is None and self.store.stats()['pending_writes'] == 0:
+                return total
+            if zones is None:
+                # Una sola lectura del servidor para todos los lotes
+                current, _ = self._fetch_remote()
+                zones = {zone['id']: zone for zone in current if zone.get('id')}
+            sent, claimed = self.flush(zones)
+            total += sent
+            if claimed < self.batch:
+                return total
+
+    def flush(self, zones=None):
+        """Envía un lote de la cola. Devuelve (cambios guardados, entradas reservadas).
+
+        zones es la versión del servidor ({id: zona}) con la que se comprueban
+        los conflictos; se lee si no se pasa y se actualiza con lo enviado.
+        Sin conexión (o con el servidor caído) las entradas vuelven a la cola;
+        las que el servidor rechaza pasan a conflictos para no bloquear al resto.
+        """
+        entries = self.store.claim(self.owner, self.batch)
+        if not entries:
+            return 0, 0
+        try:
+            if zones is None:
+                current, _ = self._fetch_remote()
+                zones = {zone['id']: zone for zone in current if zone.get('id')}
+            acked = self._send_entries(entries, zones)
+        except Exception as e:
+            self.store.release([entry['seq'] for entry in entries], e)
+            raise
+        return len(acked), len(entries)
+
+    def _send_entries(self, entries, zones):
+        """Envía las entradas en un PATCH multi-ruta. Devuelve las guardadas.
+
+        Si el servidor rechaza el PATCH no se sabe qué entrada lo causó: se
+        reenvían una a una y solo la rechazada pasa a conflictos.
+        """
+        multi_path, acked, touched = self._build_patch(entries, zones)
+        if multi_path:
+            response = self._send('PATCH', '', multi_path)
+            if _is_rejection(response.status_code):
+                if len(acked) > 1:
+                    pending = [entry for entry in entries if entry['seq'] in acked]
+                    return [seq for entry in pending for seq in self._send_entries([entry], zones)]
+                entry = next(entry for entry in entries if entry['seq'] in acked)
+                self.store.move_to_conflicts(
+                    entry, zones.get(entry['zone_id']),
+                    [f'rechazado por el servidor ({response.status_code})']
+                )
+                self.conflicts_detected += 1
+                return []
+            response.raise_for_status()
+        zones.update(touched)
+        self.store.ack(acked)
+        self.flushed += len(acked)
+        return acked
+
+    def _build_patch(self, entries, zones):
+        """PATCH multi-ruta con los cambios sin conflicto; los conflictivos se apartan"""
+        multi_path = {}
+        acked = []
+        count_deltas = {}
+        absolute_counts = set()
+        touched = {}
+        now = str(datetime.now())
+
+        for entry in entries:
+            zone_id, fields, base = entry['zone_id'], entry['fields'], entry['base']
+            zone = touched.get(zone_id) or zones.get(zone_id)
+            if zone is None:
+                self.store.move_to_conflicts(entry, None, ['zona eliminada'])
+                self.conflicts_detected += 1
+                continue
+            if base is not None:
+                conflicts = [
+                    key for key, value in fields.items()
+                    if key != 'volunteer_count'
+                    and _comparable(zone, key) != _comparable(base, key)
+                    and _comparable(zone, key) != _comparable(fields, key)
+                ]
+                if conflicts:
+                    self.store.move_to_conflicts(entry, zone, conflicts)
+                    self.conflicts_detected += 1
+                    continue
+
+            zone = dict(zone)
+            for key, value in fields.items():
+                if key == 'volunteer_count':
+                    if base is not None:
+                        # Incremento respecto a lo que vio el usuario
+                        delta = value - (base.get('volunteer_count') or 0)
+                        count_deltas[zone_id] = count_deltas.get(zone_id, 0) + delta
+                        zone['volunteer_count'] = (zone.get('volunteer_count') or 0) + delta
+                    else:
+                        absolute_counts.add(zone_id)
+                        zone['volunteer_count'] = value
+                else:
+                    multi_path[f'zones/{zone_id}/{key}'] = value
+                    zone[key] = value
+            touched[zone_id] = zone
+            acked.append(entry['seq'])
+
+        for zone_id, zone in touched.items():
+            if zone_id in absolute_counts:
+                multi_path[f'zones/{zone_id}/volunteer_count'] = zone['volunteer_count']
+            elif count_deltas.get(zone_id):
+                multi_path[f'zones/{zone_id}/volunteer_count'] = {'.sv': {'increment': count_deltas[zone_id]}}
+            multi_path[f'zones/{zone_id}/last_update'] = now
+
+        for (zone_id, zone), status in zip(touched.items(), compute_statuses(list(touched.values()))):
+            multi_path[f'zones/{zone_id}/status'] = status
+            zone['status'] = status
+            if self.history:
+                multi_path.update(record_paths(zone_id, 'offline', zone))
+        return multi_path, acked, touched
+
+    # --- Estado ---
+
+    def conflicts(self):
+        return self.store.conflicts()
+
+    def resolve_conflict(self, seq, keep_mine):
+        resolved = self.store.resolve_conflict(seq, keep_mine)
+        if resolved:
+            self._dirty = True
+            self._wake.set()
+        return resolved
+
+    def stats(self):
+        stats = self.store.stats()
+        stats.update({
+            'online': self.online,
+            'last_sync': self.last_sync,
+            'last_error': self.last_error,
+            'flushed': self.flushed,
+            'conflicts_detected': self.conflicts_detected
+        })
+        return stats
@@ -0,0 +1,135 @@
+# realtime.py
+
+import copy
+import json
+import threading
+
+import requests
+
+from config import (
+    HTTP_CONNECT_TIMEOUT, REALTIME_READ_TIMEOUT, REALTIME_RECONNECT_DELAY,
+    REALTIME_RECONNECT_MAX_DELAY
+)
+
+
+def _apply_delta(root, path, data):
+    """Aplica un evento 'put' de Firebase sobre el árbol en memoria y devuelve la nueva raíz"""
+    keys = [key for key in path.split('/') if key]
+    if not keys:
+        return data
+
+    if not isinstance(root, dict):
+        # Firebase devuelve listas cuando las claves son índices consecutivos
+        root = {str(i): v for i, v in enumerate(root) if v is not None} if isinstance(root, list) else {}
+
+    node = root
+    for key in keys[:-1]:
+        child = node.get(key)
+        if isinstance(child, list):
+            child = {str(i): v for i, v in enumerate(child) if v is not None}
+        elif not isinstance(child, dict):
+            if data is None:
+                return root  # Borrar algo que no existe no cambia nada
+            child = {}
+        node[key] = child
+        node = child
+
+    if data is None:
+        node.pop(keys[-1], None)
+    else:
+        node[keys[-1]] = data
+    return root
+
+class RealtimeListener:
+    """Mantiene un espejo en memoria de un nodo de Firebase mediante streaming SSE.
+
+    Un hilo en segundo plano escucha los eventos 'put' y 'patch' de la API REST
+    y los aplica como deltas. Si la conexión se cae, reconecta con espera
+    creciente; al reconectar Firebase reenvía el nodo completo, con lo que el
+    espejo se resincroniza sin perder cambios.
+    """
+
+    def __init__(self, db_url, path, on_change=None):
+        self.url = f"{db_url}/{path}.json"
+        self.path = path
+        self.on_change = on_change
+        self.live = False
+        self.events_applied = 0
+        self.reconnects = 0
+        self._data = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f"realtime-{self.path}", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.live = False
+
+    def get(self):
+        """Copia del nodo espejado (None si aún no hay datos)"""
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def _run(self):
+        delay = REALTIME_RECONNECT_DELAY
+        session = requests.Session()
+        while not self._stop.is_set():
+            try:
+                self._listen(session)
+                delay = REALTIME_RECONNECT_DELAY
+            except Exception as e:
+                print(f"Error en escucha de {self.path}: {e}")
+            self.live = False
+            if self._stop.wait(delay):
+                break
+            self.reconnects += 1
+            delay = min(delay * 2, REALTIME_RECONNECT_MAX_DELAY)
+        session.close()
+
+    def _listen(self, session):
+        headers = {'Accept': 'text/event-stream'}
+        with session.get(self.url, headers=headers, stream=True,
+                         timeout=(HTTP_CONNECT_TIMEOUT, REALTIME_READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            event, data_lines = None, []
+            for line in response.iter_lines(decode_unicode=True):
+                if self._stop.is_set():
+                    return
+                if line is None:
+                    continue
+                if line.startswith('event:'):
+                    event = line[len('event:'):].strip()
+                elif line.startswith('data:'):
+                    data_lines.append(line[len('data:'):].strip())
+                elif line == '':
+                    if event is not None:
+                        self._handle_event(event, '\n'.join(data_lines))
+                    event, data_lines = None, []
+
+    def _handle_event(self, event, raw_data):
+        if event in ('put', 'patch'):
+            message = json.loads(raw_data)
+            path, data = message['path'], message['data']
+            with self._lock:
+                if event == 'put':
+                    self._data = _apply_delta(self._data, path, data)
+                else:
+                    for key, value in (data or {}).items():
+                        self._data = _apply_delta(self._data, f"{path.rstrip('/')}/{key}", value)
+                self.events_applied += 1
+            # El primer 'put' tras conectar trae el nodo completo
+            self.live = True
+            if self.on_change:
+                self.on_change(self.path)
+        elif event == 'cancel':
+            raise ConnectionError(f"Firebase canceló la escucha de {self.path}: {raw_data}")
+        elif event == 'auth_revoked':
+            raise ConnectionError(f"Credenciales revocadas para {self.path}")
+        # 'keep-alive' no requiere acción
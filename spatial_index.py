@@ -0,0 +1,179 @@
+# spatial_index.py
+
+import heapq
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Zonas que se espera encontrar en cada celda al elegir el tamaño de la rejilla
+TARGET_CELL_OCCUPANCY = 8
+MIN_CELL_DEGREES = 0.0005
+MAX_CELL_DEGREES = 1.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia en kilómetros sobre la superficie terrestre"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class ZoneSpatialIndex:
+    """Índice de rejilla (cubetas lat/lon) de las zonas, separado por estado.
+
+    El tamaño de celda se ajusta al número de zonas y a su extensión para que
+    cada celda tenga pocas zonas. sync() aplica solo las zonas que cambiaron
+    respecto a la versión anterior y reconstruye la rejilla si el número de
+    zonas se ha duplicado o reducido a la mitad.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.cell = None
+        self._zones = {}      # id -> zona
+        self._points = {}     # id -> (lat, lon, estado, celda)
+        self._buckets = {}    # estado -> {celda: set(ids)}
+        self._extent = {}     # estado -> [min_x, min_y, max_x, max_y] en celdas
+        self._built_size = 0
+        self._lock = threading.RLock()
+
+    # --- Mantenimiento ---
+
+    def _cell_of(self, lat, lon):
+        return (math.floor(lon / self.cell), math.floor(lat / self.cell))
+
+    def _choose_cell_size(self, points):
+        lats = [p[0] for p in points]
+        lons = [p[1] for p in points]
+        area = max(max(lats) - min(lats), MIN_CELL_DEGREES) * max(max(lons) - min(lons), MIN_CELL_DEGREES)
+        cell = math.sqrt(area * TARGET_CELL_OCCUPANCY / len(points))
+        return min(max(cell, MIN_CELL_DEGREES), MAX_CELL_DEGREES)
+
+    def _insert(self, zone_id, zone, lat, lon, status):
+        cell = self._cell_of(lat, lon)
+        self._zones[zone_id] = zone
+        self._points[zone_id] = (lat, lon, status, cell)
+        self._buckets.setdefault(status, {}).setdefault(cell, set()).add(zone_id)
+        extent = self._extent.get(status)
+        if extent is None:
+            self._extent[status] = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            extent[0] = min(extent[0], cell[0])
+            extent[1] = min(extent[1], cell[1])
+            extent[2] = max(extent[2], cell[0])
+            extent[3] = max(extent[3], cell[1])
+
+    def _remove(self, zone_id):
+        lat, lon, status, cell = self._points.pop(zone_id)
+        self._zones.pop(zone_id, None)
+        bucket = self._buckets[status][cell]
+        bucket.discard(zone_id)
+        if not bucket:
+            del self._buckets[status][cell]
+
+    def rebuild(self, zones):
+        """Reconstruye el índice completo con un tamaño de celda nuevo"""
+        with self._lock:
+            entries = _valid_entries(zones)
+            self._zones, self._points, self._buckets, self._extent = {}, {}, {}, {}
+            self.cell = self._choose_cell_size([e[2:4] for e in entries]) if entries else MAX_CELL_DEGREES
+            for zone_id, zone, lat, lon, status in entries:
+                self._insert(zone_id, zone, lat, lon, status)
+            self._built_size = len(entries)
+
+    def sync(self, snapshot):
+        """Actualiza el índice a la instantánea indicada aplicando solo los cambios"""
+        with self._lock:
+            if snapshot.version == self.version:
+                return
+            entries = _valid_entries(snapshot.zones)
+            size = len(entries)
+            if self.cell is None or size > 2 * self._built_size or size < self._built_size // 2:
+                self.rebuild(snapshot.zones)
+            else:
+                current_ids = set()
+                for zone_id, zone, lat, lon, status in entries:
+                    current_ids.add(zone_id)
+                    point = self._points.get(zone_id)
+                    if point is not None and point[:3] == (lat, lon, status):
+                        self._zones[zone_id] = zone
+                        continue
+                    if point is not None:
+                        self._remove(zone_id)
+                    self._insert(zone_id, zone, lat, lon, status)
+                for zone_id in [z for z in self._points if z not in current_ids]:
+                    self._remove(zone_id)
+            self.version = snapshot.version
+
+    # --- Consultas ---
+
+    def nearest(self, lat, lon, k=5, status='needed'):
+        """Las k zonas más cercanas con el estado indicado, como [(zona, km)]"""
+        with self._lock:
+            buckets = self._buckets.get(status)
+            if not buckets or k <= 0:
+                return []
+            cx, cy = self._cell_of(lat, lon)
+            extent = self._extent[status]
+            # Anillos necesarios para cubrir todas las celdas con zonas de este estado
+            max_ring = max(abs(cx - extent[0]), abs(cx - extent[2]),
+                           abs(cy - extent[1]), abs(cy - extent[3]))
+
+            best = []  # montículo de (-distancia, id) con las k mejores
+            for ring in range(max_ring + 1):
+                for cell in _ring_cells(cx, cy, ring):
+                    for zone_id in buckets.get(cell, ()):
+                        z_lat, z_lon = self._points[zone_id][:2]
+                        distance = haversine_km(lat, lon, z_lat, z_lon)
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, zone_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, zone_id))
+                # Lo que queda sin revisar está al menos a 'ring' celdas de distancia
+                if len(best) == k and -best[0][0] <= self._min_ring_distance_km(lat, ring):
+                    break
+
+            return [(self._zones[zone_id], -neg) for neg, zone_id in sorted(best, reverse=True)]
+
+    def _min_ring_distance_km(self, lat, ring):
+        """Cota inferior de la distancia a cualquier celda fuera de los anillos revisados"""
+        reach = ring * self.cell
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat) + reach)))
+        return reach * KM_PER_DEGREE * cos_lat
+
+
+def _valid_entries(zones):
+    """(id, zona, lat, lon, estado) de las zonas con coordenadas y estado"""
+    entries = []
+    for zone in zones:
+        try:
+            entries.append((zone.get('id') or zone.get('name'), zone,
+                            float(zone['latitude']), float(zone['longitude']), zone['status']))
+        except (KeyError, TypeError, ValueError):
+            continue  # Zona con datos incompletos
+    return entries
+
+
+def _ring_cells(cx, cy, ring):
+    """Celdas del borde del cuadrado de radio 'ring' alrededor de (cx, cy)"""
+    if ring == 0:
+        yield (cx, cy)
+        return
+    for dx in range(-ring, ring + 1):
+        yield (cx + dx, cy - ring)
+        yield (cx + dx, cy + ring)
+    for dy in range(-ring + 1, ring):
+        yield (cx - ring, cy + dy)
+        yield (cx + ring, cy + dy)
+
+
+def linear_nearest(zones, lat, lon, k=5, status='needed'):
+    """Búsqueda lineal de referencia, usada para comparar en los benchmarks"""
+    candidates = [
+        (haversine_km(lat, lon, float(z['latitude']), float(z['longitude'])), i)
+        for i, z in enumerate(zones) if z.get('status') == status
+    ]
+    return [(zones[i], d) for d, i in heapq.nsmallest(k, candidates)]
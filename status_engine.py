@@ -0,0 +1,83 @@
+# status_engine.py
+
+import numpy as np
+
+from config import ZONE_STATES, STATUS_NEEDED_BELOW, STATUS_OVERFLOW_ABOVE, STATUS_HYSTERESIS
+
+NEEDED, OPTIMAL, OVERFLOW = (ZONE_STATES.index(s) for s in ('needed', 'optimal', 'overflow'))
+_STATE_CODES = {status: code for code, status in enumerate(ZONE_STATES)}
+
+
+def _number(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def evaluate_statuses(counts, previous, low, high, hysteresis=STATUS_HYSTERESIS):
+    """Calcula el estado de muchas zonas a la vez.
+
+    Todos los argumentos son arrays de la misma longitud; previous contiene el
+    índice en ZONE_STATES del estado actual o -1 si no tiene. Una zona solo
+    entra en 'needed' por debajo de low*(1-h) y solo sale por encima de
+    low*(1+h); lo mismo para 'overflow' alrededor de high. Las zonas sin estado
+    previo usan los umbrales sin margen. Devuelve los índices en ZONE_STATES.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.int64)
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+
+    known = previous >= 0
+    enter_needed = np.where(known, low * (1 - hysteresis), low)
+    enter_overflow = np.where(known, high * (1 + hysteresis), high)
+    stay_needed = (previous == NEEDED) & (counts < low * (1 + hysteresis))
+    stay_overflow = (previous == OVERFLOW) & (counts > high * (1 - hysteresis))
+
+    return np.select(
+        [stay_needed, stay_overflow, counts < enter_needed, counts > enter_overflow],
+        [NEEDED, OVERFLOW, NEEDED, OVERFLOW],
+        default=OPTIMAL
+    )
+
+
+def _float_column(zones, key, default):
+    """Columna numérica de las zonas; los valores ausentes o no numéricos toman default"""
+    values = [zone.get(key) for zone in zones]
+    try:
+        column = np.array(values, dtype=np.float64)  # Ausentes (None) -> NaN
+    except (TypeError, ValueError):
+        column = np.fromiter((_number(v, np.nan) for v in values), np.float64, len(values))
+    return np.where(np.isnan(column), default, column)
+
+
+def zone_arrays(zones):
+    """(voluntarios, estado previo, mínimo, máximo) de las zonas como arrays"""
+    counts = _float_column(zones, 'volunteer_count', 0)
+    previous = np.fromiter((_STATE_CODES.get(z.get('status'), -1) for z in zones), np.int64, len(zones))
+    low = _float_column(zones, 'min_volunteers', STATUS_NEEDED_BELOW)
+    high = np.maximum(_float_column(zones, 'max_volunteers', STATUS_OVERFLOW_ABOVE), low)
+    return counts, previous, low, high
+
+
+def compute_statuses(zones):
+    """Estado que corresponde a cada zona (lista en el mismo orden)"""
+    if not zones:
+        return []
+    codes = evaluate_statuses(*zone_arrays(zones))
+    return [ZONE_STATES[code] for code in codes]
+
+
+def zone_status(zone):
+    """Estado que corresponde a una zona según sus voluntarios y su estado actual"""
+    return compute_statuses([zone])[0]
+
+
+def status_changes(zones):
+    """{id: nuevo estado} de las zonas cuyo estado guardado ya no corresponde"""
+    return {
+        zone.get('id'): status
+        for zone, status in zip(zones, compute_statuses(zones))
+        if zone.get('status') != status and zone.get('id')
+    }
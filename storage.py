@@ -0,0 +1,330 @@
+# storage.py
+"""Backends de almacenamiento de la aplicación.
+
+Todos exponen la misma interfaz, la de la API REST de Realtime Database, que
+es la que usa EmergencyDatabase (y checkins, zone_history, offline_sync a
+través de su función send):
+
+- request(method, path, data, headers, params): GET/PUT/PATCH/DELETE sobre
+  una ruta del árbol, con ETags (X-Firebase-ETag, if-match, If-None-Match),
+  PATCH multi-ruta, valores de servidor {'.sv': ...}, lecturas shallow y
+  consultas por clave. Devuelve un objeto con la interfaz de requests.Response.
+- get/set/update/delete/batch: atajos sobre request para zonas, coordinadores
+  o cualquier otra ruta ('zones/{id}', 'coordinators/{usuario}'...).
+- subscribe(path, on_change): espejo en memoria de un nodo que avisa de cada
+  cambio (start, stop, get, live).
+
+Implementaciones, elegidas con STORAGE_BACKEND en config.py:
+- 'firebase': Firebase por REST con el transporte HTTP compartido.
+- 'memory': árbol en memoria del proceso, sin red (pruebas y benchmarks).
+- 'sqlite': como 'memory', pero cada escritura se guarda en SQLite (modo WAL)
+  y el árbol se recupera al arrancar: un despliegue regional sin Firebase.
+"""
+
+import http
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config import STORAGE_BACKEND, STORAGE_SQLITE_PATH, HTTP_LATENCY_WINDOW
+from storage_tree import FirebaseTree, changed_paths, copy_value, handle_request, split_path
+from realtime import RealtimeListener
+from transport import PooledTransport, _percentile
+
+
+class LocalResponse:
+    """Respuesta de un backend local con la interfaz de requests.Response que usamos"""
+
+    def __init__(self, status_code, value, etag=None, url=''):
+        self.status_code = status_code
+        self.url = url
+        self.reason = http.HTTPStatus(status_code).phrase
+        self.headers = CaseInsensitiveDict({'ETag': etag} if etag else {})
+        self._value = value
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self._value
+
+    @property
+    def text(self):
+        return '' if self.status_code == 304 else json.dumps(self._value, separators=(',', ':'))
+
+    @property
+    def content(self):
+        return self.text.encode()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error: {self.reason} for url: {self.url}", response=self
+            )
+
+
+class StorageBackend:
+    """Interfaz común de los backends; las subclases implementan request y subscribe"""
+
+    name = None
+    # True si las peticiones salen a la red (y por tanto pueden fallar por conexión)
+    remote = False
+
+    def request(self, method, path, data=None, headers=None, params=None):
+        raise NotImplementedError
+
+    def subscribe(self, path, on_change=None):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+    # --- Atajos CRUD ---
+
+    def get(self, path, **params):
+        response = self.request('GET', path, params=params or None)
+        response.raise_for_status()
+        return response.json()
+
+    def set(self, path, value):
+        response = self.request('PUT', path, value)
+        response.raise_for_status()
+        return response.json()
+
+    def update(self, path, data):
+        response = self.request('PATCH', path, data)
+        response.raise_for_status()
+        return response.json()
+
+    def delete(self, path):
+        response = self.request('DELETE', path)
+        response.raise_for_status()
+
+    def batch(self, paths):
+        """Escritura atómica de varias rutas ({'zones/a/x': 1, 'meta/b': 2})"""
+        return self.update('', paths)
+
+
+class FirebaseRestBackend(StorageBackend):
+    """Firebase Realtime Database por su API REST"""
+
+    name = 'firebase'
+    remote = True
+
+    def __init__(self, db_url, transport=None):
+        self.db_url = db_url.rstrip('/')
+        self.transport = transport or PooledTransport()
+
+    def request(self, method, path, data=None, headers=None, params=None):
+        return self.transport.request(method, f"{self.db_url}/{path}.json", data,
+                                      headers=headers, params=params)
+
+    def subscribe(self, path, on_change=None):
+        return RealtimeListener(self.db_url, path, on_change=on_change)
+
+    def stats(self):
+        return self.transport.stats()
+
+
+class TreeSubscription:
+    """Espejo de un nodo de un backend local; misma interfaz que RealtimeListener.
+
+    No guarda copia propia: get() lee el árbol del backend, que ya está en
+    memoria. on_change se llama tras cada escritura que afecta al nodo.
+    """
+
+    def __init__(self, backend, path, on_change=None):
+        self.backend = backend
+        self.path = path
+        self.parts = split_path(path)
+        self.on_change = on_change
+        self.live = False
+        self.events_applied = 0
+        self.reconnects = 0
+
+    def start(self):
+        if not self.live:
+            self.live = True
+            self.backend._subscriptions.append(self)
+
+    def stop(self):
+        self.live = False
+        if self in self.backend._subscriptions:
+            self.backend._subscriptions.remove(self)
+
+    def get(self):
+        with self.backend.tree.lock:
+            return copy_value(self.backend.tree.get(self.parts))
+
+    def _affected_by(self, parts):
+        common = min(len(parts), len(self.parts))
+        return parts[:common] == self.parts[:common]
+
+
+class MemoryBackend(StorageBackend):
+    """Árbol JSON en memoria del proceso, con la semántica de Firebase"""
+
+    name = 'memory'
+
+    def __init__(self, data=None):
+        self.tree = FirebaseTree(copy_value(data))
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=HTTP_LATENCY_WINDOW)
+        self._request_count = 0
+        self._error_count = 0
+
+    def request(self, method, path, data=None, headers=None, params=None):
+        start = time.perf_counter()
+        parts = split_path(path)
+        changed = []
+        with self.tree.lock:
+            status, value, etag = handle_request(self.tree, method, parts, params, headers, data)
+            if status == 200 and method != 'GET':
+                changed = changed_paths(method, parts, data)
+                self._persist(changed)
+        self._record(time.perf_counter() - start, error=status >= 400)
+        if changed:
+            self._notify(changed)
+        return LocalResponse(status, value, etag, url=path)
+
+    def _persist(self, changed):
+        """Punto de extensión para guardar las escrituras (SQLiteBackend)"""
+
+    def _notify(self, changed):
+        for subscription in list(self._subscriptions):
+            if any(subscription._affected_by(parts) for parts in changed):
+                subscription.events_applied += 1
+                if subscription.on_change:
+                    subscription.on_change(subscription.path)
+
+    def subscribe(self, path, on_change=None):
+        return TreeSubscription(self, path, on_change=on_change)
+
+    def _record(self, elapsed, error=False):
+        with self._lock:
+            self._request_count += 1
+            if error:
+                self._error_count += 1
+            self._latencies.append(elapsed)
+
+    def stats(self):
+        """Mismas métricas que PooledTransport.stats(), sin conexiones de red"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            request_count = self._request_count
+            error_count = self._error_count
+        p50 = _percentile(latencies, 50)
+        p99 = _percentile(latencies, 99)
+        return {
+            'backend': self.name,
+            'requests': request_count,
+            'errors': error_count,
+            'connections_opened': 0,
+            'connection_reuse_rate': 1.0,
+            'latency_p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+            'latency_p99_ms': round(p99 * 1000, 3) if p99 is not None else None
+        }
+
+
+class SQLiteBackend(MemoryBackend):
+    """Árbol en memoria con cada escritura guardada en SQLite (modo WAL).
+
+    Las lecturas se sirven del árbol en memoria. El árbol se guarda en filas de
+    ROW_DEPTH niveles ('zones/zone_1', 'coordinators/ana'...): una escritura
+    solo reescribe las filas de los nodos que tocó, en una única transacción,
+    así que un PATCH multi-ruta sigue siendo atómico también en disco.
+    """
+
+    name = 'sqlite'
+    ROW_DEPTH = 2
+
+    def __init__(self, path=STORAGE_SQLITE_PATH):
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10,
+                                     isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        super().__init__(self._load())
+
+    def _load(self):
+        root = {}
+        for path, raw in self._conn.execute('SELECT path, value FROM nodes'):
+            parts = split_path(path)
+            node = root
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = json.loads(raw)
+        return root
+
+    def _rows(self, parts):
+        """Filas (ruta, valor) que guardan el nodo parts del árbol actual"""
+        value = self.tree.get(parts)
+        if value is None:
+            return []
+        if len(parts) >= self.ROW_DEPTH or not isinstance(value, dict):
+            return [('/'.join(parts), value)]
+        rows = []
+        for key in value:
+            rows.extend(self._rows(parts + [key]))
+        return rows
+
+    def _persist(self, changed):
+        statements = []
+        for parts in {tuple(parts[:self.ROW_DEPTH]) for parts in changed}:
+            parts = list(parts)
+            prefix = '/'.join(parts)
+            if len(parts) < self.ROW_DEPTH:
+                # Se reescribió un nodo por encima de las filas: borrar todas las suyas
+                if prefix:
+                    statements.append(('DELETE FROM nodes WHERE path = ? OR substr(path, 1, ?) = ?',
+                                       (prefix, len(prefix) + 1, prefix + '/')))
+                else:
+                    statements.append(('DELETE FROM nodes', ()))
+            else:
+                statements.append(('DELETE FROM nodes WHERE path = ?', (prefix,)))
+            # Un nodo que ahora es un valor simple ocupa la fila de su padre
+            for depth in range(1, len(parts)):
+                statements.append(('DELETE FROM nodes WHERE path = ?', ('/'.join(parts[:depth]),)))
+            statements += [
+                ('INSERT OR REPLACE INTO nodes (path, value) VALUES (?, ?)',
+                 (path, json.dumps(value, separators=(',', ':'), ensure_ascii=False)))
+                for path, value in self._rows(parts)
+            ]
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                self._conn.execute(sql, params)
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        self._conn.close()
+
+
+def create_backend(kind=STORAGE_BACKEND, db_url=None, transport=None, path=STORAGE_SQLITE_PATH):
+    """Crea el backend indicado ('firebase', 'memory' o 'sqlite')"""
+    if kind == 'firebase':
+        if not db_url:
+            raise ValueError("El backend 'firebase' necesita la URL de la base de datos")
+        return FirebaseRestBackend(db_url, transport)
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'sqlite':
+        return SQLiteBackend(path)
+    raise ValueError(f"Backend de almacenamiento desconocido: {kind}")
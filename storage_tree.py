@@ -0,0 +1,181 @@
+# storage_tree.py
+"""Semántica de Realtime Database sobre un árbol JSON en memoria.
+
+Rutas, copias, valores de servidor ({'.sv': ...}), fusión de PUT/PATCH
+(incluido el PATCH multi-ruta), ETags y consultas por clave. La usan los
+backends 'memory' y 'sqlite' de storage.py y el emulador de pruebas
+(firebase_emulator.py), de modo que todos se comportan igual que Firebase.
+"""
+
+import hashlib
+import json
+import pickle
+import threading
+import time
+
+NULL_ETAG = 'null_etag'
+
+
+def split_path(path):
+    """'zones/zone_1/' -> ['zones', 'zone_1']"""
+    return [part for part in path.strip('/').split('/') if part]
+
+
+def _key_query(value, params):
+    """Aplica orderBy="$key" con startAt/endAt/limitToFirst/limitToLast"""
+    if not isinstance(value, dict):
+        return value
+    keys = sorted(value)
+    if 'startAt' in params:
+        start = json.loads(params['startAt'])
+        keys = [key for key in keys if key >= start]
+    if 'endAt' in params:
+        end = json.loads(params['endAt'])
+        keys = [key for key in keys if key <= end]
+    if 'limitToFirst' in params:
+        keys = keys[:int(params['limitToFirst'])]
+    if 'limitToLast' in params:
+        keys = keys[-int(params['limitToLast']):] if int(params['limitToLast']) else []
+    return {key: value[key] for key in keys}
+
+
+def copy_value(value):
+    """Copia profunda de un valor JSON (pickle es ~3 veces más rápido que deepcopy)"""
+    return pickle.loads(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def compute_etag(value):
+    if value is None:
+        return NULL_ETAG
+    raw = json.dumps(value, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class FirebaseTree:
+    """Árbol JSON en memoria con la semántica de escritura de Realtime Database"""
+
+    def __init__(self, data=None):
+        self.root = data if isinstance(data, dict) else {}
+        self.lock = threading.RLock()
+
+    def get(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _resolve(self, parts, value):
+        """Sustituye los valores de servidor ({'.sv': ...}) por su resultado"""
+        if isinstance(value, dict):
+            server_value = value.get('.sv')
+            if server_value == 'timestamp':
+                return int(time.time() * 1000)
+            if isinstance(server_value, dict) and 'increment' in server_value:
+                current = self.get(parts)
+                base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+                return base + server_value['increment']
+            return {key: self._resolve(parts + [key], child) for key, child in value.items()}
+        return value
+
+    def _prune(self, value):
+        """Firebase no guarda nulos ni objetos vacíos"""
+        if isinstance(value, dict):
+            pruned = {k: self._prune(v) for k, v in value.items()}
+            pruned = {k: v for k, v in pruned.items() if v is not None}
+            return pruned or None
+        if isinstance(value, list):
+            # Se devuelven como array, igual que Firebase con índices consecutivos
+            pruned = [self._prune(v) for v in value]
+            return pruned if any(v is not None for v in pruned) else None
+        return value
+
+    def set(self, parts, value):
+        value = self._prune(self._resolve(parts, value))
+        if not parts:
+            self.root = value or {}
+            return value
+        node = self.root
+        trail = []
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if value is None:
+                    return None
+                child = node[part] = {}
+            trail.append((node, part))
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+            # Eliminar los padres que quedaron vacíos
+            for parent, key in reversed(trail):
+                if parent[key]:
+                    break
+                del parent[key]
+        else:
+            node[parts[-1]] = value
+        return value
+
+    def update(self, parts, data):
+        """PATCH: cada clave puede ser una ruta relativa ('a/b/c')"""
+        # Los valores de servidor se resuelven con el estado previo a la escritura
+        resolved = {key: self._resolve(parts + split_path(key), value) for key, value in data.items()}
+        for key, value in resolved.items():
+            self.set(parts + split_path(key), value)
+        return resolved
+
+
+def changed_paths(method, parts, body):
+    """Rutas que modifica una escritura (cada clave de un PATCH es una ruta)"""
+    if method == 'PATCH':
+        return [parts + split_path(key) for key in body]
+    return [parts]
+
+
+def handle_request(tree, method, parts, params=None, headers=None, body=None):
+    """Resuelve una petición REST sobre el árbol. Devuelve (estado, valor, ETag o None).
+
+    Lo comparten los backends locales de storage.py y el emulador HTTP
+    (firebase_emulator.py), para que todos sigan la misma semántica que Firebase.
+    """
+    params = params or {}
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    wants_etag = str(headers.get('x-firebase-etag', '')).lower() == 'true'
+
+    if method == 'GET':
+        with tree.lock:
+            value = tree.get(parts)
+            # Las consultas se resuelven antes de copiar, como en el servidor real
+            if params.get('orderBy') == '"$key"':
+                value = _key_query(value, params)
+            if str(params.get('shallow')).lower() == 'true' and isinstance(value, dict):
+                value = {key: True for key in value}
+            # El ETag solo se calcula si se pide: es un hash de todo el nodo
+            etag = compute_etag(value) if wants_etag or 'if-none-match' in headers else None
+            if etag is not None and headers.get('if-none-match') == etag:
+                return 304, None, etag
+            value = copy_value(value)
+        return 200, value, etag if wants_etag else None
+
+    if method == 'PATCH' and not isinstance(body, dict):
+        return 400, {'error': 'Invalid data; couldn\'t parse JSON object.'}, None
+    if method not in ('PUT', 'PATCH', 'DELETE'):
+        return 405, {'error': f'Method {method} not allowed'}, None
+
+    with tree.lock:
+        expected = headers.get('if-match')
+        if expected is not None and method != 'PATCH':
+            # Escritura condicional: 412 si el ETag vigente no coincide
+            current = tree.get(parts)
+            etag = compute_etag(current)
+            if expected != etag:
+                return 412, copy_value(current), etag
+        if method == 'PUT':
+            written = copy_value(tree.set(parts, body))
+            etag = compute_etag(tree.get(parts)) if wants_etag else None
+            return 200, written, etag
+        if method == 'PATCH':
+            return 200, tree.update(parts, body), None
+        tree.set(parts, None)
+        return 200, None, None
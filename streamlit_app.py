@@ -2,15 +2,14 @@
 import streamlit as st
 import time
 from datetime import datetime
-from admin_view import admin_page
-from coordinator_view import coordinator_page
-from volunteer_view import volunteer_page
-from database import EmergencyDatabase
 from config import CENTER_LAT, CENTER_LON, INITIAL_ZONES
 
-# Limpiar cache al inicio
-st.cache_data.clear()
-st.cache_resource.clear()
+# Las vistas, database (firebase_admin, requests, pandas...) y tracing se
+# importan solo cuando un rol los necesita: la página de bienvenida se
+# muestra sin cargarlos y sin conectar con Firebase.
+
+# Las cachés compartidas (zonas, mapas, coordinadores) no se vacían al
+# ejecutar el script: cada una caduca por su cuenta (cache_manager.py)
 
 # Configuración optimizada para Streamlit Cloud
 st.set_page_config(
@@ -69,23 +68,26 @@ def verify_admin(username, password, secret_key):
            password == "admin_password" and
            secret_key == ADMIN_SECRET_KEY)
 
+def connect():
+   """Cliente de base de datos compartido; se crea la primera vez que un rol lo usa"""
+   from database import get_database
+
+   # Timeout de 10 segundos para la conexión inicial
+   start_time = time.time()
+   try:
+       db = get_database()
+       st.success("Conectado exitosamente")
+       return db
+   except Exception as e:
+       if time.time() - start_time >= 10:
+           st.error("Tiempo de conexión excedido. Por favor, recarga la página.")
+           st.stop()
+       st.error(f"Error en la conexión: {str(e)}")
+       st.stop()
+
 def main():
    try:
        with st.spinner("Cargando..."):
-           # Timeout de 10 segundos para carga inicial
-           start_time = time.time()
-           
-           # Inicializar la base de datos con timeout
-           try:
-               db = EmergencyDatabase()
-               st.success("Conectado exitosamente")
-           except Exception as e:
-               if time.time() - start_time >= 10:
-                   st.error("Tiempo de conexión excedido. Por favor, recarga la página.")
-                   st.stop()
-               st.error(f"Error en la conexión: {str(e)}")
-               st.stop()
-           
            # Inicializar el estado de la sesión si es necesario
            if 'authenticated' not in st.session_state:
                st.session_state.authenticated = False
@@ -145,7 +147,7 @@ def main():
                            password = st.text_input("Contraseña", type="password", key="coord_pass")
                            if st.button("Ingresar", key="coord_submit"):
                                try:
-                                   success, result = db.verify_coordinator(username, password)
+                                   success, result = connect().verify_coordinator(username, password)
                                    if success:
                                        st.session_state.authenticated = True
                                        st.session_state.role = role_selection
@@ -165,12 +167,20 @@ def main():
 
            # Mostrar la vista correspondiente según el rol
            if st.session_state.authenticated:
-               if st.session_state.role == "Administrador":
-                   admin_page()
-               elif st.session_state.role == "Coordinador":
-                   coordinator_page()
-               elif st.session_state.role == "Voluntario":
-                   volunteer_page()
+               connect()
+               from tracing import tracer
+
+               # Cada renderizado de página es la raíz de una traza (tracing.py)
+               with tracer.span('page.render', st.session_state.role, role=st.session_state.role):
+                   if st.session_state.role == "Administrador":
+                       from admin_view import admin_page
+                       admin_page()
+                   elif st.session_state.role == "Coordinador":
+                       from coordinator_view import coordinator_page
+                       coordinator_page()
+                   elif st.session_state.role == "Voluntario":
+                       from volunteer_view import volunteer_page
+                       volunteer_page()
            else:
                # Página de bienvenida
                st.title("🚨 Sistema de Emergencias Valencia")
@@ -0,0 +1,9 @@
+# tests/conftest.py
+"""Los módulos del proyecto están en la raíz del repositorio"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,103 @@
+# tests/test_zone_writes.py
+"""Altas y bajas de zonas concurrentes contra el emulador de Firebase"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from config import CENTER_LAT, CENTER_LON
+from database import EmergencyDatabase
+from firebase_emulator import FirebaseEmulator
+from storage import create_backend
+from transport import PooledTransport
+
+EXISTING = 20
+
+
+@pytest.fixture
+def emulator():
+    zones = {
+        f'zone_{i}': {'id': f'zone_{i}', 'name': f'Zona {i}', 'latitude': CENTER_LAT,
+                      'longitude': CENTER_LON, 'volunteer_count': 0}
+        for i in range(1, EXISTING + 1)
+    }
+    emulator = FirebaseEmulator(data={'zones': zones}).start()
+    yield emulator
+    emulator.stop()
+
+
+def make_clients(emulator, count):
+    """Un EmergencyDatabase por cliente, como procesos distintos"""
+    return [
+        EmergencyDatabase(create_backend('firebase', db_url=emulator.url), background=False)
+        for _ in range(count)
+    ]
+
+
+def run_parallel(tasks, workers=8):
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(lambda task: task(), tasks))
+
+
+def test_concurrent_adds_get_unique_ids(emulator):
+    clients = make_clients(emulator, 3)
+
+    def add(i):
+        return lambda: clients[i % len(clients)].add_new_zone({
+            'name': f'Nueva {i}', 'latitude': CENTER_LAT, 'longitude': CENTER_LON
+        })
+
+    assert all(run_parallel([add(i) for i in range(60)]))
+    zones = emulator.tree.get(['zones'])
+    new_ids = [zone_id for zone_id, zone in zones.items() if zone['name'].startswith('Nueva ')]
+    assert len(new_ids) == 60
+    assert sorted(zones[zone_id]['name'] for zone_id in new_ids) == sorted(f'Nueva {i}' for i in range(60))
+    # Ningún número del contador se salta ni se repite
+    assert sorted(int(zone_id.split('_')[1]) for zone_id in new_ids) == list(
+        range(EXISTING + 1, EXISTING + 61))
+    assert all(zones[f'zone_{i}']['name'] == f'Zona {i}' for i in range(1, EXISTING + 1))
+
+
+def test_concurrent_adds_and_deletes(emulator):
+    clients = make_clients(emulator, 3)
+    deleted = [f'zone_{i}' for i in range(1, EXISTING + 1, 2)]
+    tasks = [
+        (lambda zone_id=zone_id, db=clients[i % 3]: db.delete_zone(zone_id))
+        for i, zone_id in enumerate(deleted)
+    ]
+    tasks += [
+        (lambda i=i, db=clients[i % 3]: db.add_new_zone({
+            'name': f'Nueva {i}', 'latitude': CENTER_LAT, 'longitude': CENTER_LON
+        }))
+        for i in range(30)
+    ]
+
+    assert all(run_parallel(tasks))
+    zones = emulator.tree.get(['zones'])
+    assert not set(deleted) & set(zones)
+    assert len(zones) == EXISTING - len(deleted) + 30
+    assert len({zone['id'] for zone in zones.values()}) == len(zones)
+
+
+def test_delete_missing_zone_returns_false(emulator):
+    db = make_clients(emulator, 1)[0]
+    assert db.delete_zone('zone_999') is False
+    assert db.delete_zone('zone_1') is True
+    assert db.delete_zone('zone_1') is False
+    assert len(emulator.tree.get(['zones'])) == EXISTING - 1
+
+
+def test_increment_not_resent_after_timeout(emulator):
+    # El servidor aplica el incremento cuando el cliente ya dejó de esperar:
+    # reenviarlo se saltaría un número
+    transport = PooledTransport(read_timeout=0.2, max_retries=3, backoff_factor=0)
+    emulator.server.faults.configure(latency_ms=400)
+    with pytest.raises(requests.ConnectionError):
+        transport.request('PUT', f'{emulator.url}/meta/zone_counter.json',
+                          {'.sv': {'increment': 1}})
+    emulator.server.faults.configure(latency_ms=0)
+    time.sleep(0.5)
+    transport.close()
+    assert emulator.tree.get(['meta', 'zone_counter']) == 1
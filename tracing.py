@@ -0,0 +1,410 @@
+# tracing.py
+"""Trazas de rendimiento: intervalos (spans) con su duración y atributos.
+
+Se miden las peticiones a la base de datos (EmergencyDatabase._send), el
+montaje del mapa (map_component.zone_map) y el renderizado de cada página
+(streamlit_app.main). Cada span terminado se entrega a los destinos
+configurados en TRACE_SINKS:
+- 'ring': búfer circular en memoria, que muestra la pestaña Rendimiento del
+  panel de administración (histogramas de latencia y llamadas más lentas).
+- 'log': una línea por span en el logger TRACE_LOGGER.
+- 'otlp': envío por lotes en formato OTLP/HTTP JSON a un colector de
+  OpenTelemetry (TRACE_OTLP_ENDPOINT).
+
+El muestreo se decide al empezar cada traza (el span raíz) y lo heredan sus
+hijos, así que una traza se guarda entera o no se guarda. Los spans con
+error y los más lentos que TRACE_SLOW_MS se guardan siempre, aunque su traza
+no se muestree.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+
+from config import (
+    TRACE_ENABLED, TRACE_SINKS, TRACE_SAMPLE_RATE, TRACE_SAMPLE_RATES, TRACE_SLOW_MS,
+    TRACE_RING_SIZE, TRACE_LOGGER, TRACE_OTLP_ENDPOINT, TRACE_OTLP_BATCH,
+    TRACE_OTLP_INTERVAL, TRACE_SERVICE_NAME
+)
+from transport import _percentile
+
+# Límites (ms) de los intervalos de los histogramas de latencia
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class Span:
+    """Una operación medida: nombre, atributos, duración y error si lo hubo"""
+
+    __slots__ = ('tracer', 'name', 'label', 'attributes', 'trace_id', 'span_id', 'parent_id',
+                 'sampled', 'start_ns', 'duration_ms', 'error', '_start')
+
+    def __init__(self, tracer, name, label, attributes, parent):
+        self.tracer = tracer
+        self.name = name
+        self.label = label
+        self.attributes = attributes
+        self.span_id = random.getrandbits(64)
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.sampled = parent.sampled
+        else:
+            self.trace_id = random.getrandbits(128)
+            self.parent_id = None
+            self.sampled = tracer.sample(name)
+        self.start_ns = None
+        self.duration_ms = None
+        self.error = None
+
+    @property
+    def key(self):
+        """Operación a la que pertenece, para agrupar: 'db.request · GET zones'"""
+        return f'{self.name} · {self.label}' if self.label else self.name
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.tracer._push(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        # st.rerun() y st.stop() no son errores (no heredan de Exception)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.error = f'{exc_type.__name__}: {exc}'
+        self.tracer._pop(self)
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'label': self.label,
+            'trace_id': f'{self.trace_id:032x}',
+            'span_id': f'{self.span_id:016x}',
+            'parent_id': f'{self.parent_id:016x}' if self.parent_id is not None else None,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class _NoSpan:
+    """Span que no mide nada, cuando las trazas están desactivadas"""
+
+    key = name = label = None
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Crea spans y entrega los terminados a los destinos (sinks)"""
+
+    def __init__(self, sinks=(), sample_rate=1.0, sample_rates=None, slow_ms=None, enabled=True):
+        self.sinks = list(sinks)
+        self.sample_rate = sample_rate
+        self.sample_rates = dict(sample_rates or {})
+        self.slow_ms = slow_ms
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.recorded = 0
+
+    def span(self, name, label=None, **attributes):
+        """Context manager que mide el bloque: with tracer.span('db.request', method='GET'):"""
+        if not self.enabled or not self.sinks:
+            return NO_SPAN
+        stack = getattr(self._local, 'stack', None)
+        return Span(self, name, label, attributes, stack[-1] if stack else None)
+
+    def sample(self, name):
+        rate = self.sample_rates.get(name, self.sample_rate)
+        return rate >= 1 or random.random() < rate
+
+    def sink(self, kind):
+        """Primer destino del tipo indicado (p. ej. RingBufferSink), o None"""
+        return next((sink for sink in self.sinks if isinstance(sink, kind)), None)
+
+    def _push(self, span):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(span)
+
+    def _pop(self, span):
+        stack = self._local.stack
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            stack.remove(span)
+
+    def _finish(self, span):
+        keep = (span.sampled or span.error is not None or
+                (self.slow_ms is not None and span.duration_ms >= self.slow_ms))
+        with self._lock:
+            self.started += 1
+            if keep:
+                self.recorded += 1
+        if not keep:
+            return
+        for sink in self.sinks:
+            try:
+                sink.emit(span)
+            except Exception as e:
+                # Un destino que falla no debe afectar a la operación medida
+                print(f"Error enviando traza a {type(sink).__name__}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'sinks': [type(sink).__name__ for sink in self.sinks],
+                'sample_rate': self.sample_rate,
+                'sample_rates': dict(self.sample_rates),
+                'slow_ms': self.slow_ms,
+                'spans_started': self.started,
+                'spans_recorded': self.recorded
+            }
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class LogSink:
+    """Una línea por span en un logger de logging"""
+
+    def __init__(self, logger=TRACE_LOGGER, level=logging.INFO):
+        self.logger = logging.getLogger(logger)
+        self.level = level
+
+    def emit(self, span):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        attributes = ' '.join(f'{key}={value}' for key, value in span.attributes.items())
+        self.logger.log(
+            self.level, '%s %.1f ms %s%s', span.key, span.duration_ms, attributes,
+            f' error={span.error}' if span.error else '',
+            extra={'span': span.to_dict()}
+        )
+
+    def close(self):
+        pass
+
+
+class RingBufferSink:
+    """Últimos spans en memoria, con resúmenes por operación"""
+
+    def __init__(self, size=TRACE_RING_SIZE):
+        self._spans = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def emit(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, key=None):
+        with self._lock:
+            spans = list(self._spans)
+        return [span for span in spans if key is None or span.key == key]
+
+    def __len__(self):
+        return len(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self):
+        """Por operación: llamadas, errores y latencia (p50, p95, p99, máx) en ms"""
+        groups = {}
+        for span in self.spans():
+            groups.setdefault(span.key, []).append(span)
+        rows = []
+        for key, spans in groups.items():
+            durations = sorted(span.duration_ms for span in spans)
+            rows.append({
+                'operation': key,
+                'calls': len(spans),
+                'errors': sum(1 for span in spans if span.error),
+                'p50_ms': round(_percentile(durations, 50), 2),
+                'p95_ms': round(_percentile(durations, 95), 2),
+                'p99_ms': round(_percentile(durations, 99), 2),
+                'max_ms': round(durations[-1], 2)
+            })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def histogram(self, key=None, bounds=HISTOGRAM_BOUNDS_MS):
+        """Número de spans en cada intervalo de latencia: [('<1 ms', n), ...]"""
+        labels = [f'<{bounds[0]} ms'] + [f'{low}-{high} ms' for low, high in zip(bounds, bounds[1:])]
+        labels.append(f'≥{bounds[-1]} ms')
+        counts = [0] * len(labels)
+        for span in self.spans(key):
+            index = next((i for i, bound in enumerate(bounds) if span.duration_ms < bound), len(bounds))
+            counts[index] += 1
+        return list(zip(labels, counts))
+
+    def slowest(self, n=20, key=None):
+        return sorted(self.spans(key), key=lambda span: span.duration_ms, reverse=True)[:n]
+
+    def close(self):
+        pass
+
+
+class OTLPSink:
+    """Envía los spans a un colector de OpenTelemetry por OTLP/HTTP con JSON.
+
+    Los spans se acumulan y un hilo los envía en lotes de hasta batch_size
+    cada interval segundos. Si el colector no responde, el lote se descarta
+    (queda contado en dropped) para no acumular memoria sin límite.
+    """
+
+    def __init__(self, endpoint=TRACE_OTLP_ENDPOINT, service_name=TRACE_SERVICE_NAME,
+                 batch_size=TRACE_OTLP_BATCH, interval=TRACE_OTLP_INTERVAL, headers=None):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json', **(headers or {})})
+        self._pending = deque(maxlen=batch_size * 20)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self.exported = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='otlp-exporter', daemon=True)
+        self._thread.start()
+
+    def emit(self, span):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(span)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        while True:
+            with self._lock:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            if not batch:
+                return
+            try:
+                response = self.session.post(self.endpoint, data=json.dumps(self.payload(batch)), timeout=5)
+                response.raise_for_status()
+                self.exported += len(batch)
+            except requests.RequestException as e:
+                self.dropped += len(batch)
+                print(f"Error enviando trazas a {self.endpoint}: {e}")
+                return
+
+    def payload(self, spans):
+        """Cuerpo ExportTraceServiceRequest en la codificación JSON de OTLP"""
+        return {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({
+                'service.name': self.service_name,
+                'process.pid': os.getpid()
+            })},
+            'scopeSpans': [{
+                'scope': {'name': 'emergencias.tracing'},
+                'spans': [_otlp_span(span) for span in spans]
+            }]
+        }]}
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.interval + 5)
+        self.flush()
+        self.session.close()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)}
+            for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(span):
+    attributes = dict(span.attributes)
+    if span.label:
+        attributes['operation'] = span.label
+    encoded = {
+        'traceId': f'{span.trace_id:032x}',
+        'spanId': f'{span.span_id:016x}',
+        'name': span.name,
+        'kind': 1,  # SPAN_KIND_INTERNAL
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.start_ns + int(span.duration_ms * 1e6)),
+        'attributes': _otlp_attributes(attributes),
+        # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 0}
+    }
+    if span.parent_id is not None:
+        encoded['parentSpanId'] = f'{span.parent_id:016x}'
+    return encoded
+
+
+def create_sink(kind):
+    """Destino de trazas por nombre: 'ring', 'log' u 'otlp'"""
+    if kind == 'ring':
+        return RingBufferSink()
+    if kind == 'log':
+        return LogSink()
+    if kind == 'otlp':
+        if not TRACE_OTLP_ENDPOINT:
+            raise ValueError("El destino 'otlp' necesita TRACE_OTLP_ENDPOINT")
+        return OTLPSink()
+    raise ValueError(f"Destino de trazas desconocido: {kind}")
+
+
+def _create_tracer():
+    sinks = []
+    for kind in TRACE_SINKS if TRACE_ENABLED else []:
+        try:
+            sinks.append(create_sink(kind))
+        except ValueError as e:
+            print(f"Error configurando las trazas: {e}")
+    return Tracer(sinks, TRACE_SAMPLE_RATE, TRACE_SAMPLE_RATES, TRACE_SLOW_MS, enabled=TRACE_ENABLED)
+
+
+# Instancia única del proceso
+tracer = _create_tracer()
@@ -0,0 +1,223 @@
+# transport.py
+
+import copy
+import threading
+import time
+from collections import OrderedDict, deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_POOL_SIZE, HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR, HTTP_RETRY_STATUS, HTTP_GZIP, HTTP_LATENCY_WINDOW,
+    ETAG_CACHE_MAX_PATHS
+)
+
+
+def _percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    index = int(round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def _has_increment(value):
+    """True si el cuerpo lleva algún incremento de servidor ({'.sv': {'increment': n}})"""
+    if not isinstance(value, dict):
+        return False
+    server_value = value.get('.sv')
+    if isinstance(server_value, dict) and 'increment' in server_value:
+        return True
+    return any(_has_increment(item) for item in value.values())
+
+
+class PooledTransport:
+    """Sesión HTTP compartida con keep-alive, timeouts, reintentos y métricas.
+
+    Una única instancia se comparte entre todos los hilos del servidor: el pool
+    de urllib3 es seguro entre hilos y las métricas se protegen con un lock.
+    """
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES,
+                 backoff_factor=HTTP_BACKOFF_FACTOR, gzip=HTTP_GZIP):
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Reintentos acotados con backoff exponencial ante fallos de red, 5xx y 429.
+        # Solo se repiten los métodos idempotentes (GET/PUT/DELETE). Los PATCH
+        # no: llevan incrementos de servidor ({'.sv': {'increment': n}}) y, si
+        # Firebase ya aplicó la escritura antes del timeout o del 5xx, repetirla
+        # contaría dos veces. Por lo mismo, un PUT con un incremento va por una
+        # segunda sesión que no repite nada que haya llegado al servidor. Los fallos al conectar sí se reintentan
+        # para todos los métodos, porque la petición no llegó a enviarse.
+        self._adapter = self._make_adapter(pool_size, max_retries, backoff_factor)
+        self._once_adapter = self._make_adapter(pool_size, max_retries, backoff_factor,
+                                                read=0, status=0)
+
+        self.session = self._make_session(self._adapter, gzip)
+        self._once_session = self._make_session(self._once_adapter, gzip)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=HTTP_LATENCY_WINDOW)
+        self._request_count = 0
+        self._error_count = 0
+
+    @staticmethod
+    def _make_adapter(pool_size, max_retries, backoff_factor, **limits):
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=HTTP_RETRY_STATUS,
+            allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            **limits
+        )
+        return HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    @staticmethod
+    def _make_session(adapter, gzip):
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        if gzip:
+            session.headers['Accept-Encoding'] = 'gzip'
+        return session
+
+    def request(self, method, url, data=None, headers=None, params=None):
+        """Envía la petición por el pool y registra su latencia"""
+        session = self.session
+        if method == 'PUT' and _has_increment(data):
+            session = self._once_session
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, json=data, headers=headers,
+                                       params=params, timeout=self.timeout)
+        except requests.RequestException:
+            self._record(time.perf_counter() - start, error=True)
+            raise
+        self._record(time.perf_counter() - start, error=response.status_code >= 400)
+        return response
+
+    def _record(self, elapsed, error=False):
+        with self._lock:
+            self._request_count += 1
+            if error:
+                self._error_count += 1
+            self._latencies.append(elapsed)
+
+    def _connection_counts(self):
+        """Devuelve (conexiones abiertas, peticiones enviadas) según los pools de urllib3"""
+        opened = sent = 0
+        for adapter in (self._adapter, self._once_adapter):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue  # El pool se descartó mientras lo recorríamos
+                opened += pool.num_connections
+                sent += pool.num_requests
+        return opened, sent
+
+    def stats(self):
+        """Métricas acumuladas del transporte"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            request_count = self._request_count
+            error_count = self._error_count
+
+        opened, sent = self._connection_counts()
+        reuse_rate = 1 - opened / sent if sent else 0.0
+
+        p50 = _percentile(latencies, 50)
+        p99 = _percentile(latencies, 99)
+        return {
+            'requests': request_count,
+            'errors': error_count,
+            'connections_opened': opened,
+            'connection_reuse_rate': round(reuse_rate, 3),
+            'latency_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'latency_p99_ms': round(p99 * 1000, 1) if p99 is not None else None
+        }
+
+    def close(self):
+        self.session.close()
+        self._once_session.close()
+
+
+class ETagCache:
+    """Último cuerpo y ETag conocidos por ruta, para GET condicionales.
+
+    Guarda como mucho max_paths rutas (LRU). Las escrituras invalidan la ruta
+    escrita, sus ancestros y sus descendientes. Un acierto es una respuesta
+    304: el cuerpo no se descarga ni se vuelve a interpretar. Se desactiva
+    con disable() si el servidor no responde 304 (Realtime Database).
+    """
+
+    def __init__(self, max_paths=ETAG_CACHE_MAX_PATHS):
+        self.max_paths = max_paths
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def disable(self):
+        """El servidor ignora If-None-Match: dejar de guardar cuerpos"""
+        with self._lock:
+            self.enabled = False
+            self._entries.clear()
+
+    def etag_for(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            return entry[0] if entry else None
+
+    def hit(self, path):
+        """Devuelve una copia del cuerpo guardado para la ruta y cuenta el acierto"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            body = entry[1]
+        return copy.deepcopy(body)
+
+    def store(self, path, etag, body):
+        with self._lock:
+            self.misses += 1
+            if not etag or not self.enabled:
+                self._entries.pop(path, None)
+                return
+            self._entries[path] = (etag, copy.deepcopy(body))
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_paths:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path):
+        with self._lock:
+            if not path:
+                # Escritura en la raíz (p. ej. PATCH multi-ruta): todo puede haber cambiado
+                self._entries.clear()
+                return
+            for cached in list(self._entries):
+                if (cached == path or cached.startswith(path + '/')
+                        or path.startswith(cached + '/')):
+                    del self._entries[cached]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'etag_enabled': self.enabled,
+                'etag_hits': self.hits,
+                'etag_misses': self.misses,
+                'etag_hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'etag_cached_paths': len(self._entries)
+            }
@@ -1,98 +1,82 @@
 # volunteer_view.py
 import streamlit as st
-import folium
 import time
-from database import EmergencyDatabase
+import uuid
+from database import get_database
 from config import CENTER_LAT, CENTER_LON
+from map_component import zone_map
 
-def create_map(zones):
-    """Crea el mapa con las zonas marcadas y una leyenda"""
-    if not zones:
+def show_map(snapshot, height=600):
+    """Muestra el mapa con las zonas marcadas y una leyenda"""
+    if not snapshot.zones:
         st.warning("No hay zonas para mostrar")
-        return None
-    
-    m = folium.Map(location=[CENTER_LAT, CENTER_LON], zoom_start=12)
+        return
     
-    # Agregar leyenda
-    legend_html = '''
-        <div style="position: fixed; 
-                    bottom: 50px; left: 50px; width: 180px;
-                    border: 2px solid grey; z-index: 1000;
-                    background-color: white;
-                    padding: 10px;
-                    font-family: Arial;
-                    font-size: 14px;">
-            <p style="margin: 0; font-weight: bold;">Estado de Zona</p>
-            <p style="margin: 5px 0;">
-                <i style="background: #008000; border-radius: 50%; display: inline-block; height: 10px; width: 10px;"></i>
-                Se necesitan voluntarios
-            </p>
-            <p style="margin: 5px 0;">
-                <i style="background: #FFA500; border-radius: 50%; display: inline-block; height: 10px; width: 10px;"></i>
-                Voluntarios óptimos
-            </p>
-            <p style="margin: 5px 0;">
-                <i style="background: #FF0000; border-radius: 50%; display: inline-block; height: 10px; width: 10px;"></i>
-                Exceso de voluntarios
-            </p>
-        </div>
-    '''
-    m.get_root().html.add_child(folium.Element(legend_html))
-    
-    for zone in zones:
-        try:
-            color = {
-                'overflow': 'red',
-                'needed': '#008000',
-                'optimal': 'orange'
-            }.get(zone['status'], 'gray')
-            
-            popup_text = f"""
-                <div style="font-family: Arial, sans-serif; min-width: 200px;">
-                    <h4 style="margin: 0; color: #2C3E50; border-bottom: 2px solid #3498DB; padding-bottom: 5px;">
-                        {zone['name']}
-                    </h4>
-                    <div style="margin-top: 10px;">
-                        <b style="color: #34495E;">Estado:</b> {zone['status']}<br>
-                        <b style="color: #34495E;">Acceso:</b> {zone['access_notes']}<br>
-                        <b style="color: #34495E;">Necesidades por cubrir:</b><br>
-                        {format_needs(zone.get('pending_needs', []))}<br>
-                        <small style="color: #7F8C8D;">Última actualización: {zone.get('last_update', 'N/A')}</small>
-                    </div>
-                </div>
-            """
-            
-            marker = folium.CircleMarker(
-                location=[zone['latitude'], zone['longitude']],
-                radius=15,
-                color=color,
-                fill=True,
-                popup=popup_text
-            )
-            marker.add_to(m)
-        except Exception as e:
-            st.error(f"Error procesando zona: {str(e)}")
-    
-    return m._repr_html_()
+    # Mapa persistente: entre reruns solo recibe las zonas que cambiaron
+    zone_map('volunteer', snapshot, height=height, key='volunteer_map')
 
-def format_needs(needs):
-    """Formatea la lista de necesidades para el popup"""
-    if not needs:
-        return "Ninguna registrada"
-    return "<br>".join(f"- {need}" for need in needs)
-
-@st.cache_data(ttl=300)
 def get_cached_data():
-    """Obtiene datos con caché"""
+    """Obtiene la instantánea de zonas compartida por todas las sesiones"""
     try:
-        db = EmergencyDatabase()
-        data = db.get_all_zones()
-        if not data:
-            return []
-        return data
+        db = get_database()
+        return db.get_zones_snapshot()
     except Exception as e:
         st.error(f"Error obteniendo datos: {str(e)}")
-        return []
+        return None
+
+def show_nearest_zones():
+    """Zonas más cercanas a la ubicación del voluntario que necesitan ayuda"""
+    with st.expander("📍 Zonas cercanas que te necesitan"):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            lat = st.number_input("Tu latitud", value=CENTER_LAT, format="%.6f")
+        with col2:
+            lon = st.number_input("Tu longitud", value=CENTER_LON, format="%.6f")
+        with col3:
+            k = st.number_input("Zonas", min_value=1, max_value=20, value=5)
+
+        nearest = get_database().nearest_zones(lat, lon, k=int(k), status='needed')
+        if not nearest:
+            st.info("No hay zonas que necesiten voluntarios ahora mismo")
+            return
+        for zone, distance in nearest:
+            st.write(f"**{zone['name']}** · {distance:.1f} km")
+            if zone.get('access_notes'):
+                st.caption(f"Acceso: {zone['access_notes']}")
+
+def show_checkin(zones_data):
+    """Registro de llegada y salida del voluntario en una zona"""
+    st.sidebar.write("### Mi Zona")
+    if 'volunteer_id' not in st.session_state:
+        st.session_state.volunteer_id = uuid.uuid4().hex[:12]
+    db = get_database()
+    checked_in = st.session_state.get('checkin_zone')
+
+    if checked_in:
+        st.sidebar.success(f"📍 Estás en {checked_in['name']}")
+
+    zones = {zone['name']: zone['id'] for zone in zones_data if zone.get('id')}
+    if not zones:
+        return
+    zone_name = st.sidebar.selectbox("Zona", options=list(zones), key='checkin_zone_select')
+
+    if checked_in and zones[zone_name] == checked_in['id']:
+        # Ya registrado aquí: otra llegada contaría al voluntario dos veces
+        st.sidebar.caption("Ya has registrado tu llegada a esta zona")
+    elif st.sidebar.button("✅ Registrar llegada"):
+        previous = checked_in['id'] if checked_in else None
+        if db.check_in(zones[zone_name], st.session_state.volunteer_id, previous_zone=previous):
+            st.session_state.checkin_zone = {'id': zones[zone_name], 'name': zone_name}
+            st.rerun()
+        else:
+            st.sidebar.error("No se pudo registrar la llegada")
+
+    if checked_in and st.sidebar.button("👋 Registrar salida"):
+        if db.check_out(checked_in['id'], st.session_state.volunteer_id):
+            del st.session_state['checkin_zone']
+            st.rerun()
+        else:
+            st.sidebar.error("No se pudo registrar la salida")
 
 def volunteer_page():
     """Página principal para voluntarios"""
@@ -113,23 +97,26 @@ def volunteer_page():
     # Botones en el sidebar
     st.sidebar.write("### Panel de Control")
     if st.sidebar.button("🔄 Actualizar Datos"):
-        st.cache_data.clear()
+        # Un solo refresco de zonas compartido por todos los que pulsan a la vez;
+        # el resto de cachés no se toca
+        get_database().refresh_zones()
         st.rerun()
     
     # Obtener y mostrar datos
     try:
         with st.spinner("Cargando mapa..."):
-            zones_data = get_cached_data()
+            snapshot = get_cached_data()
+            zones_data = snapshot.zones if snapshot else []
             
             if zones_data:
-                map_html = create_map(zones_data)
-                if map_html:
-                    st.components.v1.html(map_html, height=600)
-                    
-                    # Mostrar estadísticas
-                    needed_zones = len([z for z in zones_data if z['status'] == 'needed'])
-                    if needed_zones > 0:
-                        st.warning(f"🚨 Hay {needed_zones} zonas que necesitan voluntarios")
+                show_map(snapshot)
+                show_checkin(zones_data)
+                
+                # Mostrar estadísticas
+                needed_zones = get_database().get_zone_stats(snapshot).count('needed')
+                if needed_zones > 0:
+                    st.warning(f"🚨 Hay {needed_zones} zonas que necesitan voluntarios")
+                    show_nearest_zones()
             else:
                 st.error("No hay datos disponibles para mostrar")
                 
@@ -0,0 +1,145 @@
+# zone_cache.py
+
+import hashlib
+import json
+import threading
+import time
+
+from config import ZONES_REFRESH_INTERVAL, ZONES_REFRESH_COALESCE
+
+
+class ZoneSnapshot:
+    """Instantánea inmutable de las zonas con su versión y ETag"""
+
+    def __init__(self, zones, version, etag, fetched_at):
+        self.zones = zones
+        self.version = version
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+def zones_etag(zones):
+    """Huella del contenido de las zonas; cambia solo si cambian los datos"""
+    raw = json.dumps(zones, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ZoneSnapshotCache:
+    """Caché de zonas compartida por todas las sesiones del proceso.
+
+    Como mucho un hilo consulta Firebase a la vez: el resto espera y reutiliza
+    la instantánea que este obtenga. La versión solo aumenta cuando el
+    contenido cambia, así que sirve de clave para cachés derivadas.
+    """
+
+    def __init__(self, fetch, max_age=ZONES_REFRESH_INTERVAL, coalesce=ZONES_REFRESH_COALESCE):
+        self._fetch = fetch
+        self.max_age = max_age
+        self.coalesce = coalesce
+        self._snapshot = None
+        self._stale = True
+        self._refresh_lock = threading.Lock()
+        self.fetch_count = 0
+        self.refresh_requests = 0
+        self.coalesced_refreshes = 0
+        self.error_count = 0
+        self.last_error = None
+        self._failed_at = None
+
+    def _is_fresh(self, snapshot):
+        return snapshot is not None and not self._stale and snapshot.age() < self.max_age
+
+    def get(self):
+        """Devuelve la instantánea vigente, refrescándola si ha caducado"""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        requested = time.monotonic()
+        with self._refresh_lock:
+            # Otro hilo pudo refrescarla mientras esperábamos el lock
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+            # ...o fallar: no repetir la consulta por cada hilo que esperaba
+            if self._failed_at is not None and self._failed_at >= requested:
+                return self._fallback(snapshot)
+
+            return self._refresh(snapshot)
+
+    def _fallback(self, previous):
+        """Lo que se sirve si la consulta falla: la instantánea anterior o una vacía sin guardar"""
+        if previous is not None:
+            return previous
+        return ZoneSnapshot([], 0, zones_etag([]), time.monotonic())
+
+    def _refresh(self, previous):
+        """Consulta las zonas; se llama con _refresh_lock tomado"""
+        self._stale = False
+        # La edad se cuenta desde que empezó la consulta, no desde que terminó
+        started = time.monotonic()
+        try:
+            zones = self._fetch()
+        except Exception as e:
+            # Un fallo pasajero no vacía el mapa de todos: se sigue sirviendo la
+            # instantánea anterior, que queda caducada para reintentar
+            self._stale = True
+            self._failed_at = time.monotonic()
+            self.error_count += 1
+            self.last_error = str(e)
+            print(f"Error actualizando zonas: {e}")
+            return self._fallback(previous)
+        self.fetch_count += 1
+        self._snapshot = self._make_snapshot(zones, previous, started)
+        return self._snapshot
+
+    def _make_snapshot(self, zones, previous, fetched_at):
+        etag = zones_etag(zones)
+        if previous is not None and previous.etag == etag:
+            version = previous.version
+        else:
+            version = previous.version + 1 if previous is not None else 1
+        return ZoneSnapshot(zones, version, etag, fetched_at)
+
+    def refresh(self):
+        """Refresco pedido por un usuario ("Actualizar Datos").
+
+        Se agrupan los refrescos simultáneos: si una consulta empezó después
+        de la petición (o hace menos de coalesce segundos), se reutiliza su
+        resultado en lugar de lanzar otra. Así, muchos usuarios pulsando a la
+        vez provocan una sola consulta.
+        """
+        requested = time.monotonic()
+        self.refresh_requests += 1
+        with self._refresh_lock:
+            snapshot = self._snapshot
+            if (snapshot is not None and not self._stale and
+                    snapshot.fetched_at >= requested - self.coalesce):
+                self.coalesced_refreshes += 1
+                return snapshot
+            return self._refresh(snapshot)
+
+    def invalidate(self):
+        """Fuerza a que la próxima lectura vuelva a consultar Firebase"""
+        self._stale = True
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': self.version,
+            'zones': len(snapshot.zones) if snapshot is not None else 0,
+            'age_s': round(snapshot.age(), 1) if snapshot is not None else None,
+            'stale': self._stale,
+            'fetches': self.fetch_count,
+            'refresh_requests': self.refresh_requests,
+            'coalesced_refreshes': self.coalesced_refreshes,
+            'errors': self.error_count,
+            'last_error': self.last_error
+        }
+
+    @property
+    def version(self):
+        return self._snapshot.version if self._snapshot is not None else 0
@@ -0,0 +1,169 @@
+# zone_history.py
+
+import calendar
+import time
+
+import pandas as pd
+
+from checkins import event_key
+from config import HISTORY_TIMEZONE
+
+# Registros: history/{zone_id}/{AAAAMMDDHH en UTC}/{clave ordenada por tiempo}
+HISTORY_PATH = 'history'
+
+# Campos de la zona que se guardan en cada registro, con su clave abreviada
+FIELD_KEYS = {
+    'volunteer_count': 'c',
+    'status': 's',
+    'pending_needs': 'p',
+    'covered_needs': 'n'
+}
+FIELD_NAMES = {short: name for name, short in FIELD_KEYS.items()}
+
+# Marca de zona borrada en las series por hora
+DELETED = float('-inf')
+
+
+def bucket_key(ts):
+    """Hora (UTC) a la que pertenece un instante, como clave del nodo"""
+    return time.strftime('%Y%m%d%H', time.gmtime(ts))
+
+
+def previous_bucket_key(key):
+    """Clave de la hora anterior a la del nodo key"""
+    return bucket_key(calendar.timegm(time.strptime(key, '%Y%m%d%H')) - 3600)
+
+
+def make_record(op, fields, ts=None):
+    """Registro compacto: instante, operación y los campos conocidos de la zona"""
+    record = {'t': round(ts if ts is not None else time.time(), 3), 'o': op}
+    for name, short in FIELD_KEYS.items():
+        if name in fields:
+            value = fields[name]
+            record[short] = list(value or []) if name in ('pending_needs', 'covered_needs') else value
+    return record
+
+
+def record_paths(zone_id, op, fields, ts=None):
+    """{ruta: registro} listo para incluir en un PATCH multi-ruta"""
+    record = make_record(op, fields, ts)
+    return {f'{HISTORY_PATH}/{zone_id}/{bucket_key(record["t"])}/{event_key()}': record}
+
+
+def _expand(record):
+    expanded = {'t': record['t'], 'op': record.get('o')}
+    for short, name in FIELD_NAMES.items():
+        if short in record:
+            expanded[name] = record[short]
+    return expanded
+
+
+class ZoneHistory:
+    """Consultas sobre el historial de las zonas.
+
+    send es la función que envía las peticiones (EmergencyDatabase._send).
+    """
+
+    def __init__(self, send):
+        self._send = send
+
+    def append(self, entries):
+        """Añade registros de varias zonas en un único PATCH.
+
+        entries es una lista de (zone_id, operación, campos).
+        """
+        paths = {}
+        for zone_id, op, fields in entries:
+            paths.update(record_paths(zone_id, op, fields))
+        if not paths:
+            return True
+        response = self._send('PATCH', '', paths)
+        return response.status_code == 200
+
+    def _buckets(self, zone_id, **query):
+        params = {'orderBy': '"$key"'}
+        params.update({key: value if key.startswith('limit') else f'"{value}"'
+                       for key, value in query.items()})
+        response = self._send('GET', f'{HISTORY_PATH}/{zone_id}', params=params)
+        response.raise_for_status()
+        return response.json() or {}
+
+    def records(self, zone_id, start, end=None):
+        """Registros de la zona entre start y end (segundos epoch), ordenados por tiempo.
+
+        Solo se leen los nodos de las horas que cubren el intervalo.
+        """
+        end = end if end is not None else time.time()
+        buckets = self._buckets(zone_id, startAt=bucket_key(start), endAt=bucket_key(end))
+        records = [
+            _expand(record)
+            for bucket in buckets.values() if isinstance(bucket, dict)
+            for record in bucket.values()
+            if isinstance(record, dict) and start <= record.get('t', 0) <= end
+        ]
+        return sorted(records, key=lambda record: record['t'])
+
+    def last_before(self, zone_id, ts, field='volunteer_count'):
+        """Último valor conocido del campo antes de ts.
+
+        Empieza por la hora de ts y retrocede hora a hora (solo las que tienen
+        datos, una por petición) hasta encontrar un registro con el campo o un
+        borrado de la zona.
+        """
+        end_key = bucket_key(ts)
+        while True:
+            buckets = self._buckets(zone_id, endAt=end_key, limitToLast=1)
+            if not buckets:
+                return None
+            key, bucket = next(iter(buckets.items()))
+            if isinstance(bucket, dict):
+                records = sorted(
+                    (_expand(r) for r in bucket.values() if isinstance(r, dict) and r.get('t', 0) < ts),
+                    key=lambda record: record['t']
+                )
+                for record in reversed(records):
+                    if record['op'] == 'delete':
+                        return None
+                    if field in record:
+                        return record[field]
+            end_key = previous_bucket_key(key)
+
+    def hourly(self, zone_id, start, end=None, field='volunteer_count', how='last'):
+        """Serie por hora de un campo numérico entre start y end.
+
+        how es la agregación de los valores de cada hora ('last', 'max', 'min'
+        o 'mean'). Las horas sin cambios repiten el último valor; tras un
+        borrado de la zona la serie queda vacía.
+        """
+        end = end if end is not None else time.time()
+        index = pd.date_range(
+            pd.Timestamp(start, unit='s', tz='UTC').floor('h'),
+            pd.Timestamp(end, unit='s', tz='UTC').floor('h'),
+            freq='h'
+        )
+        points = [(start, self.last_before(zone_id, start, field))]
+        for record in self.records(zone_id, start, end):
+            if record['op'] == 'delete':
+                points.append((record['t'], DELETED))
+            elif field in record:
+                points.append((record['t'], record[field]))
+
+        values = pd.Series(
+            [value for _, value in points],
+            index=pd.to_datetime([ts for ts, _ in points], unit='s', utc=True),
+            dtype='float64'
+        )
+        # Estado al final de cada hora, arrastrado a las horas sin registros
+        series = values.resample('h').last().reindex(index).ffill()
+        if how != 'last':
+            valid = values[values != DELETED]
+            series = valid.resample('h').agg(how).reindex(index).fillna(series)
+        series = series.replace(DELETED, float('nan'))
+        series.index = series.index.tz_convert(HISTORY_TIMEZONE)
+        return series
+
+    def hourly_counts(self, zone_ids, start, end=None):
+        """Voluntarios por hora de varias zonas: DataFrame con una columna por zona"""
+        return pd.DataFrame({
+            zone_id: self.hourly(zone_id, start, end) for zone_id in zone_ids
+        })
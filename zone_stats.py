@@ -0,0 +1,178 @@
+# zone_stats.py
+
+import threading
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from config import ZONE_STATES
+
+STATE_INDEX = {status: index for index, status in enumerate(ZONE_STATES)}
+MUNICIPALITY_COLUMNS = ['zones', 'volunteers', 'pending_needs', *ZONE_STATES]
+
+
+def _as_list(value):
+    """Firebase omite las listas vacías: se normalizan a []"""
+    return value if isinstance(value, list) else []
+
+
+def _volunteer_count(value):
+    """Número de voluntarios; lo que no es un número cuenta como 0"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+class ZoneStats:
+    """Agregados de una instantánea de zonas.
+
+    Todos se calculan juntos la primera vez que se pide alguno, sin construir
+    una tabla por zona: Counter para las necesidades y np.bincount sobre
+    códigos enteros para estados y municipios. Se reutilizan mientras la
+    instantánea (versión) no cambie; solo los resultados, ya pequeños, se
+    convierten a DataFrame.
+    """
+
+    def __init__(self, zones, version=None):
+        self.version = version
+        self._zones = zones
+        self._totals = None
+        self._results = {}
+
+    def _memo(self, key, compute):
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    def _aggregate(self):
+        if self._totals is not None:
+            return self._totals
+        zones = self._zones
+        pending_lists = [_as_list(zone.get('pending_needs')) for zone in zones]
+        covered_lists = [_as_list(zone.get('covered_needs')) for zone in zones]
+        pending = Counter(chain.from_iterable(pending_lists))
+        covered = Counter(chain.from_iterable(covered_lists))
+        pending.pop(None, None)
+        covered.pop(None, None)
+
+        # Cada zona se reduce a enteros (estado, voluntarios, municipio) y se
+        # suman por columnas con numpy
+        states = np.array([STATE_INDEX.get(zone.get('status'), -1) for zone in zones], dtype=np.int64)
+        counts = np.array([
+            value if type(value) is int else _volunteer_count(value)
+            for value in (zone.get('volunteer_count', 0) for zone in zones)
+        ], dtype=np.int64)
+        pending_counts = np.fromiter(map(len, pending_lists), dtype=np.int64, count=len(zones))
+        # Municipio: el campo 'municipality' o, si no existe, la parte del nombre
+        # tras el último ' - ' ("Zona A - Catarroja" -> "Catarroja")
+        index = {}
+        codes = np.array([
+            index.setdefault(
+                zone.get('municipality') or str(zone.get('name', '')).rpartition(' - ')[2].strip(),
+                len(index)
+            )
+            for zone in zones
+        ], dtype=np.int64)
+
+        groups = len(index)
+        columns = [
+            np.bincount(codes, minlength=groups),
+            np.bincount(codes, weights=counts, minlength=groups),
+            np.bincount(codes, weights=pending_counts, minlength=groups)
+        ]
+        for state in range(len(ZONE_STATES)):
+            columns.append(np.bincount(codes[states == state], minlength=groups))
+        by_state = np.bincount(states[states >= 0], minlength=len(ZONE_STATES))
+
+        self._totals = {
+            'status_counts': {status: int(by_state[i]) for i, status in enumerate(ZONE_STATES)},
+            'volunteers': int(counts.sum()),
+            'pending': pending,
+            'covered': covered,
+            'municipalities': (list(index), np.column_stack(columns).astype(np.int64)
+                               if groups else np.zeros((0, len(MUNICIPALITY_COLUMNS)), dtype=np.int64))
+        }
+        return self._totals
+
+    @property
+    def total_zones(self):
+        return len(self._zones)
+
+    def status_counts(self):
+        """Número de zonas por estado, con todos los estados de ZONE_STATES"""
+        return self._aggregate()['status_counts']
+
+    def count(self, status):
+        return self.status_counts().get(status, 0)
+
+    def volunteers(self):
+        """Total y media de voluntarios por zona"""
+        def compute():
+            total = self._aggregate()['volunteers']
+            return {
+                'total': total,
+                'mean': total / len(self._zones) if self._zones else 0.0
+            }
+        return self._memo('volunteers', compute)
+
+    def need_frequencies(self):
+        """Zonas en las que aparece cada necesidad, por cubrir y cubierta.
+
+        DataFrame indexado por necesidad con las columnas 'pending' y
+        'covered', ordenado por necesidades pendientes.
+        """
+        def compute():
+            totals = self._aggregate()
+            frequencies = pd.DataFrame({
+                kind: pd.Series(totals[kind], dtype='int64') for kind in ('pending', 'covered')
+            }, columns=['pending', 'covered']).fillna(0).astype('int64')
+            frequencies.index.name = 'need'
+            return frequencies.sort_values(['pending', 'covered'], ascending=False)
+        return self._memo('need_frequencies', compute)
+
+    def by_municipality(self):
+        """Resumen por municipio: zonas, zonas por estado, voluntarios y necesidades por cubrir"""
+        def compute():
+            names, rows = self._aggregate()['municipalities']
+            summary = pd.DataFrame(rows, index=names, columns=MUNICIPALITY_COLUMNS).sort_index()
+            summary.index.name = 'municipality'
+            return summary.sort_values('zones', ascending=False, kind='stable')
+        return self._memo('by_municipality', compute)
+
+
+class ZoneStatsCache:
+    """Estadísticas de la última instantánea, compartidas por todas las sesiones.
+
+    Los agregados se calculan una sola vez por versión de la instantánea.
+    """
+
+    def __init__(self):
+        self._stats = None
+        self._lock = threading.Lock()
+        self.build_count = 0
+
+    def get(self, snapshot):
+        stats = self._stats
+        if stats is not None and stats.version == snapshot.version:
+            return stats
+        with self._lock:
+            stats = self._stats
+            if stats is None or stats.version != snapshot.version:
+                stats = ZoneStats(snapshot.zones, snapshot.version)
+                self._stats = stats
+                self.build_count += 1
+            return stats
+
+    def invalidate(self):
+        with self._lock:
+            self._stats = None
+
+    def stats(self):
+        stats = self._stats
+        return {
+            'version': stats.version if stats is not None else None,
+            'builds': self.build_count
+        }